@@ -0,0 +1,163 @@
+"""
+Asset Fingerprinting Stage
+Build stage (see build_site.py) that copies every stylesheet, script and image
+in dist/ to a content-hashed name (mobile-smooth.css -> mobile-smooth.1a2b3c4d5e.css)
+and rewrites the references to it in the pages, stylesheets and
+site.webmanifest. Because a hashed file can never change, it can be served
+with `Cache-Control: immutable` and repeat visitors never revalidate it.
+
+Outputs in dist/:
+    asset-manifest.json   logical name -> hashed name
+    _headers              immutable caching rules for the hashed files
+                          (Netlify / Cloudflare Pages format)
+
+The unhashed originals stay in place so absolute URLs used by search engines
+and social cards (JSON-LD, og:image) keep working.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from build_cache import bytes_digest
+from file_writes import remove_file, write_bytes, write_text
+from image_pipeline import canonical_sort_key
+from site_pipeline import register_stage
+
+# Binary assets are hashed first so text assets can reference their hashed names
+BINARY_PATTERNS = ['images/*.png', 'images/*.jpg', 'images/*.jpeg', 'images/*.webp', 'images/*.svg',
+                   'images/variants/*']
+TEXT_PATTERNS = ['*.css', '*.js']
+EXTRA_REFERRERS = ['site.webmanifest']
+
+HASH_LENGTH = 10
+HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}(\.[^./]+)$' % HASH_LENGTH)
+MANIFEST_FILE = 'asset-manifest.json'
+HEADERS_FILE = '_headers'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Where pages, stylesheets and site.webmanifest name an asset: attribute
+# values, JSON values, CSS url() and @import
+URL_CONTEXT = re.compile(
+    r'''(?:(?P<attribute>[\w:-]+)\s*=\s*|"[\w-]+"\s*:\s*|url\(\s*|@import\s+)'''
+    r'''(?:"(?P<double>[^"]*)"|'(?P<single>[^']*)'|(?P<bare>[^\s>"')]+))''',
+    re.IGNORECASE
+)
+SRCSET_ATTRIBUTES = {'srcset', 'imagesrcset'}
+SRCSET_CANDIDATE = re.compile(r'((?:^|,)\s*)([^\s,]+)')
+
+
+def hashed_name(name, digest):
+    """Insert a short content hash before the extension."""
+    path = Path(name)
+    return path.with_name(f"{path.stem}.{digest[:HASH_LENGTH]}{path.suffix}").as_posix()
+
+
+def list_assets(site_dir, patterns):
+    """Unhashed assets matching the patterns, relative to the site root."""
+    names = set()
+    for pattern in patterns:
+        for path in site_dir.glob(pattern):
+            if path.is_file() and not HASHED_NAME.search(path.name):
+                names.add(path.relative_to(site_dir).as_posix())
+    return sorted(names)
+
+
+def reference_pattern(names):
+    """Regex matching a whole page-relative URL of any of the given assets."""
+    if not names:
+        return None
+    alternatives = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(r'(\./)?(' + alternatives + r')([?#].*)?')
+
+
+def rewrite_url(url, mapping, pattern):
+    """The hashed form of one URL, or the URL unchanged if it is not an asset."""
+    match = pattern.fullmatch(url)
+    if not match:
+        return url
+    return (match.group(1) or '') + mapping[match.group(2)] + (match.group(3) or '')
+
+
+def rewrite_references(text, mapping, pattern):
+    """Replace references to logical asset names with their hashed names.
+
+    Only URL positions are rewritten - attribute and JSON values that are
+    exactly an asset URL, each candidate of a srcset, url() and @import - so
+    absolute URLs and plain-text mentions of a file name are left alone.
+    """
+    if pattern is None:
+        return text
+
+    def rewrite(match):
+        group = next(name for name in ('double', 'single', 'bare') if match.group(name) is not None)
+        value = match.group(group)
+        if (match.group('attribute') or '').lower() in SRCSET_ATTRIBUTES:
+            value = SRCSET_CANDIDATE.sub(lambda m: m.group(1) + rewrite_url(m.group(2), mapping, pattern), value)
+        else:
+            value = rewrite_url(value, mapping, pattern)
+        start, end = match.start(group) - match.start(), match.end(group) - match.start()
+        return match.group(0)[:start] + value + match.group(0)[end:]
+
+    return URL_CONTEXT.sub(rewrite, text)
+
+
+def prepare_fingerprints(context):
+    """Copy each asset to its hashed name and record the mapping."""
+    site_dir = context['site_dir']
+    mapping = {}
+
+    # Byte-identical files share one hashed copy, named after the tidiest name
+    by_digest = {}
+    for name in sorted(list_assets(site_dir, BINARY_PATTERNS), key=canonical_sort_key):
+        data = (site_dir / name).read_bytes()
+        digest = bytes_digest(data)
+        if digest not in by_digest:
+            by_digest[digest] = hashed_name(name, digest)
+            write_bytes(site_dir / by_digest[digest], data)
+        mapping[name] = by_digest[digest]
+
+    # Stylesheets and scripts may point at images - rewrite before hashing
+    image_pattern = reference_pattern(mapping)
+    for name in list_assets(site_dir, TEXT_PATTERNS):
+        text = (site_dir / name).read_text(encoding='utf-8')
+        data = rewrite_references(text, mapping, image_pattern).encode('utf-8')
+        mapping[name] = hashed_name(name, bytes_digest(data))
+        write_bytes(site_dir / mapping[name], data)
+
+    pattern = reference_pattern(mapping)
+    for name in EXTRA_REFERRERS:
+        path = site_dir / name
+        if path.exists():
+            text = path.read_text(encoding='utf-8')
+            write_text(path, rewrite_references(text, mapping, pattern))
+
+    # Drop hashed copies left behind by earlier builds
+    manifest_path = site_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text(encoding='utf-8'))
+        current = set(mapping.values())
+        for stale in set(previous.values()) - current:
+            remove_file(site_dir / stale)
+
+    write_text(manifest_path, json.dumps(mapping, indent=2, sort_keys=True) + '\n')
+    headers = ''.join(f"/{name}\n  Cache-Control: {IMMUTABLE}\n" for name in sorted(set(mapping.values())))
+    write_text(site_dir / HEADERS_FILE, headers)
+
+    print(f"🔖 Fingerprinted {len(mapping)} assets -> {MANIFEST_FILE}")
+    context['fingerprints'] = {'mapping': mapping, 'pattern': pattern}
+
+
+@register_stage(
+    'fingerprint-assets',
+    'Copy assets to content-hashed names and rewrite references for immutable caching',
+    group='build',
+    prepare=prepare_fingerprints,
+)
+def fingerprint_references(page):
+    """Point href/src/srcset references at the hashed asset names"""
+    fingerprints = page['context']['fingerprints']
+    content = rewrite_references(page['content'], fingerprints['mapping'], fingerprints['pattern'])
+    if content != page['content']:
+        page['log'].append("✅ Rewrote asset references to fingerprinted names")
+    page['content'] = content
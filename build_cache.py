@@ -0,0 +1,69 @@
+"""
+Build Cache
+Content hashes and persistent JSON manifests shared by the build scripts.
+
+Manifests live in .build-cache/ next to the site. They only ever speed things
+up - deleting the directory is always safe, the next run rebuilds everything.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from file_writes import dry_run_enabled, write_text
+
+SITE_DIR = Path(__file__).parent
+CACHE_DIR = SITE_DIR / '.build-cache'
+
+
+def bytes_digest(data):
+    """Return the SHA-256 hex digest of some bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def text_digest(text):
+    """Return the SHA-256 hex digest of a string."""
+    return bytes_digest(text.encode('utf-8'))
+
+
+def json_digest(value):
+    """Return a stable digest of any JSON-serializable value."""
+    return text_digest(json.dumps(value, sort_keys=True, ensure_ascii=False))
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def manifest_path(name, cache_dir=CACHE_DIR):
+    """Return the path of a named manifest."""
+    return Path(cache_dir) / f"{name}.json"
+
+
+def load_manifest(name, cache_dir=CACHE_DIR):
+    """Load a named manifest, returning an empty one if missing or unreadable."""
+    try:
+        with open(manifest_path(name, cache_dir), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_manifest(name, data, cache_dir=CACHE_DIR):
+    """Save a named manifest, replacing the previous one atomically.
+
+    Nothing is saved in a dry run: the manifest would describe outputs that
+    were never written.
+    """
+    if dry_run_enabled():
+        return
+    write_text(manifest_path(name, cache_dir), json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Site Build
+Copies the publishable part of the site into a work directory, runs the
+'build' pipeline stages (see site_pipeline.py) over that copy and publishes
+the result to dist/. The source pages are never modified - upload dist/
+instead of the repository root.
+
+Usage:
+    python3 build_site.py                      # build every stage into dist/
+    python3 build_site.py responsive-images    # only the named build stages
+    python3 build_site.py --clean --jobs 4     # start from an empty dist/
+
+The stages rewrite the copied files in place, so they run in
+.build-cache/staging/; only files whose content differs are copied on to
+dist/ (and files no longer produced are removed there). An unchanged site
+leaves every file in dist/ untouched, and a deploy only uploads what changed.
+"""
+
+import argparse
+import fnmatch
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from build_cache import CACHE_DIR
+from file_writes import copy_file, remove_file
+from site_pipeline import STAGES, load_stages, run_pipeline, print_report
+
+SITE_DIR = Path(__file__).parent
+DIST_DIR = SITE_DIR / 'dist'
+STAGING_DIR = CACHE_DIR / 'staging'
+
+# What gets published, relative to the site root
+PUBLISH_PATTERNS = [
+    '*.html', '*.css', '*.js', '*.ico', '*.txt', '*.webmanifest',
+    '*.xml', '*.xml.gz', 'images/*'
+]
+
+# Never published: test pages and development-only scripts
+EXCLUDE_PATTERNS = ['test-mobile-performance.html', 'verify_final_seo.js']
+
+
+def is_published(name, patterns=PUBLISH_PATTERNS):
+    """Whether a file, named relative to the site root, is one the site publishes."""
+    parts = name.split('/')
+    if any(fnmatch.fnmatch(parts[-1], pattern) for pattern in EXCLUDE_PATTERNS):
+        return False
+    # Like the glob: every pattern segment matches exactly one path segment
+    return any(
+        len(pattern_parts) == len(parts) and all(map(fnmatch.fnmatchcase, parts, pattern_parts))
+        for pattern_parts in (pattern.split('/') for pattern in patterns)
+    )
+
+
+def collect_source_files(site_dir=SITE_DIR):
+    """List the publishable files of the site, relative to its root."""
+    site_dir = Path(site_dir)
+    files = set()
+    for pattern in PUBLISH_PATTERNS:
+        for path in site_dir.glob(pattern):
+            if path.is_file():
+                files.add(path.relative_to(site_dir).as_posix())
+    return sorted(name for name in files if is_published(name))
+
+
+def sync_to_dist(site_dir=SITE_DIR, out_dir=DIST_DIR):
+    """Copy changed source files into the output directory."""
+    site_dir = Path(site_dir)
+    out_dir = Path(out_dir)
+    copied = 0
+    files = collect_source_files(site_dir)
+    for name in files:
+        if copy_file(site_dir / name, out_dir / name):
+            copied += 1
+    return files, copied
+
+
+def publish(work_dir, out_dir=DIST_DIR):
+    """Mirror the work directory into out_dir, touching only files whose content differs.
+
+    Returns (changed, removed) as paths relative to out_dir.
+    """
+    work_dir = Path(work_dir)
+    out_dir = Path(out_dir)
+    built = sorted(path.relative_to(work_dir).as_posix() for path in work_dir.rglob('*') if path.is_file())
+    changed = [name for name in built if copy_file(work_dir / name, out_dir / name)]
+    stale = sorted(path.relative_to(out_dir).as_posix() for path in out_dir.rglob('*') if path.is_file())
+    removed = [name for name in stale if name not in set(built) and remove_file(out_dir / name)]
+    return changed, removed
+
+
+def build_site(stage_names=None, out_dir=DIST_DIR, clean=False, jobs=None):
+    """Build the site into out_dir and return the pipeline result."""
+    out_dir = Path(out_dir)
+    work_dir = STAGING_DIR / out_dir.name
+    if clean:
+        for directory in (out_dir, work_dir):
+            if directory.exists():
+                shutil.rmtree(directory)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    files, copied = sync_to_dist(SITE_DIR, work_dir)
+    print(f"📁 {len(files)} files to publish, {copied} refreshed in the staging copy")
+
+    context = {'source_dir': SITE_DIR, 'jobs': jobs or os.cpu_count() or 1}
+    result = run_pipeline(stage_names, site_dir=work_dir, group='build', context=context)
+    changed, removed = publish(work_dir, out_dir)
+    print(f"🚀 {len(changed)} file(s) updated in {out_dir.name}/, {len(removed)} removed")
+    result['published'] = {'changed': changed, 'removed': removed}
+    return result
+
+
+def main(argv=None):
+    """Command line entry point."""
+    load_stages()
+    build_stages = [name for name, stage in STAGES.items() if stage['group'] == 'build']
+
+    parser = argparse.ArgumentParser(description='Build the publishable site into dist/.')
+    parser.add_argument('stages', nargs='*', help=f"build stages to run (default: {', '.join(build_stages)})")
+    parser.add_argument('--out', default=str(DIST_DIR), help='output directory (default: dist/)')
+    parser.add_argument('--clean', action='store_true', help='remove the output directory first')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes for heavy stages (default: one per core)')
+    args = parser.parse_args(argv)
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("🏗️  Site Build")
+    print("=" * 50)
+
+    try:
+        result = build_site(args.stages or None, args.out, args.clean, args.jobs)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return 1
+
+    print_report(result)
+    print(f"\n✨ Build complete: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
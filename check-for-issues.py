@@ -2,204 +2,235 @@
 """
 Comprehensive Bug and Performance Issue Checker
 Scans all files for potential delays, bugs, and performance issues
+
+The rules and the single-pass scanner live in issue_scanner.py; scripts
+(*.js and inline <script>) are also linted on tokens by js_tools.py, and
+stylesheets (*.css and inline <style>) are checked on parsed declarations
+with their @media context by css_tools.py. Every page's critical request
+chain (request_chains.py) is checked for resources that block the first
+paint or are found late; --chains also prints each chain and a site summary.
+
+Usage:
+    python3 check-for-issues.py                          # emoji report for this site
+    python3 check-for-issues.py --jobs 8 --format jsonl  # stream findings as JSON Lines
+    python3 check-for-issues.py --format sarif --output issues.sarif
+    python3 check-for-issues.py --chains                 # also print each page's critical request chain
+    python3 check-for-issues.py site-a/ site-b/ --jobs 0 --fail-on HIGH
+
+--jobs spreads files across a process pool (0 = one worker per core). In
+jsonl mode each finding is printed as soon as its file has been scanned;
+--output additionally writes every finding in a stable order once the scan
+is done. --fail-on makes the exit code non-zero when any finding is at or
+above the given severity.
 """
 
+import io
 import os
-import re
+import sys
+import json
 import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-def check_for_issues():
-    """Check all files for potential bugs and performance issues"""
+from file_writes import write_text
+from issue_scanner import CHAIN_RULES, RULES, SCRIPT_RULES, STYLE_RULES, check_file
+from request_chains import request_chain, summarize_chains
+
+SEVERITY_RANK = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3}
+SARIF_LEVELS = {'HIGH': 'error', 'MEDIUM': 'warning', 'LOW': 'note'}
+
+# Skip test and generated files
+SKIP_FILES = ['test-mobile-performance.html', 'sitemap.html']
+
+def discover_files(site_dir):
+    """Find the HTML, JS and CSS files of a site."""
+    html_files = sorted(glob.glob(str(Path(site_dir) / "*.html")))
+    js_files = sorted(glob.glob(str(Path(site_dir) / "*.js")))
+    css_files = sorted(glob.glob(str(Path(site_dir) / "*.css")))
     
-    script_dir = Path(__file__).parent
+    html_files = [f for f in html_files if not any(skip in f for skip in SKIP_FILES)]
+    return html_files, js_files, css_files
+
+def issue_sort_key(issue):
+    """Stable ordering for findings, independent of scan completion order."""
+    return (issue['file'], issue['line'], issue['column'], issue['rule'])
+
+def scan_files(files, jobs=1, on_result=None):
+    """Scan (path, display name) pairs, optionally in a process pool."""
     issues_found = []
     
-    print("🔍 Scanning for potential bugs and performance issues...\n")
+    def collect(file_issues):
+        issues_found.extend(file_issues)
+        if on_result:
+            on_result(file_issues)
+    
+    if jobs == 1:
+        for file_path, display_name in files:
+            try:
+                collect(check_file(file_path, display_name))
+            except Exception as e:
+                print(f"❌ Error checking {display_name}: {e}", file=sys.stderr)
+        return issues_found
+    
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        futures = {pool.submit(check_file, file_path, display_name): display_name for file_path, display_name in files}
+        for future in as_completed(futures):
+            display_name = futures[future]
+            try:
+                collect(future.result())
+            except Exception as e:
+                print(f"❌ Error checking {display_name}: {e}", file=sys.stderr)
+    return issues_found
+
+def to_json_line(issue):
+    """Serialize one finding as a JSON Lines record."""
+    return json.dumps(issue, ensure_ascii=False, sort_keys=True)
+
+def to_sarif(issues):
+    """Build a SARIF 2.1.0 log for the findings."""
+    rules = RULES + SCRIPT_RULES + STYLE_RULES + CHAIN_RULES
+    return {
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'version': '2.1.0',
+        'runs': [{
+            'tool': {'driver': {
+                'name': 'check-for-issues',
+                'informationUri': 'https://kitchener-waterloo-wizards.com/',
+                'rules': [{
+                    'id': rule['id'],
+                    'shortDescription': {'text': rule['description']},
+                    'defaultConfiguration': {'level': SARIF_LEVELS[rule['severity']]}
+                } for rule in rules]
+            }},
+            'results': [{
+                'ruleId': issue['rule'],
+                'level': SARIF_LEVELS[issue['severity']],
+                'message': {'text': f"{issue['description']}: {issue['match']}"},
+                'locations': [{'physicalLocation': {
+                    'artifactLocation': {'uri': issue['file']},
+                    'region': {'startLine': issue['line'], 'startColumn': issue['column']}
+                }}]
+            } for issue in issues]
+        }]
+    }
+
+def write_results(issues, output_format, stream):
+    """Write findings in a machine-readable format."""
+    if output_format == 'sarif':
+        json.dump(to_sarif(issues), stream, indent=2, ensure_ascii=False)
+        stream.write('\n')
+    else:
+        for issue in issues:
+            stream.write(to_json_line(issue) + '\n')
+
+def exit_code_for(issues, fail_on):
+    """Return 1 if any finding is at or above the failure threshold."""
+    if fail_on == 'never':
+        return 0
+    threshold = SEVERITY_RANK[fail_on]
+    return 1 if any(SEVERITY_RANK[i['severity']] >= threshold for i in issues) else 0
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description='Scan the site for bugs and performance issues.')
+    parser.add_argument('sites', nargs='*', help='site directories to scan (default: this directory)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='worker processes (0 = one per core, default: 1)')
+    parser.add_argument('--format', choices=['text', 'jsonl', 'sarif'], default='text', help='output format')
+    parser.add_argument('--output', '-o', help='also write all findings, in stable order, to this file')
+    parser.add_argument('--fail-on', choices=['HIGH', 'MEDIUM', 'LOW', 'never'], default='never',
+                        help='exit non-zero when a finding has at least this severity')
+    parser.add_argument('--chains', action='store_true',
+                        help="print every page's critical request chain and a site summary")
+    return parser.parse_args(argv)
+
+def check_for_issues(argv=None):
+    """Check all files for potential bugs and performance issues"""
+    
+    args = parse_args(argv)
+    sites = args.sites or [str(Path(__file__).parent)]
+    text_mode = args.format == 'text'
+    # Keep stdout clean for machine-readable output
+    log = sys.stdout if text_mode else sys.stderr
+    
+    print("🔍 Scanning for potential bugs and performance issues...\n", file=log)
     
     # Find all relevant files
-    html_files = glob.glob(str(script_dir / "*.html"))
-    js_files = glob.glob(str(script_dir / "*.js"))
-    css_files = glob.glob(str(script_dir / "*.css"))
-    
-    # Skip backup and test files
-    skip_files = ['.original.', 'test-mobile-performance.html', 'sitemap.html']
-    html_files = [f for f in html_files if not any(skip in f for skip in skip_files)]
-    
-    print(f"📁 Checking {len(html_files)} HTML, {len(js_files)} JS, and {len(css_files)} CSS files\n")
-    
-    # Issues to check for
-    performance_issues = [
-        {
-            'pattern': r'setTimeout\([^,]+,\s*([5-9]\d{2,}|\d{4,})\)',
-            'description': 'Long setTimeout delays (>500ms) that could slow user experience',
-            'severity': 'HIGH'
-        },
-        {
-            'pattern': r'setInterval\([^,]+,\s*([1-9]\d{1,})\)',
-            'description': 'Frequent setInterval calls (<100ms) that could cause performance issues',
-            'severity': 'MEDIUM'
-        },
-        {
-            'pattern': r'document\.write\(',
-            'description': 'document.write() can block page rendering',
-            'severity': 'HIGH'
-        },
-        {
-            'pattern': r'@import\s+url\(',
-            'description': 'CSS @import can block rendering and slow page load',
-            'severity': 'MEDIUM'
-        },
-        {
-            'pattern': r'pointer-events:\s*none.*!important',
-            'description': 'Important pointer-events none that might break mobile touch',
-            'severity': 'MEDIUM'
-        },
-        {
-            'pattern': r'transition:\s*all\s+[1-9]\d*s',
-            'description': 'Slow CSS transitions (>1s) that could feel laggy',
-            'severity': 'LOW'
-        },
-        {
-            'pattern': r'animation-duration:\s*[5-9]\d*s',
-            'description': 'Very long animations that might annoy users',
-            'severity': 'LOW'
-        },
-        {
-            'pattern': r'\.preventDefault\(\)\s*;[^}]*return\s+false',
-            'description': 'Both preventDefault and return false - redundant and potentially problematic',
-            'severity': 'MEDIUM'
-        }
-    ]
-    
-    mobile_issues = [
-        {
-            'pattern': r'touch-action:\s*none',
-            'description': 'touch-action: none might prevent scrolling on mobile',
-            'severity': 'HIGH'
-        },
-        {
-            'pattern': r'user-scalable\s*=\s*no',
-            'description': 'user-scalable=no prevents zoom and hurts accessibility',
-            'severity': 'MEDIUM'
-        },
-        {
-            'pattern': r'min-height:\s*\d+px.*max-width:\s*768px',
-            'description': 'Fixed heights on mobile can cause layout issues',
-            'severity': 'LOW'
-        },
-        {
-            'pattern': r'font-size:\s*[1-9][0-4]px.*max-width:\s*768px',
-            'description': 'Font sizes below 15px on mobile might cause zoom on iOS',
-            'severity': 'MEDIUM'
-        }
-    ]
-    
-    bug_patterns = [
-        {
-            'pattern': r'console\.log\(',
-            'description': 'Console.log statements should be removed in production',
-            'severity': 'LOW'
-        },
-        {
-            'pattern': r'alert\(',
-            'description': 'Alert dialogs can break mobile user experience',
-            'severity': 'MEDIUM'
-        },
-        {
-            'pattern': r'href\s*=\s*["\']javascript:',
-            'description': 'javascript: hrefs can cause accessibility issues',
-            'severity': 'LOW'
-        },
-        {
-            'pattern': r'onclick\s*=',
-            'description': 'Inline onclick handlers - better to use addEventListener',
-            'severity': 'LOW'
-        }
-    ]
-    
-    all_issues = performance_issues + mobile_issues + bug_patterns
-    
-    # Check each file
-    for file_path in html_files + js_files + css_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            file_issues = []
-            
-            for issue in all_issues:
-                matches = re.finditer(issue['pattern'], content, re.IGNORECASE)
-                for match in matches:
-                    line_num = content[:match.start()].count('\\n') + 1
-                    file_issues.append({
-                        'file': os.path.basename(file_path),
-                        'line': line_num,
-                        'description': issue['description'],
-                        'severity': issue['severity'],
-                        'match': match.group(0)[:50] + '...' if len(match.group(0)) > 50 else match.group(0)
-                    })
-            
-            if file_issues:
-                issues_found.extend(file_issues)
-                
-        except Exception as e:
-            print(f"❌ Error checking {os.path.basename(file_path)}: {e}")
-    
-    # Check for specific rep team box mobile issues
-    print("🏀 Checking rep team box mobile functionality...\n")
-    
-    rep_team_issues = []
-    for html_file in html_files:
-        try:
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Check if rep team box exists
-            if 'rep-team-box' in content:
-                # Check if mobile touch is properly enabled
-                if 'pointer-events: none' in content and 'rep-team-box' in content:
-                    mobile_media_query = re.search(r'@media.*max-width:\s*768px.*?\{(.*?)\}', content, re.DOTALL)
-                    if mobile_media_query and 'pointer-events: none' in mobile_media_query.group(1):
-                        rep_team_issues.append({
-                            'file': os.path.basename(html_file),
-                            'issue': 'Rep team box has pointer-events: none on mobile',
-                            'severity': 'HIGH'
-                        })
-        except Exception as e:
-            continue
-    
-    # Report findings
+    files = []
+    pages = []
+    counts = [0, 0, 0]
+    for site_dir in sites:
+        site_files = discover_files(site_dir)
+        for index, group in enumerate(site_files):
+            counts[index] += len(group)
+            for file_path in group:
+                name = os.path.basename(file_path)
+                if len(sites) > 1:
+                    name = f"{Path(site_dir).resolve().name}/{name}"
+                files.append((file_path, name))
+                if index == 0:
+                    pages.append((file_path, name))
+    
+    print(f"📁 Checking {counts[0]} HTML, {counts[1]} JS, and {counts[2]} CSS files\n", file=log)
+    
+    # Stream JSON Lines as each file finishes
+    on_result = None
+    if args.format == 'jsonl':
+        def on_result(file_issues):
+            for issue in file_issues:
+                sys.stdout.write(to_json_line(issue) + '\n')
+            sys.stdout.flush()
+    
+    issues_found = sorted(scan_files(files, args.jobs, on_result), key=issue_sort_key)
+    
+    if args.output:
+        buffer = io.StringIO()
+        write_results(issues_found, 'jsonl' if args.format == 'text' else args.format, buffer)
+        write_text(args.output, buffer.getvalue())
+        print(f"💾 Wrote {len(issues_found)} findings to {args.output}", file=log)
+    
+    if args.format == 'sarif':
+        write_results(issues_found, 'sarif', sys.stdout)
+    elif text_mode:
+        print_report(issues_found)
+    
+    if args.chains:
+        chains = []
+        for file_path, name in pages:
+            chain = request_chain(Path(file_path).parent, Path(file_path).name)
+            chains.append(dict(chain, page=name))
+        print_chains(chains, log)
+    
+    return exit_code_for(issues_found, args.fail_on)
+
+def print_report(issues_found):
+    """Print the emoji issue summary"""
     print("=" * 60)
     print("📋 ISSUE SUMMARY")
     print("=" * 60)
     
-    if not issues_found and not rep_team_issues:
+    if not issues_found:
         print("✅ No significant issues found!")
         print("🚀 All files appear to be optimized for performance")
         return
     
     # Group issues by severity
-    high_issues = [i for i in issues_found if i['severity'] == 'HIGH'] + rep_team_issues
+    high_issues = [i for i in issues_found if i['severity'] == 'HIGH']
     medium_issues = [i for i in issues_found if i['severity'] == 'MEDIUM']
     low_issues = [i for i in issues_found if i['severity'] == 'LOW']
     
     if high_issues:
         print("🚨 HIGH SEVERITY ISSUES (Need immediate attention):")
         for issue in high_issues:
-            if 'file' in issue and 'line' in issue:
-                print(f"  📄 {issue['file']}:{issue['line']}")
-                print(f"     {issue['description']}")
-                print(f"     Code: {issue['match']}")
-            else:
-                print(f"  📄 {issue['file']}")
-                print(f"     {issue['issue']}")
+            print(f"  📄 {issue['file']}:{issue['line']}:{issue['column']}")
+            print(f"     {issue['description']}")
+            print(f"     Code: {issue['match']}")
             print()
     
     if medium_issues:
         print("⚠️ MEDIUM SEVERITY ISSUES (Should be addressed):")
         for issue in medium_issues:
-            print(f"  📄 {issue['file']}:{issue['line']}")
+            print(f"  📄 {issue['file']}:{issue['line']}:{issue['column']}")
             print(f"     {issue['description']}")
             print(f"     Code: {issue['match']}")
             print()
@@ -207,17 +238,17 @@ def check_for_issues():
     if low_issues:
         print("💡 LOW SEVERITY ISSUES (Consider addressing):")
         for issue in low_issues:
-            print(f"  📄 {issue['file']}:{issue['line']}")
+            print(f"  📄 {issue['file']}:{issue['line']}:{issue['column']}")
             print(f"     {issue['description']}")
             print()
     
-    print(f"📊 Total issues found: {len(issues_found + rep_team_issues)}")
+    print(f"📊 Total issues found: {len(issues_found)}")
     print(f"   🚨 High: {len(high_issues)}")
     print(f"   ⚠️ Medium: {len(medium_issues)}")
     print(f"   💡 Low: {len(low_issues)}")
     
     # Recommendations
-    print("\\n" + "=" * 60)
+    print("\n" + "=" * 60)
     print("💡 RECOMMENDATIONS")
     print("=" * 60)
     
@@ -226,6 +257,7 @@ def check_for_issues():
         print("  • Fix rep team box mobile touch issues immediately")
         print("  • Remove any blocking setTimeout/setInterval calls")
         print("  • Fix touch-action and pointer-events on mobile")
+        print("  • Mark touchstart/touchmove/wheel listeners { passive: true }")
         print()
     
     if medium_issues:
@@ -233,6 +265,9 @@ def check_for_issues():
         print("  • Replace @import with <link> tags")
         print("  • Remove alert() dialogs")
         print("  • Optimize font sizes for mobile (minimum 16px)")
+        print("  • Throttle scroll handlers with requestAnimationFrame")
+        print("  • Batch DOM reads before writes; build nodes in a DocumentFragment")
+        print("  • Defer, inline or preload render-blocking resources (see --chains)")
         print()
     
     print("✅ GENERAL OPTIMIZATIONS:")
@@ -241,5 +276,42 @@ def check_for_issues():
     print("  • Test all touch interactions on real mobile devices")
     print("  • Verify rep team box leads to rep-teams.html on mobile")
 
+def format_kb(size, path=None):
+    """Byte count in KB, or why it is not known offline."""
+    if size is not None:
+        return f"{size / 1024:.1f} KB"
+    return 'missing' if path else 'remote'
+
+def print_chains(chains, stream):
+    """Print each page's critical request chain and the site summary"""
+    print("\n" + "=" * 60, file=stream)
+    print("⛓️  CRITICAL REQUEST CHAINS", file=stream)
+    print("=" * 60, file=stream)
+    
+    for chain in chains:
+        print(f"\n📄 {chain['page']}: depth {chain['depth']}, {chain['blocking_requests']} render-blocking "
+              f"request(s), {format_kb(chain['blocking_gzip_bytes'])} gzipped (page included) before first paint"
+              + (f" (+{chain['blocking_remote_requests']} remote)" if chain['blocking_remote_requests'] else ''),
+              file=stream)
+        for entry in chain['entries']:
+            branch = '' if entry['depth'] == 0 else '   ' * (entry['depth'] - 1) + ('⋯ ' if entry['kind'] == 'hint' else '└ ')
+            how = entry['rel'] if entry['via'] == 'injected' else entry['via']
+            status = 'blocking' if entry['blocking'] else 'off the critical path' if entry['kind'] == 'hint' else 'async'
+            action = f"  → {entry['action']}" if entry['action'] else ''
+            print(f"  {entry['depth']}  {branch}{entry['url']}  [{how}, {status}, "
+                  f"{format_kb(entry['gzip_bytes'], entry['path'])}]{action}", file=stream)
+    
+    summary = summarize_chains(chains)
+    print("\n📊 Site summary:", file=stream)
+    print(f"   {summary['pages']} pages, {summary['blocking_requests']} render-blocking requests "
+          f"({summary['blocking_remote_requests']} remote), {format_kb(summary['blocking_gzip_bytes'])} "
+          f"gzipped before first paint in total", file=stream)
+    if summary['deepest']:
+        print(f"   Deepest chain: {summary['deepest']['page']} (depth {summary['deepest']['depth']})", file=stream)
+    for action, count in sorted(summary['actions'].items()):
+        print(f"   {count} resource(s) to {action}", file=stream)
+    for url, pages in summary['shared_blockers'][:5]:
+        print(f"   🚧 {url} blocks {len(pages)} page(s)", file=stream)
+
 if __name__ == "__main__":
-    check_for_issues()
+    sys.exit(check_for_issues())
@@ -0,0 +1,323 @@
+"""
+Critical CSS Stage
+Build stage (see build_site.py) that splits each page's render-blocking CSS
+into the rules its first screen needs and everything else.
+
+Each page's DOM is parsed with html.parser and every element up to the end of
+its first <section> (the header, nav and hero) counts as the initial
+viewport. The page's <style> blocks and local stylesheets in the <head> are
+matched against those elements; matching rules (plus the @keyframes and
+@font-face they use) are inlined as one <style> where the first of them was.
+Each <style> block moves to its own file (<page>.deferred.css,
+<page>.deferred-2.css, ...) and every one of them, like the local
+stylesheets, is loaded asynchronously from where it was:
+
+    <link rel="preload" href="about.deferred.css" as="style" onload="this.onload=null;this.rel='stylesheet'">
+    <noscript><link rel="stylesheet" href="about.deferred.css"></noscript>
+
+The deferred files hold the whole block, critical rules included, so once
+everything has loaded the last copy of every rule sits in its original
+order and the cascade resolves exactly as it did before the split. Only
+<style> blocks ahead of everything else whose rules are all critical stay
+inline alone - nothing before them can be overridden by the move.
+
+Classes that the site's scripts add at runtime (classList.add, className)
+are assumed present on every element, so nothing the first screen toggles
+is deferred. Remote stylesheets (Font Awesome) are left untouched.
+
+Results are cached in .build-cache/critical-css.json (or in the run
+context's cache_dir) keyed by the content hash of the page, its stylesheets
+and this code.
+"""
+
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+import css_tools
+from build_cache import CACHE_DIR, file_digest, json_digest, load_manifest, save_manifest, text_digest
+from file_writes import remove_file, write_text
+from site_pipeline import register_stage
+
+MANIFEST_NAME = 'critical-css'
+DEFERRED_SUFFIX = '.deferred.css'
+DEFERRED_FILE = re.compile(r'^(.+?)\.deferred(?:-\d+)?\.css$')
+
+# Tags that end the initial viewport once their first occurrence closes
+FOLD_TAGS = ('section', 'main')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+             'meta', 'source', 'track', 'wbr'}
+
+BODY_START = re.compile(r'<body\b', re.IGNORECASE)
+STYLE_BLOCK = re.compile(r'<style\b([^>]*)>(.*?)</style>\s*', re.IGNORECASE | re.DOTALL)
+LINK_TAG = re.compile(r'<link\b[^>]*>\s*', re.IGNORECASE)
+SCRIPT_BLOCK = re.compile(r'<script\b([^>]*)>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+
+
+class FoldParser(HTMLParser):
+    """Collect the elements of a page's initial viewport."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = []
+        self.stack = []
+        self.fold_depth = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        element = {
+            'tag': tag,
+            'id': attrs.get('id'),
+            'classes': set((attrs.get('class') or '').split()),
+            'attrs': set(attrs),
+            'parent': self.stack[-1] if self.stack else None,
+        }
+        self.elements.append(element)
+        if tag not in VOID_TAGS:
+            if tag in FOLD_TAGS and self.fold_depth is None:
+                self.fold_depth = len(self.stack)
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.stack and self.stack[-1]['tag'] == tag:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        if self.done or not any(element['tag'] == tag for element in self.stack):
+            return
+        while self.stack:
+            element = self.stack.pop()
+            if element['tag'] == tag:
+                break
+        if self.fold_depth is not None and len(self.stack) <= self.fold_depth:
+            self.done = True
+
+
+def fold_elements(content):
+    """Elements of the initial viewport (the whole page if it has no <section>)."""
+    parser = FoldParser()
+    parser.feed(content)
+    parser.close()
+    return parser.elements
+
+
+def parse_attributes(tag):
+    """Return the attributes of a tag as a dict."""
+    return {name.lower(): value[1:-1] for name, value in ATTRIBUTE.findall(tag)}
+
+
+def is_local(href):
+    """True for a page-relative URL."""
+    return bool(href) and not re.match(r'^(?:[a-z]+:|//|/)', href, re.IGNORECASE)
+
+
+def head_styles(content, site_dir):
+    """The render-blocking CSS before <body>, in document order.
+
+    Returns a list of (match, kind, css) with kind 'inline' or 'link'.
+    """
+    body = BODY_START.search(content)
+    if not body:
+        return []
+    head = content[:body.start()]
+    styles = []
+    for match in STYLE_BLOCK.finditer(head):
+        if 'media' not in parse_attributes(f"<style{match.group(1)}>"):
+            styles.append((match, 'inline', match.group(2)))
+    for match in LINK_TAG.finditer(head):
+        attrs = parse_attributes(match.group(0))
+        href = attrs.get('href', '')
+        if attrs.get('rel', '').lower() == 'stylesheet' and 'media' not in attrs and is_local(href):
+            path = Path(site_dir) / href.removeprefix('./')
+            if path.is_file():
+                styles.append((match, 'link', path.read_text(encoding='utf-8')))
+    return sorted(styles, key=lambda style: style[0].start())
+
+
+def page_runtime_classes(content, site_dir):
+    """Classes the page's inline and local scripts add at runtime."""
+    scripts = []
+    for attrs, body in SCRIPT_BLOCK.findall(content):
+        src = parse_attributes(f"<script{attrs}>").get('src')
+        if is_local(src) and (Path(site_dir) / src).is_file():
+            scripts.append((Path(site_dir) / src).read_text(encoding='utf-8'))
+        scripts.append(body)
+    return frozenset(css_tools.runtime_classes('\n'.join(scripts)))
+
+
+def split_rules(rules, elements, runtime):
+    """Split parsed rules into (critical, deferred) by the viewport elements."""
+    critical = []
+    deferred = []
+    for rule in rules:
+        if rule['type'] == 'group':
+            if rule['name'] == 'media' and re.search(r'\bprint\b', rule['prelude']) and 'screen' not in rule['prelude']:
+                deferred.append(rule)
+                continue
+            inner_critical, inner_deferred = split_rules(rule['rules'], elements, runtime)
+            if inner_critical:
+                critical.append(dict(rule, rules=inner_critical))
+            if inner_deferred:
+                deferred.append(dict(rule, rules=inner_deferred))
+        elif rule['type'] == 'style':
+            (critical if css_tools.rule_matches_any(rule, elements, runtime) else deferred).append(rule)
+        elif rule['type'] == 'statement':
+            critical.append(rule)
+        else:
+            # @keyframes / @font-face are placed once the critical rules are known
+            deferred.append(rule)
+    return critical, deferred
+
+
+def promote_at_rules(critical, deferred):
+    """Move the @keyframes and @font-face the critical rules use into them."""
+    critical_text = css_tools.serialize(critical)
+    names = css_tools.animation_names(critical_text)
+    families = css_tools.font_families(critical_text)
+    promoted = []
+    kept = []
+    for rule in deferred:
+        if rule['type'] == 'at' and rule['name'] == 'keyframes':
+            used = rule['prelude'].split(None, 1)[-1].strip() in names
+        elif rule['type'] == 'at' and rule['name'] == 'font-face':
+            used = any(family in rule['body'].lower() for family in families)
+        else:
+            used = False
+        (promoted if used else kept).append(rule)
+    return critical + promoted, kept
+
+
+def extract_critical(content, site_dir):
+    """Return (critical_css, deferred_css_list, blocking_bytes) for a page.
+
+    deferred_css_list has one entry per <style> block that is loaded
+    asynchronously, in document order.
+    """
+    styles = head_styles(content, site_dir)
+    elements = fold_elements(content)
+    runtime = page_runtime_classes(content, site_dir)
+
+    critical = []
+    deferred = []
+    deferred_blocks = []
+    leading = True
+    for match, kind, css in styles:
+        rules = css_tools.parse_stylesheet(css)
+        page_critical, page_deferred = split_rules(rules, elements, runtime)
+        critical.extend(page_critical)
+        deferred.extend(page_deferred)
+        # Everything from the first block with deferred rules on reloads in full
+        leading = leading and kind == 'inline' and not page_deferred
+        if kind == 'inline' and not leading:
+            deferred_blocks.append(css_tools.serialize(rules))
+    critical, _ = promote_at_rules(critical, deferred)
+
+    blocking = sum(len(css.encode('utf-8')) for match, kind, css in styles)
+    return css_tools.serialize(critical), deferred_blocks, blocking
+
+
+def deferred_name(page_name, index=0):
+    """File holding one of a page's deferred <style> blocks."""
+    suffix = DEFERRED_SUFFIX if index == 0 else f".deferred-{index + 1}.css"
+    return Path(page_name).stem + suffix
+
+
+def deferred_names(page_name, entry):
+    """Every deferred file a page's critical CSS entry loads."""
+    return [deferred_name(page_name, index) for index in range(len(entry['deferred']))]
+
+
+def async_stylesheet(href):
+    """Markup that loads a stylesheet without blocking rendering."""
+    return (f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            f'<noscript><link rel="stylesheet" href="{href}"></noscript>\n')
+
+
+def prepare_critical(context):
+    """Extract each page's critical CSS and write its deferred stylesheet."""
+    site_dir = context['site_dir']
+    cache_dir = context.get('cache_dir', CACHE_DIR)
+    manifest = load_manifest(MANIFEST_NAME, cache_dir)
+    code_digest = json_digest([file_digest(__file__), file_digest(css_tools.__file__)])
+    pages = {}
+    reused = 0
+
+    for path in sorted(site_dir.glob('*.html')):
+        content = path.read_text(encoding='utf-8')
+        styles = head_styles(content, site_dir)
+        if not styles:
+            continue
+        key = json_digest([text_digest(content), [text_digest(css) for _, _, css in styles], code_digest])
+        cached = manifest.get(path.name)
+        if cached and cached['key'] == key:
+            entry = cached
+            reused += 1
+        else:
+            critical, deferred, blocking = extract_critical(content, site_dir)
+            entry = {'key': key, 'critical': critical, 'deferred': deferred, 'blocking_bytes': blocking}
+        pages[path.name] = entry
+
+        for index, css in enumerate(entry['deferred']):
+            write_text(site_dir / deferred_name(path.name, index), css + '\n')
+
+    # Deferred files an earlier build wrote for blocks that are gone
+    for path in site_dir.glob("*.deferred*.css"):
+        match = DEFERRED_FILE.match(path.name)
+        entry = pages.get(f"{match.group(1)}.html") if match else None
+        if match and (entry is None or path.name not in deferred_names(match.group(1) + '.html', entry)):
+            remove_file(path)
+
+    if pages != manifest:
+        save_manifest(MANIFEST_NAME, pages, cache_dir)
+
+    blocking = sum(entry['blocking_bytes'] for entry in pages.values())
+    inlined = sum(len(entry['critical'].encode('utf-8')) for entry in pages.values())
+    print(f"🎯 Critical CSS for {len(pages)} pages ({reused} cached): "
+          f"{blocking:,} render-blocking bytes -> {inlined:,} inlined")
+    context['critical_css'] = pages
+
+
+@register_stage(
+    'critical-css',
+    'Inline the CSS the first screen needs and load the rest asynchronously',
+    group='build',
+    prepare=prepare_critical,
+)
+def inline_critical_css(page):
+    """Replace render-blocking head CSS with the critical rules and async loads"""
+    entry = page['context']['critical_css'].get(page['name'])
+    if not entry:
+        return
+    content = page['content']
+    styles = head_styles(content, page['context']['site_dir'])
+    if not styles:
+        return
+
+    # Leading all-critical <style> blocks have no deferred file: they are only inlined
+    leading = sum(1 for match, kind, css in styles if kind == 'inline') - len(entry['deferred'])
+    replacements = []
+    inline_index = 0
+    for match, kind, css in styles:
+        if kind == 'link':
+            replacements.append(async_stylesheet(parse_attributes(match.group(0))['href']))
+        else:
+            index = inline_index - leading
+            replacements.append(async_stylesheet(deferred_name(page['name'], index)) if index >= 0 else '')
+            inline_index += 1
+    if entry['critical']:
+        replacements[0] = f"<style>\n{entry['critical']}\n</style>\n" + replacements[0]
+
+    # Every style loads from where it was, so the cascade keeps its order
+    for (match, kind, css), replacement in reversed(list(zip(styles, replacements))):
+        content = content[:match.start()] + replacement + content[match.end():]
+    page['content'] = content
+
+    inlined = len(entry['critical'].encode('utf-8'))
+    page['counters']['render_blocking_bytes_saved'] = entry['blocking_bytes'] - inlined
+    page['log'].append(f"✅ Inlined {inlined:,} bytes of critical CSS, "
+                       f"{entry['blocking_bytes'] - inlined:,} render-blocking bytes deferred")
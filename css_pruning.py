@@ -0,0 +1,241 @@
+"""
+Unused CSS Pruning Stage
+Build stage (see build_site.py) that drops CSS rules which can never match
+anything on the pages that load them.
+
+A selector index (tags, ids, classes and attribute names, per element) is
+built from every page with html.parser. A rule is kept if any of its
+selectors has every compound - e.g. 'nav', 'ul.nav-links', 'a:hover' - match
+some element of a page that loads the stylesheet; combinators and
+pseudo-classes are ignored, so a rule is only removed when it provably
+applies to nothing.
+
+Classes added by scripts at runtime are safelisted: every string passed to
+classList.add/toggle/replace or assigned to className, class names inside
+markup strings in scripts, and SAFELIST below. @keyframes survive if the
+kept CSS or any script (element.style.animation) still names them.
+
+Local stylesheets are pruned in dist/ against the pages that link them (or
+whose scripts mention them); stylesheets no page loads are left alone.
+Inline <style> blocks are pruned against their own page.
+"""
+
+import re
+from html.parser import HTMLParser
+
+import css_tools
+from critical_css import SCRIPT_BLOCK, STYLE_BLOCK, deferred_names, is_local, parse_attributes
+from file_writes import write_text
+from site_pipeline import register_stage
+
+# Classes added at runtime that the script scan cannot see
+SAFELIST = {'loading', 'loaded', 'active', 'hidden', 'collapsed', 'fonts-loaded', 'animations-loaded'}
+
+MARKUP_CLASS = re.compile(r'''class\s*=\s*\\?["']([^"'\\]*)''')
+MARKUP_ID = re.compile(r'''(?:\bid\s*=\s*\\?["']|\.id\s*=\s*["'])([^"'\\]*)''')
+CREATED_TAG = re.compile(r'''createElement\(\s*["'](\w+)["']''')
+STYLESHEET_LINK = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+
+
+class ElementCollector(HTMLParser):
+    """Collect the distinct (tag, id, classes, attrs) signatures of a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.signatures = set()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.signatures.add((
+            tag,
+            attrs.get('id'),
+            frozenset((attrs.get('class') or '').split()),
+            frozenset(attrs),
+        ))
+
+
+def page_signatures(content):
+    """Element signatures of a page."""
+    collector = ElementCollector()
+    collector.feed(content)
+    collector.close()
+    return collector.signatures
+
+
+def script_signatures(script):
+    """Pseudo-elements for what scripts create: new tags, ids and markup classes."""
+    signatures = {(tag.lower(), None, frozenset(), frozenset()) for tag in CREATED_TAG.findall(script)}
+    for value in MARKUP_ID.findall(script):
+        signatures.add(('*', value, frozenset(), frozenset()))
+    for value in MARKUP_CLASS.findall(script):
+        signatures.add(('*', None, frozenset(value.split()), frozenset()))
+    return signatures
+
+
+def build_index(signatures):
+    """Turn signatures into element dicts for css_tools matching."""
+    return [{'tag': tag, 'id': id_, 'classes': set(classes), 'attrs': set(attrs), 'parent': None}
+            for tag, id_, classes, attrs in signatures]
+
+
+def compound_may_match(compound, elements, runtime):
+    """Whether some element could satisfy a compound selector."""
+    if any(css_tools.compound_matches(compound, element, runtime) for element in elements):
+        return True
+    # Script-created elements ('*') may carry any tag
+    untagged = dict(compound, tag=None)
+    return any(element['tag'] == '*' and css_tools.compound_matches(untagged, element, runtime)
+               for element in elements)
+
+
+def selector_may_match(selector, elements, runtime):
+    """False only if some compound of the selector matches no element at all."""
+    parts = css_tools.parse_selector(selector)
+    if parts is None:
+        return True
+    return all(compound_may_match(compound, elements, runtime) for _, compound in parts)
+
+
+def prune_rules(rules, elements, runtime):
+    """Return (kept_rules, removed_selectors) for a parsed stylesheet."""
+    kept = []
+    removed = 0
+    for rule in rules:
+        if rule['type'] == 'group':
+            inner, inner_removed = prune_rules(rule['rules'], elements, runtime)
+            removed += inner_removed
+            if inner:
+                kept.append(dict(rule, rules=inner))
+        elif rule['type'] == 'style':
+            selectors = [s for s in rule['selectors'] if selector_may_match(s, elements, runtime)]
+            removed += len(rule['selectors']) - len(selectors)
+            if not selectors:
+                continue
+            if selectors == rule['selectors']:
+                kept.append(rule)
+            else:
+                kept.append(dict(rule, prelude=', '.join(selectors), selectors=selectors))
+        else:
+            kept.append(rule)
+    return kept, removed
+
+
+def drop_unused_keyframes(rules, referenced):
+    """Remove @keyframes whose name nothing references."""
+    kept = []
+    for rule in rules:
+        if rule['type'] == 'group':
+            rule = dict(rule, rules=drop_unused_keyframes(rule['rules'], referenced))
+        elif rule['type'] == 'at' and rule['name'] == 'keyframes':
+            if rule['prelude'].split(None, 1)[-1].strip() not in referenced:
+                continue
+        kept.append(rule)
+    return kept
+
+
+def prune_css(css, elements, runtime, scripts):
+    """Prune a stylesheet; returns (css, removed_selectors), the input itself if nothing goes."""
+    parsed = css_tools.parse_stylesheet(css)
+    rules, removed = prune_rules(parsed, elements, runtime)
+    referenced = css_tools.animation_names(css_tools.serialize(rules)) | set(re.findall(r'[\w-]+', scripts))
+    pruned = css_tools.serialize(drop_unused_keyframes(rules, referenced))
+    if pruned == css_tools.serialize(parsed):
+        return css, 0
+    return pruned + '\n', removed
+
+
+def page_scripts(content, site_dir):
+    """The page's inline scripts plus the local scripts it loads."""
+    scripts = []
+    for attrs, body in SCRIPT_BLOCK.findall(content):
+        src = parse_attributes(f"<script{attrs}>").get('src')
+        if is_local(src) and (site_dir / src).is_file():
+            scripts.append((site_dir / src).read_text(encoding='utf-8'))
+        scripts.append(body)
+    return '\n'.join(scripts)
+
+
+def linked_stylesheets(content):
+    """Local stylesheets a page links or preloads."""
+    names = set()
+    for tag in STYLESHEET_LINK.findall(content):
+        attrs = parse_attributes(tag)
+        rel = attrs.get('rel', '').lower()
+        if (rel == 'stylesheet' or attrs.get('as') == 'style') and is_local(attrs.get('href')):
+            names.add(attrs['href'].removeprefix('./'))
+    return names
+
+
+def prepare_pruning(context):
+    """Index every page and prune the local stylesheets they load."""
+    site_dir = context['site_dir']
+    pages = {}
+    for path in sorted(site_dir.glob('*.html')):
+        content = path.read_text(encoding='utf-8')
+        scripts = page_scripts(content, site_dir)
+        stylesheets = linked_stylesheets(content)
+        if path.name in context.get('critical_css', {}):
+            # Linked by the critical-css stage, which has not rewritten the page yet
+            stylesheets.update(deferred_names(path.name, context['critical_css'][path.name]))
+        pages[path.name] = {
+            'signatures': page_signatures(content) | script_signatures(scripts),
+            'runtime': frozenset(SAFELIST | css_tools.runtime_classes(scripts)),
+            'stylesheets': stylesheets,
+            'scripts': scripts,
+        }
+
+    report = []
+    for path in sorted(site_dir.glob('*.css')):
+        # Loaded by a link tag, or by a script that names the file
+        loaders = [page for page in pages.values()
+                   if path.name in page['stylesheets'] or path.name in page['scripts']]
+        css = path.read_text(encoding='utf-8')
+        if not loaders:
+            report.append((path.name, len(css.encode('utf-8')), None, 0))
+            continue
+        elements = build_index(set().union(*(page['signatures'] for page in loaders)))
+        runtime = frozenset().union(*(page['runtime'] for page in loaders))
+        scripts = '\n'.join(page['scripts'] for page in loaders)
+        pruned, removed = prune_css(css, elements, runtime, scripts)
+        write_text(path, pruned)
+        report.append((path.name, len(css.encode('utf-8')), len(pruned.encode('utf-8')), removed))
+
+    print("✂️  Unused CSS in stylesheets:")
+    for name, before, after, removed in report:
+        if after is None:
+            print(f"  {name:<42}{before:>9,} bytes  not loaded by any page - left as is")
+        else:
+            print(f"  {name:<42}{before:>9,} -> {after:>9,} bytes  ({before - after:,} saved, {removed} selectors)")
+
+    context['css_pruning'] = pages
+
+
+@register_stage(
+    'prune-css',
+    'Drop CSS rules that match nothing on the pages that load them',
+    group='build',
+    prepare=prepare_pruning,
+)
+def prune_inline_styles(page):
+    """Prune each inline <style> block against its own page"""
+    index = page['context']['css_pruning'].get(page['name'])
+    if not index:
+        return
+    elements = build_index(index['signatures'])
+    saved = 0
+    removed_selectors = 0
+
+    def prune(match):
+        nonlocal saved, removed_selectors
+        css = match.group(2)
+        pruned, removed = prune_css(css, elements, index['runtime'], index['scripts'])
+        if pruned == css:
+            return match.group(0)
+        saved += len(css.encode('utf-8')) - len(pruned.encode('utf-8'))
+        removed_selectors += removed
+        return match.group(0).replace(css, '\n' + pruned, 1)
+
+    page['content'] = STYLE_BLOCK.sub(prune, page['content'])
+    page['counters']['css_bytes_pruned'] = saved
+    if saved:
+        page['log'].append(f"✅ Pruned {removed_selectors} unused selectors from inline styles ({saved:,} bytes)")
@@ -0,0 +1,446 @@
+"""
+CSS Tools
+A small CSS parser and selector matcher shared by the CSS build stages.
+
+Stylesheets parse into a list of rule dicts that serialize back to CSS:
+
+    {'type': 'style', 'prelude': 'nav a, .logo', 'selectors': [...], 'body': 'color: red;', 'body_offset': 14}
+    {'type': 'group', 'name': 'media', 'prelude': '@media (max-width: 768px)', 'rules': [...]}
+    {'type': 'at', 'name': 'keyframes', 'prelude': '@keyframes twinkle', 'body': '...'}
+    {'type': 'statement', 'name': 'import', 'prelude': '@import url(x.css)'}
+
+For checks rather than transforms, style_declarations() flattens a
+stylesheet into its declarations, each resolved with its selectors, the
+@media blocks around it and the range of viewport widths those allow, so
+"everything that only applies up to 768px wide" is one linear filter
+(declarations_under) instead of a regex over the raw text:
+
+    {'property': 'font-size', 'value': '14px', 'important': False,
+     'selectors': ('.nav a',), 'media': ('@media (max-width: 768px)',),
+     'min_width': None, 'max_width': 768.0, 'offset': 1234}
+
+Selector matching is deliberately conservative: anything it cannot decide
+(pseudo-classes, sibling combinators, attribute values, selectors it cannot
+parse) counts as a match, so callers only ever drop CSS that provably
+applies to nothing.
+"""
+
+import re
+from functools import lru_cache
+
+# At-rules whose block holds further rules rather than declarations
+GROUP_AT_RULES = {'media', 'supports', 'document', '-moz-document', 'layer', 'container'}
+
+STYLE_BLOCK = re.compile(r'<style\b([^>]*)>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+AT_RULE_NAME = re.compile(r'@([\w-]+)')
+SELECTOR_TOKEN = re.compile(
+    r'\s*([>+~])\s*'                         # combinator
+    r'|(\s+)'                                # descendant combinator
+    r'|(\*|[a-zA-Z][\w-]*)'                  # type selector
+    r'|#(-?[_a-zA-Z][\w-]*)'                 # id
+    r'|\.(-?[_a-zA-Z][\w-]*)'                # class
+    r'|\[\s*([\w:-]+)[^\]]*\]'               # attribute
+    r'|(::?)([\w-]+)(\()?'                   # pseudo-class / pseudo-element
+)
+ANIMATION_NAMES = re.compile(r'animation(?:-name)?\s*:\s*([^;}]+)')
+FONT_FAMILIES = re.compile(r'font(?:-family)?\s*:\s*([^;}]+)')
+RUNTIME_CLASS_CALL = re.compile(r'classList\.(?:add|toggle|replace)\(([^)]*)\)')
+RUNTIME_CLASS_NAME = re.compile(r'''(?:className\s*=|setAttribute\(\s*['"]class['"]\s*,)\s*(['"])([^'"]*)\1''')
+QUOTED = re.compile(r'''(['"])([^'"]*)\1''')
+IMPORTANT = re.compile(r'\s*!\s*important\s*$', re.IGNORECASE)
+WIDTH_FEATURE = re.compile(r'\(\s*(min|max)-width\s*:\s*([\d.]+)(px|r?em)\s*\)', re.IGNORECASE)
+# Range syntax, either way round: (width < 600px), (400px <= width <= 700px)
+WIDTH_RANGE = re.compile(r'(?<![\w-])width\s*([<>]=?)\s*([\d.]+)(px|r?em)', re.IGNORECASE)
+WIDTH_RANGE_BEFORE = re.compile(r'([\d.]+)(px|r?em)\s*([<>]=?)\s*width(?![\w-])', re.IGNORECASE)
+MEDIA_TYPE = re.compile(r'^(?:only\s+)?([a-z]+)\b(?!\s*:)', re.IGNORECASE)
+
+# Viewport width ranges are (min px, max px), None for an open end
+ANY_WIDTH = (None, None)
+# Pixels per em in media queries, which always use the initial font size
+EM_PX = 16
+
+
+def skip_string(text, i):
+    """Return the index just past the string literal starting at text[i]."""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def find_top_level(text, start, chars):
+    """Index of the first of chars outside strings and parentheses, or -1."""
+    depth = 0
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char in '"\'':
+            i = skip_string(text, i)
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0 and char in chars:
+            return i
+        i += 1
+    return -1
+
+
+def matching_brace(text, start):
+    """Index of the '}' closing the '{' at text[start] (or the end of text)."""
+    depth = 0
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char in '"\'':
+            i = skip_string(text, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(text)
+
+
+def split_selectors(prelude):
+    """Split a selector list on its top-level commas."""
+    selectors = []
+    depth = 0
+    current = ''
+    for char in prelude:
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        if char == ',' and depth == 0:
+            selectors.append(current.strip())
+            current = ''
+        else:
+            current += char
+    selectors.append(current.strip())
+    return [selector for selector in selectors if selector]
+
+
+def parse_stylesheet(text):
+    """Parse CSS text into a list of rule dicts (comments are dropped)."""
+    return _parse_rules(COMMENT.sub('', text))
+
+
+def blank_comments(text):
+    """Replace comments with spaces, so offsets into the result are offsets into the text."""
+    return COMMENT.sub(lambda match: re.sub(r'[^\n]', ' ', match.group(0)), text)
+
+
+def _parse_rules(text, base=0):
+    rules = []
+    i = 0
+    while i < len(text):
+        j = find_top_level(text, i, '{;}')
+        if j == -1:
+            break
+        prelude = text[i:j].strip()
+        if text[j] != '{':
+            # A statement at-rule (@import, @charset) or a stray ';' / '}'
+            if prelude.startswith('@'):
+                rules.append({'type': 'statement', 'name': at_rule_name(prelude), 'prelude': prelude})
+            i = j + 1
+            continue
+
+        end = matching_brace(text, j)
+        body = text[j + 1:end]
+        if prelude.startswith('@'):
+            name = at_rule_name(prelude)
+            if name in GROUP_AT_RULES:
+                rules.append({'type': 'group', 'name': name, 'prelude': prelude,
+                              'rules': _parse_rules(body, base + j + 1)})
+            else:
+                rules.append({'type': 'at', 'name': name, 'prelude': prelude, 'body': body})
+        elif prelude:
+            rules.append({'type': 'style', 'prelude': prelude, 'selectors': split_selectors(prelude), 'body': body,
+                          'body_offset': base + j + 1})
+        i = end + 1
+    return rules
+
+
+def at_rule_name(prelude):
+    """Lower-case name of an at-rule, without vendor prefixes for keyframes."""
+    match = AT_RULE_NAME.match(prelude)
+    name = match.group(1).lower() if match else ''
+    return 'keyframes' if name.endswith('-keyframes') else name
+
+
+def serialize(rules, indent=''):
+    """Turn parsed rules back into CSS text."""
+    lines = []
+    for rule in rules:
+        if rule['type'] == 'statement':
+            lines.append(f"{indent}{rule['prelude']};")
+        elif rule['type'] == 'group':
+            inner = serialize(rule['rules'], indent + '  ')
+            if inner:
+                lines.append(f"{indent}{rule['prelude']} {{\n{inner}\n{indent}}}")
+        else:
+            lines.append(f"{indent}{rule['prelude']} {{{rule['body']}}}")
+    return '\n'.join(lines)
+
+
+def count_style_rules(rules):
+    """Number of style rules, including those nested in groups."""
+    return sum(count_style_rules(rule['rules']) if rule['type'] == 'group' else rule['type'] == 'style'
+               for rule in rules)
+
+
+def parse_declarations(body, base=0):
+    """(property, value, important, offset) for each declaration in a block body."""
+    declarations = []
+    i = 0
+    while i < len(body):
+        end = find_top_level(body, i, ';')
+        if end == -1:
+            end = len(body)
+        text = body[i:end]
+        if ':' in text:
+            name, value = text.split(':', 1)
+            important = bool(IMPORTANT.search(value))
+            offset = base + i + len(text) - len(text.lstrip())
+            declarations.append((name.strip().lower(), IMPORTANT.sub('', value).strip(), important, offset))
+        i = end + 1
+    return declarations
+
+
+def media_width_range(prelude):
+    """Viewport widths a media query list can match on screen, or None if it cannot.
+
+    Only width features narrow the range; any other feature (orientation,
+    hover, prefers-*) may or may not hold, so it is assumed to. A 'not' query
+    could match at any width.
+    """
+    queries = [query.strip() for query in split_selectors(re.sub(r'^@media\b', '', prelude.strip(), flags=re.I))]
+    ranges = []
+    for query in queries or ['all']:
+        if query.lower().startswith('not '):
+            ranges.append(ANY_WIDTH)
+            continue
+        media_type = MEDIA_TYPE.match(query)
+        if media_type and media_type.group(1).lower() not in ('all', 'screen'):
+            # print, speech, ...
+            continue
+        low, high = ANY_WIDTH
+        bounds = [(kind.lower(), number, unit) for kind, number, unit in WIDTH_FEATURE.findall(query)]
+        bounds += [('min' if operator.startswith('>') else 'max', number, unit)
+                   for operator, number, unit in WIDTH_RANGE.findall(query)]
+        bounds += [('min' if operator.startswith('<') else 'max', number, unit)
+                   for number, unit, operator in WIDTH_RANGE_BEFORE.findall(query)]
+        for kind, number, unit in bounds:
+            px = float(number) * (1 if unit.lower() == 'px' else EM_PX)
+            if kind == 'min':
+                low = px if low is None else max(low, px)
+            else:
+                high = px if high is None else min(high, px)
+        if low is None or high is None or low <= high:
+            ranges.append((low, high))
+    if not ranges:
+        return None
+    # A list matches where any of its queries does
+    low = None if any(r[0] is None for r in ranges) else min(r[0] for r in ranges)
+    high = None if any(r[1] is None for r in ranges) else max(r[1] for r in ranges)
+    return low, high
+
+
+def intersect_widths(outer, inner):
+    """Widths within both ranges (None if there are none)."""
+    if outer is None or inner is None:
+        return None
+    low = max((w for w in (outer[0], inner[0]) if w is not None), default=None)
+    high = min((w for w in (outer[1], inner[1]) if w is not None), default=None)
+    if low is not None and high is not None and low > high:
+        return None
+    return low, high
+
+
+@lru_cache(maxsize=256)
+def style_declarations(text, media=''):
+    """Every declaration of a stylesheet, resolved with its selector and media context.
+
+    media is a media query the whole sheet sits under (a <style media="...">).
+    Offsets point into text. The result is cached per stylesheet content,
+    so the same inline <style> on many pages is parsed once; callers must
+    not modify it.
+    """
+    widths = media_width_range(media) if media else ANY_WIDTH
+    declarations = []
+    if widths is not None:
+        _collect_declarations(_parse_rules(blank_comments(text)), (media,) if media else (), widths, declarations)
+    return tuple(declarations)
+
+
+def _collect_declarations(rules, media, widths, declarations):
+    for rule in rules:
+        if rule['type'] == 'group':
+            if rule['name'] == 'media':
+                inner = intersect_widths(widths, media_width_range(rule['prelude']))
+                if inner is not None:
+                    _collect_declarations(rule['rules'], media + (rule['prelude'],), inner, declarations)
+            else:
+                _collect_declarations(rule['rules'], media, widths, declarations)
+        elif rule['type'] == 'style':
+            for name, value, important, offset in parse_declarations(rule['body'], rule['body_offset']):
+                declarations.append({
+                    'property': name,
+                    'value': value,
+                    'important': important,
+                    'selectors': tuple(rule['selectors']),
+                    'media': media,
+                    'min_width': widths[0],
+                    'max_width': widths[1],
+                    'offset': offset,
+                })
+
+
+def declarations_under(declarations, max_width):
+    """The declarations that only apply at viewport widths up to max_width px."""
+    return [declaration for declaration in declarations
+            if declaration['max_width'] is not None and declaration['max_width'] <= max_width]
+
+
+def inline_styles(html):
+    """(offset, css, media) for every <style> block of a page."""
+    for match in STYLE_BLOCK.finditer(html):
+        media = re.search(r'\bmedia\s*=\s*["\']([^"\']*)', match.group(1), re.IGNORECASE)
+        yield match.start(2), match.group(2), media.group(1) if media else ''
+
+
+def parse_selector(selector):
+    """Parse a complex selector into [(combinator, compound), ...] from left to right.
+
+    Each compound is {'tag', 'ids', 'classes', 'attrs'}. Returns None when the
+    selector uses syntax this parser does not understand.
+    """
+    parts = []
+    combinator = None
+    compound = None
+    i = 0
+    selector = selector.strip()
+    while i < len(selector):
+        match = SELECTOR_TOKEN.match(selector, i)
+        if not match or match.end() == i:
+            return None
+        i = match.end()
+        explicit, descendant, tag, id_, cls, attr, colons, pseudo, paren = match.groups()
+
+        if explicit or descendant:
+            if compound is None:
+                return None
+            parts.append((combinator, compound))
+            combinator = explicit or ' '
+            compound = None
+            continue
+
+        if compound is None:
+            compound = {'tag': None, 'ids': set(), 'classes': set(), 'attrs': set()}
+        if tag:
+            compound['tag'] = None if tag == '*' else tag.lower()
+        elif id_:
+            compound['ids'].add(id_)
+        elif cls:
+            compound['classes'].add(cls)
+        elif attr:
+            compound['attrs'].add(attr.lower())
+        elif pseudo:
+            if colons == ':' and pseudo.lower() == 'root':
+                compound['tag'] = 'html'
+            if paren:
+                # :not(...), :nth-child(...) etc. are ignored - skip the argument
+                depth = 1
+                while i < len(selector) and depth:
+                    depth += {'(': 1, ')': -1}.get(selector[i], 0)
+                    i += 1
+
+    if compound is None:
+        return None
+    parts.append((combinator, compound))
+    return parts
+
+
+def compound_matches(compound, element, runtime_classes=frozenset()):
+    """Check a compound selector against an element dict."""
+    if compound['tag'] and compound['tag'] != element['tag']:
+        return False
+    if compound['ids'] and compound['ids'] != {element['id']}:
+        return False
+    if not compound['classes'] <= (element['classes'] | runtime_classes):
+        return False
+    return compound['attrs'] <= element['attrs']
+
+
+def selector_matches(parts, element, runtime_classes=frozenset()):
+    """Check a parsed selector against an element dict (with 'parent' links).
+
+    Classes in runtime_classes count as present on every element, since
+    scripts may add them at any time.
+    """
+    return _matches_from(parts, len(parts) - 1, element, runtime_classes)
+
+
+def _matches_from(parts, index, element, runtime_classes):
+    combinator, compound = parts[index]
+    if not compound_matches(compound, element, runtime_classes):
+        return False
+    if index == 0:
+        return True
+    if combinator == '>':
+        parent = element['parent']
+        return parent is not None and _matches_from(parts, index - 1, parent, runtime_classes)
+    if combinator == ' ':
+        ancestor = element['parent']
+        while ancestor is not None:
+            if _matches_from(parts, index - 1, ancestor, runtime_classes):
+                return True
+            ancestor = ancestor['parent']
+        return False
+    # Siblings are not tracked - assume one exists
+    return True
+
+
+def rule_matches_any(rule, elements, runtime_classes=frozenset()):
+    """Check whether any selector of a style rule matches any of the elements."""
+    for selector in rule['selectors']:
+        parts = parse_selector(selector)
+        if parts is None:
+            return True
+        if any(selector_matches(parts, element, runtime_classes) for element in elements):
+            return True
+    return False
+
+
+def animation_names(css):
+    """Names referenced by animation / animation-name declarations."""
+    names = set()
+    for value in ANIMATION_NAMES.findall(css):
+        names.update(re.findall(r'-?[_a-zA-Z][\w-]*', value))
+    return names
+
+
+def font_families(css):
+    """Family names referenced by font / font-family declarations."""
+    families = set()
+    for value in FONT_FAMILIES.findall(css):
+        families.update(name.strip().strip('\'"').lower() for name in value.split(','))
+    return families
+
+
+def runtime_classes(script):
+    """Class names a script adds through classList, className or setAttribute."""
+    classes = set()
+    for arguments in RUNTIME_CLASS_CALL.findall(script):
+        for _, value in QUOTED.findall(arguments):
+            classes.update(value.split())
+    for _, value in RUNTIME_CLASS_NAME.findall(script):
+        classes.update(value.split())
+    return classes
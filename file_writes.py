@@ -0,0 +1,148 @@
+"""
+File Writes
+The one way the scripts change files: atomic, skipped when nothing changes,
+and previewable.
+
+    write_text(path, text)       # True if the file changed (or would have)
+    write_bytes(path, data)
+    copy_file(source, target)    # keeps the source's modification time
+    replace_file(temp, target)   # move a finished streamed temp file into place
+    remove_file(path)
+
+A write whose content is already on disk does nothing, so modification times
+only move when content does - and with them CDN invalidations and the
+freshness the sitemaps report. A real write goes to a temporary file next to
+the target, is flushed to disk and renamed over the target, so an interrupted
+run leaves the old file or the new one, never a truncated page.
+
+In dry-run mode (set_dry_run(True), or --dry-run on the scripts that write
+source files) nothing is written: every change is printed as a unified diff
+instead, with a one-line note for binary files and deletions.
+"""
+
+import difflib
+import filecmp
+import os
+import shutil
+import sys
+from pathlib import Path
+
+_dry_run = False
+
+
+def set_dry_run(enabled):
+    """Turn dry-run mode on or off for every later write."""
+    global _dry_run
+    _dry_run = bool(enabled)
+
+
+def dry_run_enabled():
+    return _dry_run
+
+
+def add_dry_run_argument(parser):
+    """The shared --dry-run command line flag."""
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print unified diffs of the changes instead of writing any file')
+
+
+def display_name(path):
+    """Path relative to the working directory where possible, for diffs."""
+    try:
+        return Path(path).resolve().relative_to(Path.cwd()).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def read_existing(path):
+    """Current bytes of a file, or None if it does not exist."""
+    try:
+        return Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def print_diff(path, old, new):
+    """Show a pending change to a file."""
+    name = display_name(path)
+    try:
+        old_text = old.decode('utf-8') if old is not None else ''
+        new_text = new.decode('utf-8')
+    except UnicodeDecodeError:
+        size = 'new file' if old is None else f"{len(old):,} -> {len(new):,} bytes"
+        print(f"Binary file {name} would change ({size})")
+        return
+    lines = difflib.unified_diff(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                 '/dev/null' if old is None else f"a/{name}", f"b/{name}")
+    for line in lines:
+        sys.stdout.write(line if line.endswith('\n') else line + '\n\\ No newline at end of file\n')
+
+
+def write_bytes(path, data, mtime_from=None):
+    """Write bytes atomically unless the file already holds them; returns True if it changed."""
+    path = Path(path)
+    old = read_existing(path)
+    if old == data:
+        return False
+    if _dry_run:
+        print_diff(path, old, data)
+        return True
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if old is not None:
+            shutil.copymode(path, temp_path)
+        if mtime_from is not None:
+            shutil.copystat(mtime_from, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return True
+
+
+def write_text(path, text, encoding='utf-8'):
+    """Write text atomically unless the file already holds it; returns True if it changed."""
+    return write_bytes(path, text.encode(encoding))
+
+
+def copy_file(source, target):
+    """Copy a file (with its modification time) unless the target is already identical."""
+    return write_bytes(target, Path(source).read_bytes(), mtime_from=source)
+
+
+def replace_file(temp_path, target):
+    """Move a finished temporary file over the target, or drop it when identical."""
+    temp_path = Path(temp_path)
+    target = Path(target)
+    try:
+        if target.exists() and filecmp.cmp(temp_path, target, shallow=False):
+            return False
+        if _dry_run:
+            print_diff(target, read_existing(target), temp_path.read_bytes())
+            return True
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        if target.exists():
+            shutil.copymode(target, temp_path)
+        os.replace(temp_path, target)
+        return True
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def remove_file(path):
+    """Delete a file if it exists; returns True if it did."""
+    path = Path(path)
+    if not path.exists():
+        return False
+    if _dry_run:
+        print(f"Would delete {display_name(path)}")
+        return True
+    path.unlink()
+    return True
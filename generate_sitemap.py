@@ -10,35 +10,93 @@ The script will:
 1. Scan for all HTML files in the current directory
 2. Generate an XML sitemap for search engines
 3. Update the HTML sitemap with new pages
-4. Set appropriate priorities and change frequencies based on page type
+4. Set change frequencies based on page type and priorities from the
+   internal link graph (see link_graph.py)
+
+Builds are incremental: a manifest of per-page content hashes and the
+configuration is kept in .build-cache/sitemap.json. When nothing changed the
+outputs are left untouched (including the "Last Updated" stamp); when a few
+pages changed only their entries are rebuilt. Use --force to rebuild all.
+
+sitemap.html is rendered from templates/sitemap.html and
+templates/partials/sitemap-link.html (see templates.py).
+
+sitemap.xml is streamed to disk entry by entry. Past the protocol limits
+(50,000 URLs or 50 MB) it is split into sitemap-1.xml, sitemap-2.xml, ...
+with a sitemap_index.xml; --gzip also writes .xml.gz copies.
+
+Each page's lastmod is the date of the last commit that changed it, resolved
+in one batched git history walk (see site_history.py).
 """
 
-import os
+import argparse
 import datetime
 from pathlib import Path
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+
+from build_cache import file_digest, json_digest, text_digest, load_manifest, save_manifest
+from file_writes import add_dry_run_argument, set_dry_run, write_text
+from link_graph import crawl_site, find_orphans, page_priorities
+from site_history import resolve_lastmod
+import sitemap_writer
+from sitemap_writer import SitemapWriter
+from templates import Environment
 
 # Configuration
 DOMAIN = "https://kitchener-waterloo-wizards.com"
 CURRENT_DIR = Path(__file__).parent
 
-# Page priorities and change frequencies based on content type
+# Change frequencies and listings based on content type; priorities come from
+# the link graph (link_graph.page_priorities)
 PAGE_CONFIG = {
-    'index.html': {'priority': '1.0', 'changefreq': 'weekly', 'description': 'Welcome to the Wizards - Magic on the Court!', 'icon': '🏠', 'category': 'Main Pages'},
-    'about.html': {'priority': '0.9', 'changefreq': 'monthly', 'description': 'Learn about our basketball association and mission', 'icon': 'ℹ️', 'category': 'Main Pages'},
-    'registration.html': {'priority': '0.9', 'changefreq': 'weekly', 'description': 'Sign up for programs and teams', 'icon': '📝', 'category': 'Registration & Events'},
-    'rep-teams.html': {'priority': '0.8', 'changefreq': 'monthly', 'description': 'Competitive basketball teams and tryout information', 'icon': '🏆', 'category': 'Programs & Training'},
-    'development.html': {'priority': '0.8', 'changefreq': 'monthly', 'description': 'Skill development programs for all ages', 'icon': '📈', 'category': 'Programs & Training'},
-    'individual-training.html': {'priority': '0.7', 'changefreq': 'monthly', 'description': 'One-on-one coaching and personal development', 'icon': '👤', 'category': 'Programs & Training'},
-    'upcoming-events.html': {'priority': '0.6', 'changefreq': 'weekly', 'description': 'Games, tournaments, and special events', 'icon': '📅', 'category': 'Registration & Events'},
-    'photo-gallery.html': {'priority': '0.5', 'changefreq': 'monthly', 'description': 'Photos from games, events, and team activities', 'icon': '📷', 'category': 'Media'},
-    'u11-rep-tryouts-flyer.html': {'priority': '0.4', 'changefreq': 'yearly', 'description': 'Information about U11 rep team tryouts', 'icon': '🔥', 'category': 'Registration & Events'},
-    'sitemap.html': {'priority': '0.3', 'changefreq': 'monthly', 'description': 'Complete site navigation and page directory', 'icon': '🗺️', 'category': 'Navigation'}
+    'index.html': {'changefreq': 'weekly', 'description': 'Welcome to the Wizards - Magic on the Court!', 'icon': '🏠', 'category': 'Main Pages'},
+    'about.html': {'changefreq': 'monthly', 'description': 'Learn about our basketball association and mission', 'icon': 'ℹ️', 'category': 'Main Pages'},
+    'registration.html': {'changefreq': 'weekly', 'description': 'Sign up for programs and teams', 'icon': '📝', 'category': 'Registration & Events'},
+    'rep-teams.html': {'changefreq': 'monthly', 'description': 'Competitive basketball teams and tryout information', 'icon': '🏆', 'category': 'Programs & Training'},
+    'development.html': {'changefreq': 'monthly', 'description': 'Skill development programs for all ages', 'icon': '📈', 'category': 'Programs & Training'},
+    'individual-training.html': {'changefreq': 'monthly', 'description': 'One-on-one coaching and personal development', 'icon': '👤', 'category': 'Programs & Training'},
+    'upcoming-events.html': {'changefreq': 'weekly', 'description': 'Games, tournaments, and special events', 'icon': '📅', 'category': 'Registration & Events'},
+    'photo-gallery.html': {'changefreq': 'monthly', 'description': 'Photos from games, events, and team activities', 'icon': '📷', 'category': 'Media'},
+    'u11-rep-tryouts-flyer.html': {'changefreq': 'yearly', 'description': 'Information about U11 rep team tryouts', 'icon': '🔥', 'category': 'Registration & Events'},
+    'sitemap.html': {'changefreq': 'monthly', 'description': 'Complete site navigation and page directory', 'icon': '🗺️', 'category': 'Navigation'}
 }
 
 # Default configuration for new pages
-DEFAULT_CONFIG = {'priority': '0.5', 'changefreq': 'monthly', 'description': 'Basketball association page', 'icon': '🏀', 'category': 'Other Pages'}
+DEFAULT_CONFIG = {'changefreq': 'monthly', 'description': 'Basketball association page', 'icon': '🏀', 'category': 'Other Pages'}
+
+# Priority of pages the link graph does not cover
+DEFAULT_PRIORITY = '0.5'
+
+# Friendly titles for the HTML sitemap
+PAGE_TITLES = {
+    'index.html': 'Homepage',
+    'about.html': 'About Us',
+    'registration.html': 'Registration',
+    'rep-teams.html': 'Rep Teams',
+    'development.html': 'Development Program',
+    'individual-training.html': 'Individual Training',
+    'upcoming-events.html': 'Upcoming Events',
+    'photo-gallery.html': 'Photo Gallery',
+    'u11-rep-tryouts-flyer.html': 'U11 Rep Tryouts',
+    'sitemap.html': 'Site Map'
+}
+
+# Category order and icons for the HTML sitemap
+CATEGORY_INFO = {
+    'Main Pages': '🏠',
+    'Programs & Training': '🏀',
+    'Registration & Events': '📝',
+    'Media': '📸',
+    'Navigation': '🗺️',
+    'Other Pages': '📄'
+}
+
+# Name of the incremental build manifest in .build-cache/
+MANIFEST_NAME = 'sitemap'
+
+# Layout of sitemap.html and of one page in it (see templates/)
+TEMPLATES = Environment()
+SITEMAP_TEMPLATE = 'sitemap.html'
+LINK_TEMPLATE = 'partials/sitemap-link.html'
 
 def get_html_files():
     """Get all HTML files in the current directory."""
@@ -48,7 +106,8 @@ def get_html_files():
         'sitemap.html',  # Don't include the sitemap itself
         'index-mobile-optimized.html',  # Mobile variants should not be in sitemap
         'index-smooth-mobile.html',
-        'index-ultra-mobile.html'
+        'index-ultra-mobile.html',
+        'test-mobile-performance.html'  # Test page, never published
     }
     
     for file in CURRENT_DIR.glob('*.html'):
@@ -57,375 +116,223 @@ def get_html_files():
     return sorted(html_files)
 
 def get_file_modified_date(filename):
-    """Get the last modified date of a file."""
-    try:
-        timestamp = os.path.getmtime(CURRENT_DIR / filename)
-        return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
-    except:
-        return datetime.datetime.now().strftime('%Y-%m-%d')
+    """Get the date of the last commit that changed a file (see site_history.py)."""
+    return get_lastmod_dates([filename])[filename]
+
+def get_lastmod_dates(html_files):
+    """Get the last content change date of every page in one batch."""
+    return resolve_lastmod(CURRENT_DIR, html_files)
+
+def get_config_digest(gzip=False):
+    """Digest of everything besides page content that shapes the sitemaps."""
+    return json_digest({
+        'gzip': gzip,
+        'domain': DOMAIN,
+        'page_config': PAGE_CONFIG,
+        'default_config': DEFAULT_CONFIG,
+        'titles': PAGE_TITLES,
+        'categories': CATEGORY_INFO,
+        # Template changes invalidate every cached entry
+        'generator': file_digest(__file__),
+        'templates': {name: TEMPLATES.dependency_digests(name) for name in (SITEMAP_TEMPLATE, LINK_TEMPLATE)},
+        'writer': file_digest(sitemap_writer.__file__),
+    })
+
+def get_page_title(filename):
+    """Create a nice title from a filename."""
+    return PAGE_TITLES.get(filename, filename.replace('.html', '').replace('-', ' ').title())
+
+def get_page_loc(filename):
+    """Get the absolute URL of a page."""
+    if filename == 'index.html':
+        return f"{DOMAIN}/"
+    return f"{DOMAIN}/{filename}"
+
+def render_page_link(filename, config, env=TEMPLATES):
+    """Render the HTML sitemap list item for a page."""
+    return env.render(LINK_TEMPLATE, {
+        'filename': filename,
+        'icon': config['icon'],
+        'title': get_page_title(filename),
+        'description': config['description'],
+    }).rstrip('\n')
+
+def build_page_entry(filename, digest, lastmod, priority):
+    """Build the cached sitemap entry for a single page."""
+    config = PAGE_CONFIG.get(filename, DEFAULT_CONFIG)
+    return {
+        'filename': filename,
+        'hash': digest,
+        'loc': get_page_loc(filename),
+        'lastmod': lastmod,
+        'changefreq': config['changefreq'],
+        'priority': priority,
+        'category': config['category'],
+        'html': render_page_link(filename, config),
+    }
 
-def generate_xml_sitemap():
-    """Generate XML sitemap for search engines."""
-    print("🔄 Generating XML sitemap...")
-    
-    # Create root element
-    urlset = ET.Element('urlset')
-    urlset.set('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-    urlset.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-    urlset.set('xsi:schemaLocation', 'http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd')
-    
-    html_files = get_html_files()
+def collect_page_entries(html_files, manifest, priorities, force=False, gzip=False):
+    """Reuse cached entries for unchanged pages and rebuild the rest."""
+    cached = {}
+    if not force and manifest.get('config') == get_config_digest(gzip):
+        cached = manifest.get('pages', {})
     
+    lastmods = get_lastmod_dates(html_files)
+    entries = []
+    changed = []
     for filename in html_files:
-        config = PAGE_CONFIG.get(filename, DEFAULT_CONFIG)
-        
-        # Create URL element
-        url = ET.SubElement(urlset, 'url')
-        
-        # Add location
-        if filename == 'index.html':
-            loc = ET.SubElement(url, 'loc')
-            loc.text = f"{DOMAIN}/"
-        else:
-            loc = ET.SubElement(url, 'loc')
-            loc.text = f"{DOMAIN}/{filename}"
-        
-        # Add last modified date
-        lastmod = ET.SubElement(url, 'lastmod')
-        lastmod.text = get_file_modified_date(filename)
-        
-        # Add change frequency
-        changefreq = ET.SubElement(url, 'changefreq')
-        changefreq.text = config['changefreq']
-        
-        # Add priority
-        priority = ET.SubElement(url, 'priority')
-        priority.text = config['priority']
-    
-    # Create pretty XML
-    rough_string = ET.tostring(urlset, 'utf-8')
-    reparsed = minidom.parseString(rough_string)
-    pretty_xml = reparsed.toprettyxml(indent='    ')
+        digest = file_digest(CURRENT_DIR / filename)
+        priority = priorities.get(filename, DEFAULT_PRIORITY)
+        entry = cached.get(filename)
+        if entry is None or entry.get('hash') != digest or entry.get('priority') != priority:
+            # A page's priority also moves when links to it are added elsewhere
+            entry = build_page_entry(filename, digest, lastmods[filename], priority)
+            changed.append(filename)
+        elif entry['lastmod'] != lastmods[filename]:
+            # Same content, but its change has since been committed
+            entry = dict(entry, lastmod=lastmods[filename])
+            changed.append(filename)
+        entries.append(entry)
     
-    # Remove empty lines and fix formatting
-    lines = [line for line in pretty_xml.split('\\n') if line.strip()]
-    pretty_xml = '\\n'.join(lines)
+    removed = sorted(set(cached) - set(html_files))
+    return entries, changed, removed
+
+def outputs_unchanged(manifest):
+    """Check that the outputs on disk are exactly the ones we last wrote."""
+    outputs = manifest.get('outputs', {})
+    return bool(outputs) and all(
+        file_digest(CURRENT_DIR / name) == digest for name, digest in outputs.items()
+    )
+
+def write_output(filename, content):
+    """Write an output file unless it already has exactly this content."""
+    return write_text(CURRENT_DIR / filename, content)
+
+def generate_xml_sitemap(entries, gzip=False):
+    """Generate XML sitemap for search engines."""
+    print("🔄 Generating XML sitemap...")
     
-    # Write to file
-    sitemap_path = CURRENT_DIR / 'sitemap.xml'
-    with open(sitemap_path, 'w', encoding='utf-8') as f:
-        f.write(pretty_xml)
+    # Stream entries to disk; large sites are split into shards plus an index
+    writer = SitemapWriter(CURRENT_DIR, DOMAIN, gzip=gzip)
+    for entry in entries:
+        writer.add(entry['loc'], entry['lastmod'], entry['changefreq'], entry['priority'])
+    outputs = writer.close()
     
-    print(f"✅ XML sitemap generated with {len(html_files)} pages")
-    return html_files
+    if len(writer.shards) > 1:
+        print(f"✅ XML sitemap generated with {len(entries)} pages in {len(writer.shards)} files + sitemap_index.xml")
+    else:
+        print(f"✅ XML sitemap generated with {len(entries)} pages")
+    return outputs
 
-def generate_html_sitemap(html_files):
+def generate_html_sitemap(entries, manifest):
     """Generate HTML sitemap for users."""
     print("🔄 Generating HTML sitemap...")
     
     # Group pages by category
     categories = {}
-    for filename in html_files:
-        config = PAGE_CONFIG.get(filename, DEFAULT_CONFIG)
-        category = config['category']
-        if category not in categories:
-            categories[category] = []
-        categories[category].append({
-            'filename': filename,
-            'config': config
-        })
+    for entry in entries:
+        categories.setdefault(entry['category'], []).append(entry)
     
-    # Generate category sections
-    category_sections = []
+    # Category sections in CATEGORY_INFO order, pages by priority (highest first)
+    category_sections = [
+        {'name': name, 'icon': icon,
+         'pages': sorted(categories[name], key=lambda x: float(x['priority']), reverse=True)}
+        for name, icon in CATEGORY_INFO.items() if name in categories
+    ]
     
-    # Define category order and icons
-    category_info = {
-        'Main Pages': '🏠',
-        'Programs & Training': '🏀',
-        'Registration & Events': '📝',
-        'Media': '📸',
-        'Navigation': '🗺️',
-        'Other Pages': '📄'
-    }
+    # Only move the "Last Updated" stamp when the listing itself changed
+    body_digest = text_digest(render_html_sitemap(entries, category_sections, ''))
+    last_updated = manifest.get('last_updated')
+    if manifest.get('html_body') != body_digest or not last_updated:
+        last_updated = datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')
     
-    for category_name in category_info.keys():
-        if category_name in categories:
-            category_icon = category_info[category_name]
-            pages = categories[category_name]
-            
-            # Sort pages by priority (highest first)
-            pages.sort(key=lambda x: float(x['config']['priority']), reverse=True)
-            
-            page_links = []
-            for page in pages:
-                filename = page['filename']
-                config = page['config']
-                
-                # Determine the href
-                if filename == 'index.html':
-                    href = 'index.html'
-                else:
-                    href = filename
-                
-                # Create nice title from filename
-                if filename in PAGE_CONFIG:
-                    title = {
-                        'index.html': 'Homepage',
-                        'about.html': 'About Us',
-                        'registration.html': 'Registration',
-                        'rep-teams.html': 'Rep Teams',
-                        'development.html': 'Development Program',
-                        'individual-training.html': 'Individual Training',
-                        'upcoming-events.html': 'Upcoming Events',
-                        'photo-gallery.html': 'Photo Gallery',
-                        'u11-rep-tryouts-flyer.html': 'U11 Rep Tryouts',
-                        'sitemap.html': 'Site Map'
-                    }.get(filename, filename.replace('.html', '').replace('-', ' ').title())
-                else:
-                    title = filename.replace('.html', '').replace('-', ' ').title()
-                
-                page_links.append(f'''                    <li>
-                        <a href="{href}">
-                            <span class="page-icon">{config['icon']}</span>
-                            <div>
-                                <strong>{title}</strong>
-                                <div class="page-description">{config['description']}</div>
-                            </div>
-                        </a>
-                    </li>''')
-            
-            category_sections.append(f'''            <!-- {category_name} -->
-            <div class="page-category">
-                <h2 class="category-title">{category_icon} {category_name}</h2>
-                <ul class="page-list">
-{chr(10).join(page_links)}
-                </ul>
-            </div>''')
-    
-    # Read the existing sitemap.html template or create it
-    sitemap_html_content = f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <meta name="description" content="Complete sitemap of Kitchener-Waterloo Wizards Basketball Association website - find all our pages and services.">
-    <meta name="robots" content="index, follow">
-    <link rel="canonical" href="https://kitchener-waterloo-wizards.com/sitemap.html">
-    <link rel="icon" type="image/png" href="images/wizard-logo.png">
-    <title>Site Map - Kitchener-Waterloo Wizards Basketball Association</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            font-family: 'Arial', sans-serif;
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%);
-            color: #fff;
-            line-height: 1.6;
-            min-height: 100vh;
-            padding: 2rem;
-        }}
-
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background: rgba(0, 0, 0, 0.3);
-            backdrop-filter: blur(10px);
-            border-radius: 15px;
-            padding: 3rem;
-            border: 1px solid rgba(137, 207, 240, 0.2);
-        }}
-
-        h1 {{
-            color: #89CFF0;
-            text-align: center;
-            margin-bottom: 0.5rem;
-            font-size: 2.5rem;
-            text-shadow: 0 0 10px rgba(137, 207, 240, 0.3);
-        }}
-
-        .subtitle {{
-            text-align: center;
-            color: #ccc;
-            margin-bottom: 3rem;
-            font-size: 1.1rem;
-        }}
-
-        .last-updated {{
-            text-align: center;
-            color: #89CFF0;
-            margin-bottom: 2rem;
-            font-size: 0.9rem;
-            opacity: 0.8;
-        }}
-
-        .sitemap-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 2rem;
-            margin-bottom: 3rem;
-        }}
-
-        .page-category {{
-            background: rgba(137, 207, 240, 0.1);
-            border-radius: 10px;
-            padding: 2rem;
-            border: 1px solid rgba(137, 207, 240, 0.2);
-            transition: all 0.3s ease;
-        }}
-
-        .page-category:hover {{
-            transform: translateY(-5px);
-            box-shadow: 0 10px 30px rgba(137, 207, 240, 0.2);
-        }}
-
-        .category-title {{
-            color: #89CFF0;
-            font-size: 1.4rem;
-            margin-bottom: 1rem;
-            padding-bottom: 0.5rem;
-            border-bottom: 2px solid rgba(137, 207, 240, 0.3);
-        }}
-
-        .page-list {{
-            list-style: none;
-        }}
-
-        .page-list li {{
-            margin-bottom: 0.8rem;
-        }}
-
-        .page-list a {{
-            color: #fff;
-            text-decoration: none;
-            display: flex;
-            align-items: center;
-            padding: 0.8rem;
-            border-radius: 8px;
-            transition: all 0.3s ease;
-            background: rgba(255, 255, 255, 0.05);
-        }}
-
-        .page-list a:hover {{
-            background: rgba(137, 207, 240, 0.2);
-            color: #89CFF0;
-            text-shadow: 0 0 5px rgba(137, 207, 240, 0.5);
-            transform: translateX(10px);
-        }}
-
-        .page-icon {{
-            margin-right: 0.8rem;
-            font-size: 1.2rem;
-            width: 24px;
-            text-align: center;
-        }}
-
-        .page-description {{
-            font-size: 0.9rem;
-            color: #bbb;
-            margin-top: 0.3rem;
-            padding-left: 32px;
-        }}
-
-        .back-to-home {{
-            text-align: center;
-            margin-top: 2rem;
-        }}
-
-        .back-to-home a {{
-            display: inline-block;
-            background: linear-gradient(45deg, #89CFF0, #4a9eff);
-            color: #fff;
-            text-decoration: none;
-            padding: 1rem 2rem;
-            border-radius: 25px;
-            font-weight: bold;
-            transition: all 0.3s ease;
-            box-shadow: 0 5px 15px rgba(137, 207, 240, 0.3);
-        }}
-
-        .back-to-home a:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 10px 25px rgba(137, 207, 240, 0.4);
-        }}
-
-        .page-count {{
-            text-align: center;
-            color: #89CFF0;
-            margin-bottom: 1rem;
-            font-size: 1rem;
-        }}
-
-        @media (max-width: 768px) {{
-            body {{
-                padding: 1rem;
-            }}
-            
-            .container {{
-                padding: 1.5rem;
-            }}
-            
-            h1 {{
-                font-size: 2rem;
-            }}
-            
-            .sitemap-grid {{
-                grid-template-columns: 1fr;
-                gap: 1.5rem;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🏀 Site Map</h1>
-        <p class="subtitle">Find everything on the Kitchener-Waterloo Wizards Basketball Association website</p>
-        <p class="page-count">Total Pages: {len(html_files)}</p>
-        <p class="last-updated">Last Updated: {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-        
-        <div class="sitemap-grid">
-{chr(10).join(category_sections)}
-        </div>
-
-        <div class="back-to-home">
-            <a href="index.html">← Back to Homepage</a>
-        </div>
-    </div>
-</body>
-</html>'''
+    sitemap_html_content = render_html_sitemap(entries, category_sections, last_updated)
     
     # Write HTML sitemap
-    html_sitemap_path = CURRENT_DIR / 'sitemap.html'
-    with open(html_sitemap_path, 'w', encoding='utf-8') as f:
-        f.write(sitemap_html_content)
+    if write_output('sitemap.html', sitemap_html_content):
+        print(f"✅ HTML sitemap generated with {len(entries)} pages in {len(categories)} categories")
+    else:
+        print(f"✓ HTML sitemap already up to date ({len(entries)} pages)")
+    return body_digest, last_updated
+
+def render_html_sitemap(entries, categories, last_updated, env=TEMPLATES):
+    """Render the full HTML sitemap page from templates/sitemap.html."""
+    return env.render(SITEMAP_TEMPLATE, {
+        'total_pages': len(entries),
+        'last_updated': last_updated,
+        'categories': categories,
+    })
+
+def update_sitemaps(force=False, gzip=False):
+    """Regenerate the sitemaps if anything they are built from changed.
     
-    print(f"✅ HTML sitemap generated with {len(html_files)} pages in {len(categories)} categories")
-
-def main():
+    Returns the outputs written ({filename: digest}), or None when the
+    sitemaps were already up to date.
+    """
+    html_files = get_html_files()
+    graph = crawl_site(CURRENT_DIR)
+    orphans = [page for page in find_orphans(graph['edges']) if page in html_files]
+    if orphans:
+        print(f"⚠ Not linked from any page reachable from the homepage: {', '.join(orphans)}")
+    if graph['broken']:
+        print(f"⚠ {len(graph['broken'])} broken internal link(s) - run link_graph.py for details")
+    
+    manifest = load_manifest(MANIFEST_NAME)
+    entries, changed, removed = collect_page_entries(html_files, manifest, page_priorities(graph, html_files), force, gzip)
+    
+    if not changed and not removed and outputs_unchanged(manifest):
+        print(f"✅ Sitemaps are up to date - {len(html_files)} pages unchanged, nothing rewritten")
+        return None
+    
+    if changed or removed:
+        print(f"📝 {len(changed)} changed, {len(removed)} removed, {len(entries) - len(changed)} reused from cache")
+    
+    # Generate XML sitemap
+    outputs = generate_xml_sitemap(entries, gzip)
+    
+    # Generate HTML sitemap
+    body_digest, last_updated = generate_html_sitemap(entries, manifest)
+    
+    outputs['sitemap.html'] = file_digest(CURRENT_DIR / 'sitemap.html')
+    save_manifest(MANIFEST_NAME, {
+        'config': get_config_digest(gzip),
+        'pages': {entry['filename']: entry for entry in entries},
+        'html_body': body_digest,
+        'last_updated': last_updated,
+        'outputs': outputs,
+    })
+    return outputs
+
+def main(argv=None):
     """Main function to generate both sitemaps."""
+    parser = argparse.ArgumentParser(description='Generate the XML and HTML sitemaps.')
+    parser.add_argument('--force', action='store_true', help='ignore the build cache and rebuild every entry')
+    parser.add_argument('--gzip', action='store_true', help='also write gzip-compressed .xml.gz sitemaps')
+    add_dry_run_argument(parser)
+    args = parser.parse_args(argv)
+    set_dry_run(args.dry_run)
+    
     print("🏀 Kitchener-Waterloo Wizards Basketball Association")
     print("🗺️  Sitemap Generator")
     print("=" * 50)
     
     try:
-        # Generate XML sitemap
-        html_files = generate_xml_sitemap()
-        
-        # Generate HTML sitemap
-        generate_html_sitemap(html_files)
+        outputs = update_sitemaps(args.force, args.gzip)
+        if outputs is None:
+            return 0
         
-        print("\\n✨ Sitemap generation completed successfully!")
+        print("\n✨ Sitemap generation completed successfully!")
         print(f"📁 Files generated:")
-        print(f"   • sitemap.xml ({len(html_files)} pages)")
+        for name in sorted(outputs):
+            if name.endswith(('.xml', '.xml.gz')):
+                print(f"   • {name}")
         print(f"   • sitemap.html (user-friendly version)")
-        print(f"\\n🔗 Next steps:")
+        print(f"\n🔗 Next steps:")
         print(f"   1. Upload these files to your website root directory")
         print(f"   2. Submit sitemap.xml to Google Search Console")
         print(f"   3. Link to sitemap.html from your main navigation if desired")
-        print(f"\\n🌐 Sitemap URL: {DOMAIN}/sitemap.xml")
+        sitemap_name = 'sitemap_index.xml' if 'sitemap_index.xml' in outputs else 'sitemap.xml'
+        print(f"\n🌐 Sitemap URL: {DOMAIN}/{sitemap_name}")
         
     except Exception as e:
         print(f"❌ Error generating sitemaps: {str(e)}")
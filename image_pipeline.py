@@ -0,0 +1,294 @@
+"""
+Responsive Image Stage
+Build stage (see build_site.py) that deduplicates images by content hash,
+encodes resized WebP/PNG variants at the sizes pages actually display them,
+and rewrites <img> tags to <picture> with srcset/sizes.
+
+Display sizes come from each <img>'s width attribute and the width/height
+declared for its classes in the page's inline styles (heights are converted
+through the image's aspect ratio); the largest one is the <img>'s size.
+Every displayed size gets a 1x and a 2x variant, never larger than the source.
+
+Variants are encoded in a process pool and cached in .build-cache/images/ by
+source hash, width and format, so an unchanged image is never re-encoded.
+Encoding needs Pillow (pip install Pillow); without it the stage still
+points every duplicate at one canonical file. Once every page has been
+rewritten, duplicates that no published file mentions any more are dropped
+from the build output; ones still named somewhere (absolute og:image URLs,
+robots.txt) are kept so those links keep working.
+"""
+
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from build_cache import CACHE_DIR, file_digest
+from file_writes import copy_file, remove_file
+from site_pipeline import register_stage
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+VARIANT_DIR = 'images/variants'
+VARIANT_FORMATS = ['webp', 'png']
+DENSITIES = (1, 2)
+IMAGE_CACHE_DIR = CACHE_DIR / 'images'
+
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+CSS_RULE = re.compile(r'([^{}]*)\{([^{}]*)\}')
+STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+PX_WIDTH = re.compile(r'(?<![\w-])width\s*:\s*(\d+(?:\.\d+)?)px')
+PX_HEIGHT = re.compile(r'(?<![\w-])height\s*:\s*(\d+(?:\.\d+)?)px')
+
+# Published files that can link to an image
+REFERRER_PATTERNS = ['*.html', '*.css', '*.js', '*.webmanifest', '*.txt', '*.xml']
+
+
+def png_dimensions(path):
+    """Read (width, height) straight from a PNG header."""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def image_dimensions(path):
+    """Return (width, height) of a raster image, or None if unknown."""
+    if str(path).lower().endswith('.png'):
+        return png_dimensions(path)
+    if Image is not None:
+        with Image.open(path) as image:
+            return image.size
+    return None
+
+
+def canonical_sort_key(name):
+    """Prefer short, URL-friendly names when picking which duplicate to keep."""
+    return (' ' in name, name != name.lower(), len(name), name)
+
+
+def find_duplicates(site_dir):
+    """Map every raster image to the canonical copy of its content."""
+    by_digest = {}
+    for path in sorted(Path(site_dir).glob('images/*')):
+        if path.is_file() and path.suffix.lower() in RASTER_EXTENSIONS:
+            by_digest.setdefault(file_digest(path), []).append(path.relative_to(site_dir).as_posix())
+
+    canonical = {}
+    digests = {}
+    for digest, names in by_digest.items():
+        keep = min(names, key=canonical_sort_key)
+        digests[keep] = digest
+        for name in names:
+            canonical[name] = keep
+    return canonical, digests
+
+
+def parse_attributes(tag):
+    """Return the attributes of a tag as a dict."""
+    return {name.lower(): value[1:-1] for name, value in ATTRIBUTE.findall(tag)}
+
+
+def css_widths(styles, classes, dimensions):
+    """Widths (CSS px) that the inline styles give elements with these classes."""
+    widths = set()
+    for selectors, body in CSS_RULE.findall(styles):
+        targets = [selector.strip() for selector in selectors.split(',')]
+        if not any(re.search(rf'\.{re.escape(cls)}(?![\w-])[^\s>+~]*$', target) for target in targets for cls in classes):
+            continue
+        for value in PX_WIDTH.findall(body):
+            widths.add(round(float(value)))
+        if dimensions:
+            for value in PX_HEIGHT.findall(body):
+                widths.add(round(float(value) * dimensions[0] / dimensions[1]))
+    return widths
+
+
+def resolve_src(src):
+    """Normalize a page-relative image src, or None for remote/inline images."""
+    if not src or re.match(r'^(?:[a-z]+:|//|#)', src, re.IGNORECASE):
+        return None
+    return src.removeprefix('./').replace('%20', ' ')
+
+
+def display_widths(content, attrs, dimensions):
+    """Widths at which a single <img> is displayed on a page."""
+    widths = set()
+    if attrs.get('width', '').isdigit():
+        widths.add(int(attrs['width']))
+    classes = attrs.get('class', '').split()
+    if classes:
+        styles = '\n'.join(STYLE_BLOCK.findall(content))
+        widths |= css_widths(styles, classes, dimensions)
+    return {width for width in widths if width > 0}
+
+
+def variant_widths(widths, dimensions):
+    """1x/2x variant widths for the displayed widths, capped at the source width."""
+    result = set()
+    for width in widths:
+        for density in DENSITIES:
+            result.add(min(width * density, dimensions[0]))
+    return sorted(result)
+
+
+def variant_name(canonical, width, fmt):
+    """Output path of a variant, relative to the site root."""
+    stem = re.sub(r'[^a-z0-9]+', '-', Path(canonical).stem.lower()).strip('-')
+    return f"{VARIANT_DIR}/{stem}-{width}w.{fmt}"
+
+
+def encode_variant(job):
+    """Resize and encode one variant into the cache (runs in a worker process)."""
+    source, cache_path, width, fmt = job
+    temp_path = f"{cache_path}.tmp{os.getpid()}"
+    with Image.open(source) as image:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        if fmt == 'webp':
+            resized.save(temp_path, 'WEBP', quality=82, method=6)
+        else:
+            resized.save(temp_path, 'PNG', optimize=True)
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def prepare_images(context):
+    """Dedupe images, work out display sizes and encode the missing variants."""
+    site_dir = context['site_dir']
+    canonical, digests = find_duplicates(site_dir)
+    dimensions = {name: image_dimensions(site_dir / name) for name in digests}
+
+    # Which widths each canonical image is displayed at, across all pages
+    displayed = {}
+    for page_path in sorted(site_dir.glob('*.html')):
+        content = page_path.read_text(encoding='utf-8')
+        for tag in IMG_TAG.findall(content):
+            attrs = parse_attributes(tag)
+            name = canonical.get(resolve_src(attrs.get('src')))
+            widths = display_widths(content, attrs, dimensions.get(name)) if name and dimensions.get(name) else None
+            if widths:
+                # The largest size any breakpoint shows it at is what sizes= advertises
+                displayed.setdefault(name, set()).add(max(widths))
+
+    duplicates = sum(1 for name, keep in canonical.items() if name != keep)
+    print(f"🖼️  {len(canonical)} images, {duplicates} duplicates, {len(displayed)} displayed by <img> tags")
+
+    variants = {}
+    if Image is None:
+        print("  ⚠ Pillow not installed - skipping resized variants (pip install Pillow)")
+    else:
+        IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        jobs = []
+        for name, widths in displayed.items():
+            for width in variant_widths(widths, dimensions[name]):
+                for fmt in VARIANT_FORMATS:
+                    cache_path = IMAGE_CACHE_DIR / f"{digests[name]}-{width}w.{fmt}"
+                    variants.setdefault(name, []).append((width, fmt, variant_name(name, width, fmt), cache_path))
+                    if not cache_path.exists():
+                        jobs.append((str(site_dir / name), str(cache_path), width, fmt))
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=context.get('jobs')) as pool:
+                list(pool.map(encode_variant, jobs))
+        print(f"  ✓ {len(jobs)} variants encoded, {sum(map(len, variants.values())) - len(jobs)} reused from cache")
+
+        # Publish the cached variants into the build output
+        for entries in variants.values():
+            for width, fmt, output_name, cache_path in entries:
+                copy_file(cache_path, site_dir / output_name)
+
+    context['images'] = {'canonical': canonical, 'dimensions': dimensions, 'variants': variants}
+
+
+def build_picture(attrs, tag, name, entries, widths):
+    """Render a <picture> with WebP and PNG srcsets for one <img>."""
+    sizes = f"{max(widths)}px"
+    srcsets = {}
+    for width, fmt, output_name, cache_path in sorted(entries):
+        srcsets.setdefault(fmt, []).append(f"{output_name} {width}w")
+
+    # Smallest PNG variant that still covers the displayed width is the fallback src
+    fallback = min(
+        (entry for entry in entries if entry[1] == 'png' and entry[0] >= max(widths)),
+        default=max(entry for entry in entries if entry[1] == 'png')
+    )
+    img = re.sub(r'\bsrc\s*=\s*("[^"]*"|\'[^\']*\')', f'src="{fallback[2]}"', tag, count=1)
+    img = img[:-1].rstrip('/ ') + f' srcset="{", ".join(srcsets["png"])}" sizes="{sizes}">'
+    return f'<picture><source type="image/webp" srcset="{", ".join(srcsets["webp"])}" sizes="{sizes}">{img}</picture>'
+
+
+def drop_unreferenced_duplicates(context):
+    """Remove duplicate images that nothing links to once pages use the canonical copy."""
+    site_dir = context['site_dir']
+    source_dir = context.get('source_dir', site_dir)
+    # Only the site's own copies - not files earlier stages made from them
+    duplicates = [name for name, keep in context['images']['canonical'].items()
+                  if name != keep and (source_dir / name).is_file()]
+    if not duplicates:
+        return
+    referrers = '\n'.join(
+        path.read_text(encoding='utf-8', errors='replace')
+        for pattern in REFERRER_PATTERNS for path in sorted(site_dir.glob(pattern)) if path.is_file()
+    )
+    dropped = []
+    for name in duplicates:
+        filename = Path(name).name
+        if filename not in referrers and quote(filename) not in referrers:
+            remove_file(site_dir / name)
+            dropped.append(name)
+    kept = len(duplicates) - len(dropped)
+    print(f"🖼️  Dropped {len(dropped)} unreferenced duplicate image(s), kept {kept} still linked by name")
+
+
+@register_stage(
+    'responsive-images',
+    'Dedupe images and serve resized WebP/PNG variants through srcset',
+    group='build',
+    prepare=prepare_images,
+    finish=drop_unreferenced_duplicates,
+)
+def rewrite_images(page):
+    """Point <img> tags at canonical images and their resized variants"""
+    images = page['context']['images']
+    content = page['content']
+    rewritten = 0
+
+    def rewrite(match):
+        nonlocal rewritten
+        tag = match.group(0)
+        attrs = parse_attributes(tag)
+        src = resolve_src(attrs.get('src'))
+        name = images['canonical'].get(src)
+        if not name or 'srcset' in attrs:
+            return tag
+        if src != name:
+            tag = tag.replace(attrs['src'], name, 1)
+        entries = images['variants'].get(name)
+        widths = display_widths(content, attrs, images['dimensions'].get(name))
+        preceding = content[max(0, match.start() - 200):match.start()].lower()
+        if entries and widths and preceding.rfind('<picture') <= preceding.rfind('</picture'):
+            tag = build_picture(attrs, tag, name, entries, widths)
+        if tag != match.group(0):
+            rewritten += 1
+        return tag
+
+    page['content'] = IMG_TAG.sub(rewrite, content)
+
+    # Other references (icons, preloads) to duplicate files use the canonical copy
+    for name, keep in images['canonical'].items():
+        if name != keep:
+            for quoted in (f'"{name}"', f"'{name}'"):
+                page['content'] = page['content'].replace(quoted, quoted.replace(name, keep))
+
+    page['counters']['images_rewritten'] = rewritten
+    if rewritten:
+        page['log'].append(f"✅ Rewrote {rewritten} <img> tags")
@@ -0,0 +1,221 @@
+"""
+Inline Block Deduplication Stage
+Build stage (see build_site.py) that moves inline CSS and JS repeated across
+pages into shared external files, so a visitor downloads it once and every
+other page comes from the browser cache.
+
+    <head> <style> blocks  are split into top-level rules. Runs of consecutive
+                           rules found on the same set of pages - such as the
+                           page styles several templates repeat - move to
+                           shared-<hash>.css and are replaced by a <link> at
+                           the same position, so the cascade order is unchanged.
+    <body> <script> blocks identical on several pages move to shared-<hash>.js
+                           and are loaded with <script src> in the same place.
+                           Scripts in the <head> stay inline rather than
+                           becoming a render-blocking request.
+
+A block is only hoisted when it is at least MIN_BYTES long, appears on
+MIN_PAGES pages or more and saves MIN_SAVED_BYTES across the site; CSS that
+only one page uses always stays inline. The stage runs before critical-css,
+which inlines the rules of the shared stylesheets that each page's first
+screen needs and loads the rest asynchronously, and before
+fingerprint-assets, which gives the shared files their immutable names.
+
+Hoisting happens in the prepare hook, on the pages in dist/, so that every
+later prepare hook sees the external files; the pipeline report counts the
+pages and bytes it rewrote there against this stage.
+"""
+
+import re
+
+import css_tools
+from build_cache import text_digest
+from file_writes import remove_file, write_text
+from site_pipeline import register_stage
+
+SHARED_PREFIX = 'shared-'
+MIN_PAGES = 2
+MIN_BYTES = 256
+MIN_SAVED_BYTES = 2048
+
+BODY_START = re.compile(r'<body\b', re.IGNORECASE)
+STYLE_BLOCK = re.compile(r'<style\b([^>]*)>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+SCRIPT_BLOCK = re.compile(r'<script\b([^>]*)>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+TYPE_ATTRIBUTE = re.compile(r'''^\s*type\s*=\s*["']?(text/css|text/javascript|application/javascript)["']?\s*$''',
+                            re.IGNORECASE)
+
+
+def plain_attributes(attrs):
+    """True for a block with no attributes besides a default type."""
+    return not attrs.strip() or bool(TYPE_ATTRIBUTE.match(attrs))
+
+
+def page_blocks(content):
+    """The inline blocks of a page that may be hoisted.
+
+    Returns a list of (match, kind, payload): kind 'style' with the parsed
+    rules of a <head> style block, or 'script' with the code of a <body> script.
+    """
+    body = BODY_START.search(content)
+    if not body:
+        return []
+    blocks = []
+    for match in STYLE_BLOCK.finditer(content, 0, body.start()):
+        if plain_attributes(match.group(1)):
+            blocks.append((match, 'style', css_tools.parse_stylesheet(match.group(2))))
+    for match in SCRIPT_BLOCK.finditer(content, body.start()):
+        code = match.group(2).strip()
+        # document.currentScript would point at a different element once hoisted
+        if plain_attributes(match.group(1)) and code and 'currentScript' not in code:
+            blocks.append((match, 'script', code))
+    return sorted(blocks, key=lambda block: block[0].start())
+
+
+def rule_runs(rules, pages_with_rule):
+    """Split a style block's rules into runs shared by the same set of pages.
+
+    Returns a list of (page_set, rules); page_set is None for rules only
+    this page has (and for @import/@charset, which must stay where they are).
+    """
+    runs = []
+    for rule in rules:
+        pages = None
+        if rule['type'] != 'statement':
+            pages = pages_with_rule[text_digest(css_tools.serialize([rule]))]
+            if len(pages) < MIN_PAGES:
+                pages = None
+        if runs and runs[-1][0] == pages:
+            runs[-1][1].append(rule)
+        else:
+            runs.append((pages, [rule]))
+    return runs
+
+
+def worth_hoisting(text, pages):
+    """Apply the size and reuse thresholds to a shared block."""
+    size = len(text.encode('utf-8'))
+    return len(pages) >= MIN_PAGES and size >= MIN_BYTES and size * (len(pages) - 1) >= MIN_SAVED_BYTES
+
+
+def shared_name(text, suffix):
+    """Content-addressed name of a shared file."""
+    return f"{SHARED_PREFIX}{text_digest(text)[:8]}{suffix}"
+
+
+def plan_pages(contents):
+    """Work out which blocks of which pages move to which shared file.
+
+    Returns {page: [(match, kind, parts)]}, where parts is a list of
+    ('inline', text) and ('file', name) in document order, and the shared
+    files as {name: text}.
+    """
+    blocks = {name: page_blocks(content) for name, content in contents.items()}
+
+    pages_with_rule = {}
+    pages_with_script = {}
+    for name, found in blocks.items():
+        for match, kind, payload in found:
+            if kind == 'style':
+                for rule in payload:
+                    pages_with_rule.setdefault(text_digest(css_tools.serialize([rule])), set()).add(name)
+            else:
+                pages_with_script.setdefault(text_digest(payload), set()).add(name)
+
+    # Candidate chunks first, so thresholds apply to what would really be shared
+    candidates = {}
+    for name, found in blocks.items():
+        for match, kind, payload in found:
+            if kind == 'style':
+                for pages, rules in rule_runs(payload, pages_with_rule):
+                    if pages is not None:
+                        candidates.setdefault(css_tools.serialize(rules), set()).add(name)
+            elif len(pages_with_script[text_digest(payload)]) >= MIN_PAGES:
+                candidates.setdefault(payload, set()).add(name)
+
+    files = {}
+    plans = {}
+    for name, found in blocks.items():
+        for match, kind, payload in found:
+            if kind == 'style':
+                parts = []
+                for pages, rules in rule_runs(payload, pages_with_rule):
+                    text = css_tools.serialize(rules)
+                    if pages is not None and worth_hoisting(text, candidates[text]):
+                        files[shared_name(text, '.css')] = text
+                        parts.append(('file', shared_name(text, '.css')))
+                    elif parts and parts[-1][0] == 'inline':
+                        parts[-1] = ('inline', parts[-1][1] + '\n' + text)
+                    else:
+                        parts.append(('inline', text))
+            elif payload in candidates and worth_hoisting(payload, candidates[payload]):
+                files[shared_name(payload, '.js')] = payload
+                parts = [('file', shared_name(payload, '.js'))]
+            else:
+                continue
+            if any(part[0] == 'file' for part in parts):
+                plans.setdefault(name, []).append((match, kind, parts))
+    return plans, files
+
+
+def render_parts(kind, parts):
+    """Markup replacing a hoisted block."""
+    markup = []
+    for part, value in parts:
+        if part == 'file' and kind == 'style':
+            markup.append(f'<link rel="stylesheet" href="{value}">')
+        elif part == 'file':
+            markup.append(f'<script src="{value}"></script>')
+        elif value.strip():
+            markup.append(f"<style>\n{value}\n</style>")
+    return '\n'.join(markup)
+
+
+def remove_stale_files(site_dir, current):
+    """Delete shared files of earlier builds that no page uses any more."""
+    for suffix in ('.css', '.js'):
+        for path in site_dir.glob(f"{SHARED_PREFIX}*{suffix}"):
+            if re.fullmatch(re.escape(SHARED_PREFIX) + r'[0-9a-f]{8}' + re.escape(suffix), path.name) \
+                    and path.name not in current:
+                remove_file(path)
+
+
+def prepare_dedupe(context):
+    """Hoist repeated inline blocks into shared files and rewrite the pages."""
+    site_dir = context['site_dir']
+    contents = {path.name: path.read_text(encoding='utf-8') for path in sorted(site_dir.glob('*.html'))}
+    plans, files = plan_pages(contents)
+
+    for name, text in files.items():
+        write_text(site_dir / name, text + '\n')
+    remove_stale_files(site_dir, files)
+
+    hoisted = {}
+    for name, plan in plans.items():
+        content = contents[name]
+        before = len(content.encode('utf-8'))
+        for match, kind, parts in reversed(plan):
+            content = content[:match.start()] + render_parts(kind, parts) + content[match.end():]
+        write_text(site_dir / name, content)
+        hoisted[name] = {
+            'files': sorted({value for _, _, parts in plan for part, value in parts if part == 'file'}),
+            'bytes': before - len(content.encode('utf-8')),
+        }
+
+    total = sum(len(text.encode('utf-8')) for text in files.values())
+    print(f"🧩 {len(files)} shared inline block(s) ({total:,} bytes) hoisted out of {len(hoisted)} pages")
+    context['inline_dedupe'] = hoisted
+
+
+@register_stage(
+    'dedupe-inline',
+    'Move inline CSS/JS repeated across pages into shared cacheable files',
+    group='build',
+    prepare=prepare_dedupe,
+)
+def report_hoisted_blocks(page):
+    """Report which shared files replaced the page's inline blocks"""
+    entry = page['context']['inline_dedupe'].get(page['name'])
+    if not entry:
+        return
+    page['counters']['inline_bytes_hoisted'] = entry['bytes']
+    page['log'].append(f"✅ {entry['bytes']:,} inline bytes now load from {', '.join(entry['files'])}")
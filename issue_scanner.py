@@ -0,0 +1,400 @@
+"""
+Issue Scanner Engine
+The rule set and single-pass scanner behind check-for-issues.py.
+
+All rule patterns are merged into one alternation with a named group per
+rule, so each file is walked once no matter how many rules there are. Line
+numbers come from a newline offset table built once per file and searched
+with bisect, instead of re-counting newlines from the start of the file for
+every match.
+
+Because the rules share one pass, matching is leftmost-first like a lexer:
+where two rules would match overlapping text, the one that starts first (or
+is listed first, for the same start) wins.
+
+SCRIPT_RULES are not patterns: js_tools.py tokenizes every *.js file and
+inline <script> and checks listeners, scroll handlers, layout reads and
+loops on the tokens. STYLE_RULES are checked the same way on parsed
+stylesheets (css_tools.style_declarations): every *.css file and inline
+<style> resolves to declarations that know which @media blocks they sit in,
+so "on mobile" means "only applies up to 768px wide", however the rules are
+nested or spread over lines. CHAIN_RULES come from each page's critical
+request chain (request_chains.py): what blocks its first paint, and what the
+browser only finds late.
+"""
+
+import os
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+
+import css_tools
+import js_tools
+import request_chains
+
+# Issues to check for
+PERFORMANCE_RULES = [
+    {
+        'id': 'long-settimeout',
+        'pattern': r'setTimeout\([^,]+,\s*([5-9]\d{2,}|\d{4,})\)',
+        'description': 'Long setTimeout delays (>500ms) that could slow user experience',
+        'severity': 'HIGH'
+    },
+    {
+        'id': 'frequent-setinterval',
+        'pattern': r'setInterval\([^,]+,\s*([1-9]\d{1,})\)',
+        'description': 'Frequent setInterval calls (<100ms) that could cause performance issues',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'document-write',
+        'pattern': r'document\.write\(',
+        'description': 'document.write() can block page rendering',
+        'severity': 'HIGH'
+    },
+    {
+        'id': 'css-import',
+        'pattern': r'@import\s+url\(',
+        'description': 'CSS @import can block rendering and slow page load',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'important-pointer-events-none',
+        'pattern': r'pointer-events:\s*none.*!important',
+        'description': 'Important pointer-events none that might break mobile touch',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'slow-transition',
+        'pattern': r'transition:\s*all\s+[1-9]\d*s',
+        'description': 'Slow CSS transitions (>1s) that could feel laggy',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'long-animation',
+        'pattern': r'animation-duration:\s*[5-9]\d*s',
+        'description': 'Very long animations that might annoy users',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'redundant-prevent-default',
+        'pattern': r'\.preventDefault\(\)\s*;[^}]*return\s+false',
+        'description': 'Both preventDefault and return false - redundant and potentially problematic',
+        'severity': 'MEDIUM'
+    }
+]
+
+MOBILE_RULES = [
+    {
+        'id': 'touch-action-none',
+        'pattern': r'touch-action:\s*none',
+        'description': 'touch-action: none might prevent scrolling on mobile',
+        'severity': 'HIGH'
+    },
+    {
+        'id': 'user-scalable-no',
+        'pattern': r'user-scalable\s*=\s*no',
+        'description': 'user-scalable=no prevents zoom and hurts accessibility',
+        'severity': 'MEDIUM'
+    }
+]
+
+BUG_RULES = [
+    {
+        'id': 'console-log',
+        'pattern': r'console\.log\(',
+        'description': 'Console.log statements should be removed in production',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'alert',
+        'pattern': r'alert\(',
+        'description': 'Alert dialogs can break mobile user experience',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'javascript-href',
+        'pattern': r'href\s*=\s*["\']javascript:',
+        'description': 'javascript: hrefs can cause accessibility issues',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'inline-onclick',
+        'pattern': r'onclick\s*=',
+        'description': 'Inline onclick handlers - better to use addEventListener',
+        'severity': 'LOW'
+    }
+]
+
+# Checked on tokenized scripts by js_tools.py
+SCRIPT_RULES = [
+    {
+        'id': 'non-passive-touch-listener',
+        'description': 'Touch/wheel listener without { passive: true } makes scrolling wait for the handler',
+        'severity': 'HIGH'
+    },
+    {
+        'id': 'non-passive-scroll-listener',
+        'description': 'Scroll listener without { passive: true }',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'unthrottled-scroll-handler',
+        'description': 'Scroll/resize handler does DOM work on every event instead of once per frame (requestAnimationFrame)',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'layout-thrash',
+        'description': 'Layout read after a DOM/style write forces a synchronous reflow',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'dom-in-loop',
+        'description': 'DOM nodes created one at a time inside a loop',
+        'severity': 'MEDIUM'
+    }
+]
+
+# Checked on parsed stylesheets, against declarations that only apply on mobile
+STYLE_RULES = [
+    {
+        'id': 'mobile-fixed-height',
+        'description': 'Fixed heights on mobile can cause layout issues',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'mobile-small-font',
+        'description': 'Font sizes below 15px on mobile might cause zoom on iOS',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'rep-team-pointer-events',
+        'description': 'Rep team box has pointer-events: none on mobile',
+        'severity': 'HIGH'
+    }
+]
+
+# Checked on each page's critical request chain, one per recommended action
+CHAIN_RULES = [
+    {
+        'id': 'render-blocking-script',
+        'action': 'defer',
+        'kind': 'js',
+        'description': 'Synchronous script in <head> blocks first paint - add defer or async',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'render-blocking-stylesheet',
+        'action': 'defer',
+        'kind': 'css',
+        'description': 'Stylesheet blocks first paint - inline its critical rules and load the rest asynchronously',
+        'severity': 'MEDIUM'
+    },
+    {
+        'id': 'inlinable-stylesheet',
+        'action': 'inline',
+        'kind': 'css',
+        'description': 'Small render-blocking stylesheet costs a round trip - inline it',
+        'severity': 'LOW'
+    },
+    {
+        'id': 'late-discovered-resource',
+        'action': 'preload',
+        'kind': None,
+        'description': 'Resource is only found after another download or a script runs - preload it',
+        'severity': 'LOW'
+    }
+]
+
+RULES = PERFORMANCE_RULES + MOBILE_RULES + BUG_RULES
+
+# Widest viewport the mobile style rules consider
+MOBILE_MAX_WIDTH = 768
+# min-heights up to this are tap-target minimums, not fixed layout heights
+TAP_TARGET_PX = 48
+LENGTH = re.compile(r'^(\d*\.?\d+)(px|rem)$', re.IGNORECASE)
+
+
+def compile_rules(rules):
+    """Merge the rule patterns into one regex with a named group per rule."""
+    groups = {}
+    alternatives = []
+    for index, rule in enumerate(rules):
+        name = f"r{index}"
+        groups[name] = rule
+        alternatives.append(f"(?P<{name}>{rule['pattern']})")
+    return re.compile('|'.join(alternatives), re.IGNORECASE), groups
+
+
+@lru_cache(maxsize=None)
+def default_scanner():
+    """The compiled scanner for the built-in rule set."""
+    return compile_rules(RULES)
+
+
+def build_line_index(content):
+    """Return the offsets of every newline in the content."""
+    return [match.start() for match in re.finditer('\n', content)]
+
+
+def line_and_column(line_index, offset):
+    """Resolve a character offset to a 1-based (line, column) pair."""
+    line = bisect_left(line_index, offset)
+    line_start = line_index[line - 1] + 1 if line else 0
+    return line + 1, offset - line_start + 1
+
+
+def shorten(text, limit=50):
+    """Trim matched code for display."""
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+def scan_text(content, filename, scanner=None):
+    """Scan one document in a single pass and return its issues."""
+    regex, groups = scanner or default_scanner()
+    line_index = build_line_index(content)
+    issues = []
+    for match in regex.finditer(content):
+        rule = groups[match.lastgroup]
+        line, column = line_and_column(line_index, match.start())
+        issues.append({
+            'file': filename,
+            'line': line,
+            'column': column,
+            'rule': rule['id'],
+            'description': rule['description'],
+            'severity': rule['severity'],
+            'match': shorten(match.group(0))
+        })
+    return issues
+
+
+def scan_file(file_path, scanner=None):
+    """Read and scan a single file."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return scan_text(content, os.path.basename(file_path), scanner)
+
+
+def length_px(value):
+    """A px or rem length in px, or None for anything else (em, %, calc(), keywords)."""
+    match = LENGTH.match(value.strip())
+    if not match:
+        return None
+    return float(match.group(1)) * (1 if match.group(2).lower() == 'px' else css_tools.EM_PX)
+
+
+def mobile_style_rule(declaration):
+    """Id of the style rule a mobile-only declaration breaks, or None."""
+    name, value = declaration['property'], declaration['value']
+    if name == 'min-height':
+        px = length_px(value)
+        if px is not None and px > TAP_TARGET_PX:
+            return 'mobile-fixed-height'
+    if name == 'font-size':
+        px = length_px(value)
+        if px is not None and 0 < px < 15:
+            return 'mobile-small-font'
+    if (name == 'pointer-events' and value.lower() == 'none'
+            and any('rep-team-box' in selector for selector in declaration['selectors'])):
+        return 'rep-team-pointer-events'
+    return None
+
+
+def check_styles(content, filename, sheets):
+    """Check (offset, css, media) stylesheets embedded in a document at the given offsets."""
+    rules = {rule['id']: rule for rule in STYLE_RULES}
+    line_index = build_line_index(content)
+    issues = []
+    for offset, css, media in sheets:
+        declarations = css_tools.style_declarations(css, media)
+        for declaration in css_tools.declarations_under(declarations, MOBILE_MAX_WIDTH):
+            rule_id = mobile_style_rule(declaration)
+            if not rule_id:
+                continue
+            rule = rules[rule_id]
+            line, column = line_and_column(line_index, offset + declaration['offset'])
+            issues.append({
+                'file': filename,
+                'line': line,
+                'column': column,
+                'rule': rule['id'],
+                'description': rule['description'],
+                'severity': rule['severity'],
+                'match': shorten(f"{', '.join(declaration['selectors'])} "
+                                 f"{{ {declaration['property']}: {declaration['value']} }}")
+            })
+    return issues
+
+
+def check_scripts(content, filename, scripts):
+    """Lint (offset, source) scripts embedded in a document at the given offsets."""
+    rules = {rule['id']: rule for rule in SCRIPT_RULES}
+    line_index = build_line_index(content)
+    issues = []
+    for offset, source in scripts:
+        for finding in js_tools.lint_script(source):
+            rule = rules[finding['rule']]
+            line, column = line_and_column(line_index, offset + finding['offset'])
+            issues.append({
+                'file': filename,
+                'line': line,
+                'column': column,
+                'rule': rule['id'],
+                'description': rule['description'],
+                'severity': rule['severity'],
+                'match': shorten(finding['match'])
+            })
+    return issues
+
+
+def chain_rule(entry):
+    """The CHAIN_RULES rule for a chain entry's action."""
+    for rule in CHAIN_RULES:
+        if rule['action'] == entry['action'] and rule['kind'] in (None, entry['kind']):
+            return rule
+    return None
+
+
+def check_request_chain(file_path, filename):
+    """Findings for the entries of a page's critical request chain that have an action."""
+    file_path = Path(file_path)
+    chain = request_chains.request_chain(file_path.parent, file_path.name)
+    issues = []
+    for entry in chain['entries']:
+        rule = chain_rule(entry) if entry['action'] else None
+        if not rule:
+            continue
+        if entry['gzip_bytes'] is not None:
+            size = f"{entry['gzip_bytes']:,} B gzipped"
+        else:
+            size = 'missing' if entry['path'] else 'remote'
+        issues.append({
+            'file': filename,
+            'line': entry['line'] or 1,
+            'column': 1,
+            'rule': rule['id'],
+            'description': rule['description'],
+            'severity': rule['severity'],
+            'match': shorten(f"{entry['url']} ({size}, depth {entry['depth']})", 80)
+        })
+    return issues
+
+
+def check_file(file_path, display_name=None):
+    """Run every check that applies to a file and return its issues."""
+    display_name = display_name or os.path.basename(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    issues = scan_text(content, display_name)
+    if str(file_path).endswith('.html'):
+        issues.extend(check_styles(content, display_name, css_tools.inline_styles(content)))
+        issues.extend(check_scripts(content, display_name, js_tools.inline_scripts(content)))
+        issues.extend(check_request_chain(file_path, display_name))
+    elif str(file_path).endswith('.css'):
+        issues.extend(check_styles(content, display_name, [(0, content, '')]))
+    elif str(file_path).endswith('.js'):
+        issues.extend(check_scripts(content, display_name, [(0, content)]))
+    return issues
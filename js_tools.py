@@ -0,0 +1,658 @@
+"""
+JavaScript Tools
+A small JavaScript tokenizer, and the performance checks check-for-issues.py
+runs on top of it (through issue_scanner.py) for *.js files and inline
+<script> blocks. The lexing helpers are shared with the minify stage.
+
+Regex rules see a script as flat text, so they cannot tell a listener's
+options from the next call's, or a createElement inside a loop from one
+outside it. Here the script is tokenized first - strings, template
+literals, regular expressions and comments are recognised as such - and the
+checks work on the tokens, their bracket pairs and the functions they form:
+
+    non-passive-touch-listener    touchstart/touchmove/wheel listeners without {passive: true}
+    non-passive-scroll-listener   scroll listeners without {passive: true}
+    unthrottled-scroll-handler    scroll/resize handlers doing DOM work outside requestAnimationFrame
+    layout-thrash                 a layout read (offsetHeight, getBoundingClientRect, ...) after a
+                                  DOM or style write in the same function, or in a loop that writes
+    dom-in-loop                   createElement/cloneNode/... inside a loop body
+
+injected_elements() reads the same tokens for the <link>/<script> elements a
+script creates and inserts, with the rel/href/src values they can take, for
+the request chain report (request_chains.py).
+
+Each finding is {'rule', 'offset', 'match'} with the character offset of the
+token it points at; the scanner turns that into the file's line and column.
+The analysis is per function and does not follow control flow, so it errs
+towards reporting: a read in the else branch of a write still counts.
+"""
+
+import re
+
+from css_tools import skip_string
+
+JS_PUNCTUATION = set('{}()[];,=<>:?&|!*%^~')
+JS_WORD = re.compile(r'[\w$]+')
+# Keywords after which a '/' starts a regular expression, not a division
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                     'throw', 'case', 'do', 'else', 'yield', 'await'}
+JS_OPERATOR = re.compile(
+    r'>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|&&=|\|\|=|\?\?='
+    r'|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|\+\+|--|[-+*/%&|^]=|\*\*|<<|>>|.',
+    re.DOTALL
+)
+
+SCRIPT_BLOCK = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+SCRIPT_SRC = re.compile(r'\bsrc\s*=', re.IGNORECASE)
+SCRIPT_TYPE = re.compile(r'''\btype\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+JS_TYPES = {'text/javascript', 'application/javascript', 'module'}
+
+OPENERS = {')': '(', ']': '[', '}': '{'}
+ASSIGNMENTS = {'=', '+=', '-=', '*=', '/=', '%=', '&&=', '||=', '??='}
+EXPRESSION_END = {';', ',', ')', ']', '}'}
+CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'with', 'function', 'return', 'typeof', 'new'}
+MEMBER = {'.', '?.'}
+
+# Listeners the browser has to wait for before it can scroll
+TOUCH_EVENTS = {'touchstart', 'touchmove', 'wheel', 'mousewheel'}
+SCROLL_EVENTS = {'scroll'}
+FREQUENT_EVENTS = {'scroll', 'resize'}
+THROTTLES = {'requestAnimationFrame', 'setTimeout'}
+
+# Reading these makes the browser finish any pending style and layout work
+LAYOUT_PROPERTIES = {
+    'offsetTop', 'offsetLeft', 'offsetWidth', 'offsetHeight', 'offsetParent',
+    'clientTop', 'clientLeft', 'clientWidth', 'clientHeight',
+    'scrollTop', 'scrollLeft', 'scrollWidth', 'scrollHeight',
+    'innerWidth', 'innerHeight', 'scrollX', 'scrollY', 'pageXOffset', 'pageYOffset', 'innerText',
+}
+LAYOUT_METHODS = {'getBoundingClientRect', 'getClientRects', 'getComputedStyle'}
+# Properties whose assignment, and methods whose call, changes the DOM or its styles
+WRITE_PROPERTIES = {'className', 'innerHTML', 'outerHTML', 'textContent', 'innerText', 'cssText',
+                    'scrollTop', 'scrollLeft'}
+STYLE_METHODS = {'setProperty', 'removeProperty'}
+CLASS_LIST_METHODS = {'add', 'remove', 'toggle', 'replace'}
+MUTATION_METHODS = {'appendChild', 'insertBefore', 'removeChild', 'replaceChild', 'append', 'prepend',
+                    'before', 'after', 'replaceWith', 'setAttribute', 'removeAttribute',
+                    'insertAdjacentHTML', 'insertAdjacentElement'}
+DOM_WORK = LAYOUT_PROPERTIES | LAYOUT_METHODS | WRITE_PROPERTIES | MUTATION_METHODS | {'style', 'classList'}
+CREATION_METHODS = {'createElement', 'createElementNS', 'createTextNode', 'cloneNode', 'importNode'}
+DETACHED_METHODS = CREATION_METHODS | {'createDocumentFragment'}
+LOOP_METHODS = {'forEach', 'map', 'filter', 'reduce', 'some', 'every'}
+# Script-inserted elements that make the browser download something
+INJECTED_TAGS = {'link', 'script'}
+INJECTED_ATTRIBUTES = {'rel', 'href', 'src', 'as', 'media', 'async', 'defer', 'type'}
+INSERT_METHODS = {'appendChild', 'insertBefore', 'append', 'prepend', 'before', 'after', 'replaceWith'}
+
+
+def skip_template(source, i):
+    """Return the index just past the template literal starting at source[i]."""
+    j = i + 1
+    while j < len(source):
+        char = source[j]
+        if char == '\\':
+            j += 2
+        elif char == '`':
+            return j + 1
+        elif source.startswith('${', j):
+            j += 2
+            depth = 1
+            while j < len(source) and depth:
+                char = source[j]
+                if char in '"\'':
+                    j = skip_string(source, j)
+                    continue
+                if char == '`':
+                    j = skip_template(source, j)
+                    continue
+                depth += {'{': 1, '}': -1}.get(char, 0)
+                j += 1
+        else:
+            j += 1
+    return len(source)
+
+
+def skip_regex(source, i):
+    """Return the index past the regex literal at source[i], or None if it is not one."""
+    j = i + 1
+    in_class = False
+    while j < len(source):
+        char = source[j]
+        if char == '\\':
+            j += 2
+            continue
+        if char == '\n':
+            return None
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            j += 1
+            while j < len(source) and (source[j].isalnum() or source[j] == '_'):
+                j += 1
+            return j
+        j += 1
+    return None
+
+
+def regex_allowed(last):
+    """Whether a '/' after the given token starts a regular expression."""
+    return not last or last in JS_REGEX_KEYWORDS or (last[-1] in JS_PUNCTUATION | set('+-') and last not in (')', ']'))
+
+
+def tokenize(source):
+    """Split a script into (kind, text, offset) tokens; whitespace and comments are dropped.
+
+    kind is 'name' (identifiers and keywords), 'number', 'string',
+    'template', 'regex' or 'punct'.
+    """
+    tokens = []
+    last = ''
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char.isspace():
+            i += 1
+            continue
+        if source.startswith('//', i) or source.startswith('<!--', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+            continue
+
+        if char in '"\'':
+            kind, end = 'string', skip_string(source, i)
+        elif char == '`':
+            kind, end = 'template', skip_template(source, i)
+        elif char == '/' and regex_allowed(last) and skip_regex(source, i):
+            kind, end = 'regex', skip_regex(source, i)
+        elif JS_WORD.match(source, i):
+            kind, end = 'number' if char.isdigit() else 'name', JS_WORD.match(source, i).end()
+        else:
+            kind, end = 'punct', JS_OPERATOR.match(source, i).end()
+        end = min(end, len(source))
+        last = source[i:end]
+        tokens.append((kind, last, i))
+        i = end
+    return tokens
+
+
+def inline_scripts(html):
+    """(offset, source) of every inline JavaScript block of a page."""
+    for match in SCRIPT_BLOCK.finditer(html):
+        attributes = match.group(1)
+        script_type = SCRIPT_TYPE.search(attributes)
+        if SCRIPT_SRC.search(attributes) or (script_type and script_type.group(1).lower() not in JS_TYPES):
+            continue
+        yield match.start(2), match.group(2)
+
+
+class Script:
+    """A tokenized script with its bracket pairs, functions and loops."""
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.pairs = self.match_brackets()
+        self.functions = self.find_functions()
+        self.function_at = {function['start']: index for index, function in enumerate(self.functions)}
+        self.owner = self.assign_owners()
+        self.definitions = self.find_definitions()
+        self.loops = self.find_loops()
+
+    def text(self, index):
+        """Text of the token at index, or '' past either end."""
+        return self.tokens[index][1] if 0 <= index < len(self.tokens) else ''
+
+    def is_member(self, index, names):
+        """Whether the token at index is a property access (.name) of one of the names."""
+        return self.text(index) in names and self.text(index - 1) in MEMBER
+
+    def snippet(self, start, end):
+        """Source text from token start through token end, on one line."""
+        last = self.tokens[end]
+        return ' '.join(self.source[self.tokens[start][2]:last[2] + len(last[1])].split())
+
+    def match_brackets(self):
+        """Map each bracket token to its partner; unbalanced brackets are left out."""
+        pairs = {}
+        stack = []
+        for index, (kind, text, _) in enumerate(self.tokens):
+            if kind != 'punct':
+                continue
+            if text in ('(', '[', '{'):
+                stack.append(index)
+            elif text in OPENERS:
+                while stack and self.tokens[stack[-1]][1] != OPENERS[text]:
+                    stack.pop()
+                if stack:
+                    start = stack.pop()
+                    pairs[start] = index
+                    pairs[index] = start
+        return pairs
+
+    def expression_end(self, index):
+        """Index of the last token of the expression starting at index."""
+        j = index
+        while j < len(self.tokens):
+            text = self.tokens[j][1]
+            if text in ('(', '[', '{') and j in self.pairs:
+                j = self.pairs[j] + 1
+                continue
+            if text in EXPRESSION_END:
+                break
+            j += 1
+        return max(index, j - 1)
+
+    def arguments(self, open_index):
+        """(start, end) token ranges, end exclusive, of the arguments of a call."""
+        close = self.pairs.get(open_index)
+        if close is None:
+            return []
+        ranges = []
+        start = j = open_index + 1
+        while j < close:
+            text = self.tokens[j][1]
+            if text in ('(', '[', '{') and j in self.pairs:
+                j = self.pairs[j] + 1
+                continue
+            if text == ',':
+                ranges.append((start, j))
+                start = j + 1
+            j += 1
+        if start < close:
+            ranges.append((start, close))
+        return ranges
+
+    def find_functions(self):
+        """Every function as {'start', 'body': (first, last), 'end'} token indices."""
+        functions = []
+        for index, (kind, text, _) in enumerate(self.tokens):
+            if kind == 'name' and text == 'function':
+                j = index + 1
+                if self.text(j) == '*':
+                    j += 1
+                if self.tokens[j:j + 1] and self.tokens[j][0] == 'name' and self.text(j) != '(':
+                    j += 1
+                close = self.pairs.get(j) if self.text(j) == '(' else None
+                if close is not None and self.text(close + 1) == '{' and close + 1 in self.pairs:
+                    functions.append({'start': index, 'body': (close + 1, self.pairs[close + 1]),
+                                      'end': self.pairs[close + 1]})
+            elif kind == 'punct' and text == '=>' and index:
+                if self.text(index - 1) == ')' and index - 1 in self.pairs:
+                    start = self.pairs[index - 1]
+                else:
+                    start = index - 1
+                if self.text(start - 1) == 'async':
+                    start -= 1
+                if self.text(index + 1) == '{' and index + 1 in self.pairs:
+                    body = (index + 1, self.pairs[index + 1])
+                else:
+                    body = (index + 1, self.expression_end(index + 1))
+                functions.append({'start': start, 'body': body, 'end': body[1]})
+            elif (kind == 'name' and text not in CONTROL_KEYWORDS and self.text(index + 1) == '('
+                  and self.text(index - 1) in ('{', ',', ';', '}', 'get', 'set', 'static', 'async', '*')):
+                # Method shorthand in an object literal or class body
+                close = self.pairs.get(index + 1)
+                if close is not None and self.text(close + 1) == '{' and close + 1 in self.pairs:
+                    functions.append({'start': index, 'body': (close + 1, self.pairs[close + 1]),
+                                      'end': self.pairs[close + 1]})
+        return functions
+
+    def assign_owners(self):
+        """For each token, the index of the innermost function containing it (-1 for top level)."""
+        owner = [-1] * len(self.tokens)
+        by_size = sorted(range(len(self.functions)),
+                         key=lambda index: self.functions[index]['start'] - self.functions[index]['end'])
+        for index in by_size:
+            function = self.functions[index]
+            for position in range(function['start'], function['end'] + 1):
+                owner[position] = index
+        return owner
+
+    def find_definitions(self):
+        """Map names to the functions bound to them: [(token index, function index), ...]."""
+        definitions = {}
+        for index, (kind, text, _) in enumerate(self.tokens):
+            if kind != 'name' or self.text(index - 1) in MEMBER:
+                continue
+            if self.text(index - 1) == 'function' and index - 1 in self.function_at:
+                definitions.setdefault(text, []).append((index, self.function_at[index - 1]))
+            elif self.text(index + 1) == '=' and index + 2 in self.function_at:
+                definitions.setdefault(text, []).append((index, self.function_at[index + 2]))
+        return definitions
+
+    def resolve(self, name, index):
+        """The function a name refers to at a token index: the nearest earlier binding, else the first."""
+        candidates = self.definitions.get(name)
+        if not candidates:
+            return None
+        earlier = [function for position, function in candidates if position < index]
+        return earlier[-1] if earlier else candidates[0][1]
+
+    def find_loops(self):
+        """Every loop as {'keyword', 'kind', 'body': (first, last), 'scope'} token indices."""
+        loops = []
+        for index, (kind, text, _) in enumerate(self.tokens):
+            if kind != 'name':
+                continue
+            if text in ('for', 'while') and self.text(index + 1) == '(' and index + 1 in self.pairs:
+                start = self.pairs[index + 1] + 1
+                if self.text(start) == '{' and start in self.pairs:
+                    body = (start, self.pairs[start])
+                else:
+                    body = (start, self.expression_end(start))
+                loops.append({'keyword': index, 'kind': text, 'body': body, 'scope': self.owner[index]})
+            elif text == 'do' and self.text(index + 1) == '{' and index + 1 in self.pairs:
+                loops.append({'keyword': index, 'kind': 'do', 'body': (index + 1, self.pairs[index + 1]),
+                              'scope': self.owner[index]})
+            elif self.is_member(index, LOOP_METHODS) and self.text(index + 1) == '(':
+                arguments = self.arguments(index + 1)
+                if arguments and arguments[0][0] in self.function_at:
+                    callback = self.function_at[arguments[0][0]]
+                    loops.append({'keyword': index, 'kind': f".{text}()", 'body': self.functions[callback]['body'],
+                                  'scope': callback})
+        return loops
+
+    def names_in(self, function_index, follow_calls=True):
+        """Names used anywhere in a function, plus those of the local functions it calls."""
+        function = self.functions[function_index]
+        names = {self.tokens[index][1] for index in range(function['start'], function['end'] + 1)
+                 if self.tokens[index][0] == 'name'}
+        if follow_calls:
+            for index in range(function['body'][0], function['body'][1] + 1):
+                if self.tokens[index][0] == 'name' and self.text(index + 1) == '(' and self.text(index - 1) not in MEMBER:
+                    called = self.resolve(self.tokens[index][1], index)
+                    if called is not None and called != function_index:
+                        names |= self.names_in(called, follow_calls=False)
+        return names
+
+
+def passive_option(script, options):
+    """True or False for the listener's passive flag, or None when the source cannot tell."""
+    if options is None:
+        return False
+    start, end = options
+    texts = [token[1] for token in script.tokens[start:end]]
+    for position in range(len(texts) - 2):
+        if texts[position] == 'passive' and texts[position + 1] == ':':
+            value = texts[position + 2]
+            return True if value in ('true', '!0') else False if value in ('false', '!1') else None
+    if texts in (['true'], ['false']):
+        return False
+    if texts and texts[0] == '{' and 'passive' not in texts:
+        return False
+    return None
+
+
+def has_option(script, options, name):
+    """Whether an options object literal sets name: true."""
+    if options is None:
+        return False
+    texts = [token[1] for token in script.tokens[options[0]:options[1]]]
+    return any(texts[position:position + 3] == [name, ':', 'true'] for position in range(len(texts) - 2))
+
+
+def event_name(script, argument):
+    """The event type of a listener when it is a plain string, else None."""
+    start, end = argument
+    if end - start != 1 or script.tokens[start][0] not in ('string', 'template'):
+        return None
+    text = script.tokens[start][1]
+    return None if '${' in text else text[1:-1]
+
+
+def check_listeners(script):
+    """Non-passive touch/wheel/scroll listeners and scroll handlers that are not throttled."""
+    findings = []
+    for index, (kind, text, offset) in enumerate(script.tokens):
+        if text != 'addEventListener' or not script.is_member(index, {'addEventListener'}) or script.text(index + 1) != '(':
+            continue
+        arguments = script.arguments(index + 1)
+        if len(arguments) < 2:
+            continue
+        event = event_name(script, arguments[0])
+        options = arguments[2] if len(arguments) > 2 else None
+        call = script.snippet(index, script.pairs[index + 1])
+
+        if event in TOUCH_EVENTS | SCROLL_EVENTS and passive_option(script, options) is False:
+            rule = 'non-passive-touch-listener' if event in TOUCH_EVENTS else 'non-passive-scroll-listener'
+            findings.append({'rule': rule, 'offset': offset, 'match': call})
+
+        if event in FREQUENT_EVENTS and not has_option(script, options, 'once'):
+            handler = arguments[1][0]
+            if handler in script.function_at:
+                function = script.function_at[handler]
+            elif arguments[1][1] - handler == 1 and script.tokens[handler][0] == 'name':
+                function = script.resolve(script.tokens[handler][1], index)
+            else:
+                # e.g. throttle(fn) or debounce(fn, 100): assume the wrapper paces it
+                function = None
+            if function is not None:
+                names = script.names_in(function)
+                if names & DOM_WORK and not names & THROTTLES:
+                    findings.append({'rule': 'unthrottled-scroll-handler',
+                                     'offset': script.tokens[handler][2], 'match': call})
+    return findings
+
+
+def layout_events(script, indexes):
+    """(effective index, 'read' | 'write', token index, label) for the DOM reads and writes among the tokens.
+
+    A write takes effect once its statement or call is complete, so reads in
+    its own right-hand side or arguments come before it. Writes to elements
+    the function has just created (and not yet attached) cost no layout and
+    are left out.
+    """
+    events = []
+    detached = set()
+    for index in indexes:
+        kind, text, _ = script.tokens[index]
+        if kind != 'name':
+            continue
+        following = script.text(index + 1)
+        if script.text(index - 1) not in MEMBER:
+            if text == 'getComputedStyle' and following == '(':
+                events.append((index, 'read', index, f"{text}()"))
+            elif following == '=' and any(script.is_member(position, DETACHED_METHODS)
+                                          for position in range(index + 2, script.expression_end(index + 2) + 1)):
+                detached.add(text)
+            continue
+        if script.text(index - 2) in detached and script.text(index - 3) not in MEMBER:
+            continue
+
+        if text in WRITE_PROPERTIES and following in ASSIGNMENTS:
+            events.append((script.expression_end(index + 2), 'write', index, text))
+        elif text in LAYOUT_PROPERTIES:
+            events.append((index, 'read', index, text))
+        elif text in LAYOUT_METHODS and following == '(':
+            events.append((index, 'read', index, f"{text}()"))
+        elif text == 'style' and following == '.':
+            name = script.text(index + 2)
+            if script.text(index + 3) in ASSIGNMENTS:
+                events.append((script.expression_end(index + 4), 'write', index, f"style.{name}"))
+            elif name in STYLE_METHODS and script.text(index + 3) == '(' and index + 3 in script.pairs:
+                events.append((script.pairs[index + 3], 'write', index, f"style.{name}()"))
+        elif text == 'style' and following == '[' and index + 1 in script.pairs:
+            close = script.pairs[index + 1]
+            if script.text(close + 1) in ASSIGNMENTS:
+                events.append((script.expression_end(close + 2), 'write', index, 'style[...]'))
+        elif text == 'classList' and following == '.' and script.text(index + 2) in CLASS_LIST_METHODS:
+            if script.text(index + 3) == '(' and index + 3 in script.pairs:
+                events.append((script.pairs[index + 3], 'write', index, f"classList.{script.text(index + 2)}()"))
+        elif text in MUTATION_METHODS and following == '(' and index + 1 in script.pairs:
+            if script.text(index - 2) != 'classList':
+                events.append((script.pairs[index + 1], 'write', index, f"{text}()"))
+    return sorted(events)
+
+
+def check_layout_thrash(script):
+    """Layout reads that follow a DOM write in the same function, or share a loop with one."""
+    findings = []
+    flagged = set()
+    scopes = {}
+    for index, owner in enumerate(script.owner):
+        scopes.setdefault(owner, []).append(index)
+
+    for scope, indexes in scopes.items():
+        events = layout_events(script, indexes)
+        pending = None
+        for _, action, index, label in events:
+            if action == 'write':
+                pending = pending or (index, label)
+            elif pending:
+                findings.append({'rule': 'layout-thrash', 'offset': script.tokens[index][2],
+                                 'match': f"{label} read after {pending[1]} write"})
+                flagged.add(index)
+                pending = None
+
+        # A read before a write in a loop body meets that write on the next iteration
+        for loop in script.loops:
+            if loop['scope'] != scope:
+                continue
+            first, last = loop['body']
+            inside = [event for event in events if first <= event[2] <= last]
+            writes = [event for event in inside if event[1] == 'write']
+            reads = [event for event in inside if event[1] == 'read' and event[2] not in flagged]
+            if writes and reads and reads[0][0] < writes[-1][0]:
+                read = reads[0]
+                findings.append({'rule': 'layout-thrash', 'offset': script.tokens[read[2]][2],
+                                 'match': f"{read[3]} read in a {loop['kind']} loop that also does {writes[-1][3]}"})
+                flagged.add(read[2])
+    return findings
+
+
+def check_dom_in_loops(script):
+    """Nodes created one by one in a loop body (reported once, for the innermost loop)."""
+    findings = []
+    reported = set()
+    for loop in sorted(script.loops, key=lambda loop: loop['body'][1] - loop['body'][0]):
+        first, last = loop['body']
+        for index in range(first, last + 1):
+            if (index not in reported and script.owner[index] == loop['scope']
+                    and script.is_member(index, CREATION_METHODS) and script.text(index + 1) == '('):
+                findings.append({'rule': 'dom-in-loop', 'offset': script.tokens[index][2],
+                                 'match': f"{script.text(index)}() inside a {loop['kind']} loop"})
+                reported.update(position for position in range(first, last + 1))
+                break
+    return findings
+
+
+def lint_script(source):
+    """Run every check on one script and return its findings, in source order."""
+    script = Script(source)
+    findings = check_listeners(script) + check_layout_thrash(script) + check_dom_in_loops(script)
+    return sorted(findings, key=lambda finding: (finding['offset'], finding['rule']))
+
+
+def string_values(script, start, end):
+    """The strings an expression (tokens start..end, end exclusive) can evaluate to, or None if unknown.
+
+    Understands literals, templates whose placeholders are themselves known,
+    constants bound to a literal, and the parameter of a .forEach() callback
+    over an array of literals.
+    """
+    if end - start != 1:
+        return None
+    kind, text, _ = script.tokens[start]
+    if kind == 'string':
+        return [text[1:-1]]
+    if kind == 'template':
+        values = ['']
+        for literal, placeholder in re.findall(r'((?:[^$\\]|\\.|\$(?!\{))*)(?:\$\{\s*([\w$]+)\s*\}|$)', text[1:-1]):
+            replacements = [''] if not placeholder else name_values(script, placeholder, start)
+            if replacements is None:
+                return None
+            values = [value + literal + replacement for value in values for replacement in replacements]
+        return values
+    if kind == 'name' and text in ('true', 'false'):
+        return [text]
+    if kind == 'name':
+        return name_values(script, text, start)
+    return None
+
+
+def name_values(script, name, index):
+    """The strings a name can hold at a token index, or None if unknown."""
+    function_index = script.owner[index]
+    while function_index != -1:
+        function = script.functions[function_index]
+        parameters = [script.text(position) for position in range(function['start'], function['body'][0])]
+        if name in parameters:
+            for loop in script.loops:
+                if loop['scope'] == function_index and loop['kind'] == '.forEach()':
+                    return array_values(script, loop['keyword'] - 2)
+            return None
+        function_index = script.owner[function['start'] - 1] if function['start'] else -1
+    for position in range(index - 1, -1, -1):
+        if script.text(position) == name and script.text(position + 1) == '=' and script.text(position - 1) in ('const', 'let', 'var'):
+            end = script.expression_end(position + 2)
+            return string_values(script, position + 2, end + 1)
+    return None
+
+
+def array_values(script, index):
+    """The strings of an array literal ending at index, or bound to the name there."""
+    if script.text(index) == ']' and index in script.pairs:
+        open_index = script.pairs[index]
+    elif script.tokens[index:index + 1] and script.tokens[index][0] == 'name':
+        name = script.text(index)
+        open_index = next((position + 2 for position in range(index - 1, -1, -1)
+                           if script.text(position) == name and script.text(position + 1) == '='
+                           and script.text(position + 2) == '['), None)
+        if open_index is None or open_index not in script.pairs:
+            return None
+    else:
+        return None
+    values = []
+    for start, end in script.arguments(open_index):
+        items = string_values(script, start, end)
+        if items is None:
+            return None
+        values.extend(items)
+    return values
+
+
+def injected_elements(source):
+    """<link> and <script> elements a script creates and inserts into the document.
+
+    Returns [{'tag', 'offset', 'attributes': {name: [values] or None}}] where
+    each attribute lists the values it can take (None when the source does
+    not say), for the attributes in INJECTED_ATTRIBUTES.
+    """
+    script = Script(source)
+    elements = []
+    for index, (kind, text, offset) in enumerate(script.tokens):
+        if not (script.is_member(index, {'createElement'}) and script.text(index + 1) == '('
+                and script.text(index + 3) == ')' and script.tokens[index + 2][0] == 'string'):
+            continue
+        tag = script.text(index + 2)[1:-1].lower()
+        if tag not in INJECTED_TAGS or script.text(index - 3) != '=':
+            continue
+        variable = script.text(index - 4)
+        owner = script.owner[index]
+        end = script.functions[owner]['end'] if owner != -1 else len(script.tokens)
+        attributes = {}
+        inserted = False
+        for position in range(index + 4, end):
+            if script.text(position) != variable or script.text(position - 1) in MEMBER:
+                continue
+            member = script.text(position + 2) if script.text(position + 1) == '.' else ''
+            if member in INJECTED_ATTRIBUTES and script.text(position + 3) == '=':
+                value_end = script.expression_end(position + 4)
+                attributes[member] = string_values(script, position + 4, value_end + 1)
+            elif member == 'setAttribute' and script.text(position + 3) == '(':
+                arguments = script.arguments(position + 3)
+                names = string_values(script, *arguments[0]) if len(arguments) == 2 else None
+                if names and names[0].lower() in INJECTED_ATTRIBUTES:
+                    attributes[names[0].lower()] = string_values(script, *arguments[1])
+            elif (script.text(position - 1) == '(' and script.text(position + 1) in (')', ',')
+                  and script.is_member(position - 2, INSERT_METHODS)):
+                inserted = True
+        if inserted:
+            elements.append({'tag': tag, 'offset': offset, 'attributes': attributes})
+    return elements
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Internal Link Graph
+Crawls every page once, builds the graph of internal links between them and
+reports broken links (missing files or #anchors) and orphan pages that cannot
+be reached from the homepage by following links.
+
+Usage:
+    python3 link_graph.py            # report, exit code 1 on broken links
+    python3 link_graph.py --force    # re-parse every page
+
+Each page gets a PageRank-style importance score (damping 0.85, self-links
+ignored, a page linked several times from one page gets a bigger share of
+its vote), which generate_sitemap.py turns into the sitemap <priority>. Only
+the pages that go into the sitemap are ranked - the HTML sitemap and the
+homepage variants (UNRANKED_PAGES) link to everything and would flatten the
+scores. The homepage gets 1.0 and every other page its score relative to
+the best ranked page, kept between 0.1 and 0.9 and rounded to one decimal.
+Pages with nearly the same score share a priority, and adding or removing
+an unrelated page barely moves the others, so sitemap.xml only changes when
+the links do. A new page linked from the navigation ranks like the others
+without a config entry.
+
+The parsed links and ids of every page are cached in .build-cache/link-graph.json
+by content hash; only pages whose content changed are parsed again. Broken
+links and scores are always recomputed from the cached graph, which is cheap.
+"""
+
+import argparse
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from build_cache import CACHE_DIR, file_digest, load_manifest, save_manifest
+from page_resources import resolve_url
+
+SITE_DIR = Path(__file__).parent
+MANIFEST_NAME = 'link-graph'
+
+# Never crawled: test pages
+SKIP_FILES = ['test-mobile-performance.html']
+
+# Pages visitors arrive on; everything else must be reachable from them
+ENTRY_PAGES = ['index.html']
+
+# Not ranked: the HTML sitemap and the homepage variants link to every page
+# and stay out of sitemap.xml
+UNRANKED_PAGES = ['sitemap.html', 'index-mobile-optimized.html', 'index-smooth-mobile.html',
+                  'index-ultra-mobile.html']
+
+DAMPING = 0.85
+# Entry pages get 1.0, every other page its rank relative to the top, within this range
+PRIORITY_RANGE = (0.1, 0.9)
+
+
+class LinkParser(HTMLParser):
+    """Collect the links and fragment targets of a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.ids = set()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if attrs.get('id'):
+            self.ids.add(attrs['id'])
+        if tag == 'a' and attrs.get('name'):
+            self.ids.add(attrs['name'])
+        if tag in ('a', 'area') and attrs.get('href'):
+            self.links.append({'href': attrs['href'], 'line': self.getpos()[0]})
+
+
+def discover_pages(site_dir):
+    """The pages of a site that get crawled."""
+    return sorted(
+        path.name for path in Path(site_dir).glob('*.html')
+        if not any(skip in path.name for skip in SKIP_FILES)
+    )
+
+
+def parse_page(path):
+    """Links and ids of one page."""
+    parser = LinkParser()
+    parser.feed(Path(path).read_text(encoding='utf-8'))
+    parser.close()
+    return {'links': parser.links, 'ids': sorted(parser.ids)}
+
+
+def resolve_link(site_dir, page, href):
+    """Return (target page name or file path, fragment), or None for external links."""
+    parts = urlsplit(href)
+    if href.startswith('#'):
+        return page, parts.fragment
+    path = resolve_url(site_dir, page, href)
+    if path is None:
+        return None
+    if path.is_dir() or href.endswith('/'):
+        path = path / 'index.html'
+    return path, parts.fragment
+
+
+def crawl_site(site_dir=SITE_DIR, force=False, cache_dir=CACHE_DIR):
+    """Build the link graph, re-parsing only the pages that changed since the last crawl."""
+    site_dir = Path(site_dir)
+    manifest = load_manifest(MANIFEST_NAME, cache_dir)
+    cached = {}
+    if not force and manifest.get('site') == str(site_dir.resolve()):
+        cached = manifest.get('pages', {})
+
+    pages = {}
+    parsed = []
+    for name in discover_pages(site_dir):
+        digest = file_digest(site_dir / name)
+        entry = cached.get(name)
+        if entry is None or entry.get('hash') != digest:
+            entry = dict(parse_page(site_dir / name), hash=digest)
+            parsed.append(name)
+        pages[name] = entry
+
+    if parsed or set(cached) != set(pages):
+        save_manifest(MANIFEST_NAME, {'site': str(site_dir.resolve()), 'pages': pages}, cache_dir)
+
+    edges = {name: set() for name in pages}
+    link_counts = {name: {} for name in pages}
+    broken = []
+    for name, entry in pages.items():
+        for link in entry['links']:
+            resolved = resolve_link(site_dir, name, link['href'])
+            if resolved is None:
+                continue
+            target, fragment = resolved
+            if not isinstance(target, str):
+                if not target.is_file():
+                    broken.append({'page': name, 'line': link['line'], 'href': link['href'], 'reason': 'missing file'})
+                    continue
+                relative = target.resolve().relative_to(site_dir.resolve()).as_posix() \
+                    if target.resolve().is_relative_to(site_dir.resolve()) else None
+                target = relative if relative in pages else None
+            if target is None:
+                continue
+            if fragment and fragment not in pages[target]['ids']:
+                broken.append({'page': name, 'line': link['line'], 'href': link['href'], 'reason': 'missing anchor'})
+            if target != name:
+                edges[name].add(target)
+                link_counts[name][target] = link_counts[name].get(target, 0) + 1
+
+    return {'pages': pages, 'edges': edges, 'link_counts': link_counts, 'broken': broken, 'parsed': parsed}
+
+
+def inbound_links(edges):
+    """Pages linking to each page."""
+    inbound = {name: set() for name in edges}
+    for source, targets in edges.items():
+        for target in targets:
+            inbound[target].add(source)
+    return inbound
+
+
+def find_orphans(edges, entry_pages=ENTRY_PAGES):
+    """Pages that cannot be reached from the entry pages."""
+    reached = set()
+    pending = [page for page in entry_pages if page in edges]
+    while pending:
+        page = pending.pop()
+        if page not in reached:
+            reached.add(page)
+            pending.extend(edges[page] - reached)
+    return sorted(set(edges) - reached)
+
+
+def pagerank(edges, damping=DAMPING, tolerance=1e-10, max_iterations=100, link_counts=None):
+    """PageRank scores summing to 1; pages without links share their rank with every page.
+
+    With link_counts ({source: {target: count}}) a page's rank is split
+    between its targets by how often it links to each.
+    """
+    pages = sorted(edges)
+    if not pages:
+        return {}
+    count = len(pages)
+    ranks = {page: 1.0 / count for page in pages}
+    inbound = inbound_links(edges)
+    shares = {
+        source: {target: (link_counts[source].get(target, 1) if link_counts else 1) for target in targets}
+        for source, targets in edges.items()
+    }
+    totals = {source: sum(weights.values()) for source, weights in shares.items()}
+    for _ in range(max_iterations):
+        dangling = sum(ranks[page] for page in pages if not edges[page])
+        base = (1.0 - damping) / count + damping * dangling / count
+        new_ranks = {
+            page: base + damping * sum(ranks[source] * shares[source][page] / totals[source] for source in inbound[page])
+            for page in pages
+        }
+        change = sum(abs(new_ranks[page] - ranks[page]) for page in pages)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks
+
+
+def ranked_subgraph(graph, pages=None):
+    """Edges and link counts between the given pages only (default: all but UNRANKED_PAGES)."""
+    if pages is None:
+        pages = [page for page in graph['edges'] if page not in UNRANKED_PAGES]
+    keep = set(pages) & set(graph['edges'])
+    edges = {page: graph['edges'][page] & keep for page in keep}
+    link_counts = {page: {target: count for target, count in graph['link_counts'][page].items() if target in keep}
+                   for page in keep}
+    return edges, link_counts
+
+
+def page_ranks(graph, pages=None):
+    """PageRank of the given pages, counting only the links between them."""
+    edges, link_counts = ranked_subgraph(graph, pages)
+    return pagerank(edges, link_counts=link_counts)
+
+
+def page_priorities(graph, pages=None, entry_pages=ENTRY_PAGES):
+    """Sitemap priority ('0.1' to '1.0') of the given pages (default: all but UNRANKED_PAGES) from their rank."""
+    ranks = page_ranks(graph, pages)
+    top = max(ranks.values(), default=0.0)
+    low, high = PRIORITY_RANGE
+    priorities = {}
+    for page, rank in ranks.items():
+        if page in entry_pages:
+            priorities[page] = '1.0'
+        else:
+            priorities[page] = f"{min(max(rank / top, low), high):.1f}"
+    return priorities
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Crawl the internal link graph and report broken links and orphans.')
+    parser.add_argument('--site-dir', default=str(SITE_DIR), help='directory holding the pages')
+    parser.add_argument('--force', action='store_true', help='ignore the cache and re-parse every page')
+    args = parser.parse_args(argv)
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("🕸️  Internal Link Graph")
+    print("=" * 50)
+
+    graph = crawl_site(args.site_dir, args.force)
+    pages = graph['pages']
+    print(f"🔄 {len(graph['parsed'])} of {len(pages)} pages parsed, {len(pages) - len(graph['parsed'])} reused from cache\n")
+
+    ranks = page_ranks(graph)
+    priorities = page_priorities(graph)
+    inbound = inbound_links(graph['edges'])
+    print(f"{'Page':<32}{'In':>5}{'Out':>5}{'Rank':>9}{'Priority':>10}")
+    for page in sorted(pages, key=lambda name: (-ranks.get(name, 0.0), name)):
+        rank = f"{ranks[page]:.4f}" if page in ranks else '-'
+        print(f"{page:<32}{len(inbound[page]):>5}{len(graph['edges'][page]):>5}{rank:>9}{priorities.get(page, '-'):>10}")
+
+    orphans = find_orphans(graph['edges'])
+    if orphans:
+        print(f"\n⚠ {len(orphans)} orphan page(s) not reachable from {', '.join(ENTRY_PAGES)}:")
+        for page in orphans:
+            print(f"  - {page}")
+
+    if graph['broken']:
+        print(f"\n❌ {len(graph['broken'])} broken link(s):")
+        for link in graph['broken']:
+            print(f"  - {link['page']}:{link['line']}: {link['href']} ({link['reason']})")
+        return 1
+
+    print("\n✅ No broken internal links")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Page Load Simulator
+Estimates how long each page takes to load over a throttled network without
+a browser, a server or a network: the page's resource graph (page_resources.py,
+plus what its scripts insert - see request_chains.py) is replayed against a
+model of the connection.
+
+Usage:
+    python3 load_simulator.py                          # every page on slow 4G
+    python3 load_simulator.py --variants               # index.html against its mobile variants
+    python3 load_simulator.py --site-dir dist --profile slow-4g --profile fast-4g
+    python3 load_simulator.py index.html --rtt 300 --bandwidth 700 --connections 2
+    python3 load_simulator.py index.html --waterfall
+    python3 load_simulator.py --json before.json       # then, after a change:
+    python3 load_simulator.py --baseline before.json
+
+The network model:
+- a profile is a round-trip time, a downstream bandwidth and a number of
+  HTTP/1.1 connections per origin (one request at a time on each);
+- a new connection costs a TCP and a TLS 1.3 handshake (2 RTT), plus a DNS
+  lookup (1 RTT) for the first connection to an origin;
+- a response starts one RTT plus SERVER_MS after its request is sent, then
+  arrives as fast as the connection's congestion window allows (10 packets
+  at first, growing by every byte acknowledged, like TCP slow start) within
+  a fair share of the bandwidth. Reused connections keep their window.
+
+The page model:
+- the preload scanner finds the page's references as the HTML bytes up to
+  their line arrive; a stylesheet's @imports, fonts and images are found
+  when it has loaded, and the elements a script inserts once it has run;
+- a synchronous script stops the parser until it, and every stylesheet
+  above it, has loaded; defer scripts run after parsing, async ones whenever;
+- icons and the manifest are fetched after load and left out, as are the
+  prefetch / dns-prefetch hints scripts insert.
+
+It reports, per page:
+
+    TTFB   first byte of the HTML
+    FCP    first contentful paint: the parser has reached <body> and every
+           render-blocking stylesheet has loaded
+    DCL    DOMContentLoaded: the document is parsed and its sync and defer
+           scripts have run
+    Load   every request has finished
+
+Sizes are transfer sizes plus HEADER_BYTES: the prebuilt .br/.gz next to a
+file when there is one (what serve_site.py sends, so --site-dir dist
+measures the real build), else text files gzipped as a host would, and
+images as they are. Remote resources (CDNs) cannot be measured offline and
+count as REMOTE_BYTES for their kind.
+
+CPU time (parsing, script execution, style and layout) is not modelled, so
+the times are a lower bound. They are for comparing pages, profiles and
+changes against each other, not for predicting field data.
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import request_chains
+from file_writes import write_text
+from page_resources import page_resources
+from precompress import COMPRESSIBLE
+
+SITE_DIR = Path(__file__).parent
+
+# name: round-trip time (ms), downstream bandwidth (kbit/s), connections per origin
+PROFILES = {
+    'slow-3g': {'rtt_ms': 400, 'down_kbps': 400, 'connections': 6},
+    'slow-4g': {'rtt_ms': 150, 'down_kbps': 1638.4, 'connections': 6},
+    'fast-4g': {'rtt_ms': 60, 'down_kbps': 9000, 'connections': 6},
+    'broadband': {'rtt_ms': 20, 'down_kbps': 50000, 'connections': 6},
+}
+DEFAULT_PROFILE = 'slow-4g'
+
+# The home page and the mobile variants it is compared against
+INDEX_VARIANTS = ['index.html', 'index-ultra-mobile.html', 'index-smooth-mobile.html', 'index-mobile-optimized.html']
+
+# Never simulated: test pages
+SKIP_FILES = ['test-mobile-performance.html']
+
+SERVER_MS = 20
+HEADER_BYTES = 400
+INITIAL_WINDOW_BYTES = 10 * 1460
+# Assumed transfer size of a remote resource, by kind
+REMOTE_BYTES = {'css': 20000, 'js': 30000, 'font': 40000, 'image': 30000, 'other': 10000}
+STEP_MS = 1
+MAX_MS = 600000
+
+# Prebuilt files serve_site.py would send, by --encoding
+ENCODING_SUFFIXES = {'br': ['.br', '.gz'], 'gzip': ['.gz'], 'identity': []}
+
+# Request order on a busy origin, most urgent first
+PRIORITY = {'document': 0, 'blocking': 1, 'sync': 2, 'defer': 3, 'async': 4}
+
+SCRIPT_TAG = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+SCRIPT_SRC = re.compile(r'''\bsrc\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+BODY_TAG = re.compile(r'<body\b', re.IGNORECASE)
+
+
+def script_modes(content):
+    """Map each script src of a page to 'sync', 'defer' or 'async'."""
+    modes = {}
+    for match in SCRIPT_TAG.finditer(content):
+        attributes = match.group(1)
+        src = SCRIPT_SRC.search(attributes)
+        if not src:
+            continue
+        if re.search(r'\basync\b', attributes, re.IGNORECASE):
+            mode = 'async'
+        elif re.search(r'''\bdefer\b|\btype\s*=\s*["']?module''', attributes, re.IGNORECASE):
+            mode = 'defer'
+        else:
+            mode = 'sync'
+        modes.setdefault(src.group(1), mode)
+    return modes
+
+
+def transfer_bytes(resource, encoding):
+    """(bytes on the wire, estimated) for a resource."""
+    if resource['bytes'] is None:
+        if resource['path'] is not None:
+            # A missing local file: a 404 with no body
+            return HEADER_BYTES, False
+        return REMOTE_BYTES.get(resource['kind'], REMOTE_BYTES['other']) + HEADER_BYTES, True
+    path = resource['path']
+    if encoding != 'identity' and path.suffix.lower() in COMPRESSIBLE:
+        for suffix in ENCODING_SUFFIXES[encoding]:
+            compressed = path.with_name(path.name + suffix)
+            if compressed.is_file():
+                return compressed.stat().st_size + HEADER_BYTES, False
+        return min(resource['bytes'], resource['gzip_bytes']) + HEADER_BYTES, False
+    return resource['bytes'] + HEADER_BYTES, False
+
+
+def page_requests(site_dir, page_name, encoding='br'):
+    """The requests of a page load with what their discovery and timing depend on.
+
+    Returns (requests, page_lines, body_line).
+    """
+    site_dir = Path(site_dir)
+    content = (site_dir / page_name).read_text(encoding='utf-8')
+    page_lines = content.count('\n') + 1
+    body = BODY_TAG.search(content)
+    body_line = content.count('\n', 0, body.start()) + 1 if body else 1
+    resources = page_resources(site_dir, page_name)
+    modes = script_modes(content)
+
+    candidates = []
+    for resource in resources:
+        if resource['via'] in ('icon', 'manifest'):
+            continue
+        if resource['via'] == 'page':
+            role = 'document'
+        elif resource['kind'] == 'js' and resource['via'] == 'script':
+            role = modes.get(resource['url'], 'sync')
+        elif resource['blocking']:
+            role = 'blocking'
+        else:
+            role = 'async'
+        candidates.append((resource, role, False))
+    for entry in request_chains.injected_entries(site_dir, page_name, content, resources):
+        if entry['kind'] != 'hint' and (entry['path'] is not None or urlsplit(entry['url']).netloc):
+            candidates.append((entry, 'async', True))
+
+    requests = []
+    for resource, role, injected in candidates:
+        size, estimated = transfer_bytes(resource, encoding)
+        requests.append({
+            'url': resource['url'], 'kind': resource['kind'], 'role': role, 'injected': injected,
+            'origin': urlsplit(resource['url']).netloc.lower(), 'parent': resource['parent'],
+            'line': resource['line'], 'bytes': size, 'estimated': estimated,
+            'discovered': None, 'sent': None, 'first_byte': None, 'done': None, 'received': 0,
+        })
+    return requests, page_lines, body_line
+
+
+def share_bandwidth(caps, capacity):
+    """Split capacity between downloads fairly, none getting more than its cap."""
+    allocation = {}
+    pending = sorted(caps.items(), key=lambda item: item[1])
+    while pending:
+        share = capacity / len(pending)
+        key, cap = pending[0]
+        if cap > share:
+            for key, _ in pending:
+                allocation[key] = share
+            break
+        allocation[key] = cap
+        capacity -= cap
+        pending.pop(0)
+    return allocation
+
+
+def simulate(requests, page_lines, body_line, profile):
+    """Run one page load; fills in the request timings and returns the milestones in ms."""
+    rtt = profile['rtt_ms']
+    bytes_per_step = profile['down_kbps'] / 8 * STEP_MS
+    document = requests[0]
+    by_url = {}
+    for request in requests:
+        by_url.setdefault(request['url'], request)
+    scripts = sorted((request for request in requests if request['role'] == 'sync'),
+                     key=lambda request: request['line'] or 0)
+    stylesheets = [request for request in requests if request['role'] == 'blocking']
+    connections = {}
+    looked_up = set()
+    milestones = {'ttfb': None, 'fcp': None, 'dcl': None, 'load': None}
+
+    def finished(request, now):
+        return request['done'] is not None and request['done'] <= now
+
+    def executed(script, now):
+        # A script runs once it and every stylesheet above it have loaded
+        return finished(script, now) and all(finished(sheet, now) for sheet in stylesheets
+                                             if (sheet['line'] or 0) < (script['line'] or 0) and sheet['parent'] is None)
+
+    def parser_line(received_lines, now):
+        for script in scripts:
+            if (script['line'] or 0) > received_lines:
+                break
+            if not executed(script, now):
+                return script['line']
+        return received_lines
+
+    def is_discoverable(request, now, received_lines, parsed_lines):
+        if request is document:
+            return True
+        if request['injected']:
+            if request['parent'] is None:
+                return parsed_lines >= (request['line'] or page_lines)
+            parent = by_url.get(request['parent'])
+            if parent is None or not finished(parent, now):
+                return False
+            return parent['role'] != 'defer' or parsed_lines >= page_lines
+        if request['parent'] is not None:
+            parent = by_url.get(request['parent'])
+            return parent is not None and finished(parent, now)
+        return received_lines >= (request['line'] or page_lines)
+
+    now = 0.0
+    while now <= MAX_MS:
+        received_lines = page_lines * document['received'] / document['bytes'] if document['bytes'] else page_lines
+        if finished(document, now):
+            received_lines = page_lines
+        parsed_lines = parser_line(received_lines, now)
+
+        for request in requests:
+            if request['discovered'] is None and is_discoverable(request, now, received_lines, parsed_lines):
+                request['discovered'] = now
+
+        # Hand waiting requests to free connections, most urgent first
+        waiting = sorted((request for request in requests if request['discovered'] is not None and request['sent'] is None),
+                         key=lambda request: (PRIORITY[request['role']], request['discovered']))
+        for request in waiting:
+            pool = connections.setdefault(request['origin'], [])
+            connection = next((c for c in pool if c['request'] is None or finished(c['request'], now)), None)
+            if connection is None and len(pool) < profile['connections']:
+                setup = 2 * rtt + (0 if request['origin'] in looked_up else rtt)
+                looked_up.add(request['origin'])
+                connection = {'ready': now + setup, 'window': INITIAL_WINDOW_BYTES, 'request': None}
+                pool.append(connection)
+            if connection is None:
+                continue
+            connection['request'] = request
+            request['connection'] = connection
+            request['sent'] = max(now, connection['ready'])
+            request['first_byte'] = request['sent'] + rtt + SERVER_MS
+
+        # Deliver this step's bytes
+        active = [request for request in requests
+                  if request['first_byte'] is not None and request['first_byte'] <= now and request['done'] is None]
+        caps = {index: min(request['bytes'] - request['received'], request['connection']['window'] / rtt * STEP_MS)
+                for index, request in enumerate(active)}
+        for index, amount in share_bandwidth(caps, bytes_per_step).items():
+            request = active[index]
+            request['received'] += amount
+            request['connection']['window'] += amount
+            if request['received'] >= request['bytes'] - 1e-9:
+                request['done'] = now + STEP_MS * (amount / max(caps[index], 1e-9))
+                request['connection']['ready'] = request['done']
+
+        if milestones['ttfb'] is None and document['first_byte'] is not None:
+            milestones['ttfb'] = document['first_byte']
+        if (milestones['fcp'] is None and parsed_lines >= body_line
+                and all(finished(sheet, now) for sheet in stylesheets)):
+            milestones['fcp'] = now
+        if (milestones['dcl'] is None and finished(document, now) and parsed_lines >= page_lines
+                and all(finished(request, now) for request in requests if request['role'] == 'defer')):
+            milestones['dcl'] = now
+        if milestones['dcl'] is not None and all(finished(request, now) for request in requests):
+            milestones['load'] = max(milestones['dcl'], max(request['done'] for request in requests))
+            break
+
+        # Nothing downloading: jump to the next response
+        if not active:
+            upcoming = [request['first_byte'] for request in requests
+                        if request['first_byte'] is not None and request['first_byte'] > now]
+            if upcoming and not waiting:
+                now = max(now + STEP_MS, min(upcoming) - (min(upcoming) % STEP_MS))
+                continue
+        now += STEP_MS
+
+    for request in requests:
+        request.pop('connection', None)
+    return milestones
+
+
+def simulate_page(site_dir, page_name, profile, encoding='br'):
+    """Simulate one page load and summarize it."""
+    requests, page_lines, body_line = page_requests(site_dir, page_name, encoding)
+    milestones = simulate(requests, page_lines, body_line, profile)
+    return {
+        'page': page_name,
+        'requests': len(requests),
+        'bytes': sum(request['bytes'] for request in requests),
+        'estimated_requests': sum(1 for request in requests if request['estimated']),
+        **milestones,
+        'timeline': requests,
+    }
+
+
+def discover_pages(site_dir):
+    """The pages of a site that get simulated."""
+    return sorted(
+        path.name for path in Path(site_dir).glob('*.html')
+        if not any(skip in path.name for skip in SKIP_FILES)
+    )
+
+
+def format_ms(value):
+    """Milliseconds as seconds, or '-' when the milestone was never reached."""
+    return f"{value / 1000:.2f}s" if value is not None else '-'
+
+
+def format_delta(value, reference):
+    """Signed difference in seconds."""
+    if value is None or reference is None:
+        return '-'
+    return f"{(value - reference) / 1000:+.2f}s"
+
+
+def print_results(profile_name, profile, encoding, results, references=None, reference_label=''):
+    """Print one profile's table, with FCP/Load deltas when there is something to compare to."""
+    print(f"\n📶 {profile_name}: {profile['rtt_ms']:g} ms RTT, {profile['down_kbps'] / 1000:.3g} Mbit/s, "
+          f"{profile['connections']} connection(s) per origin, {encoding} transfer sizes")
+    header = f"{'Page':<34}{'Reqs':>5}{'KB':>8}{'TTFB':>8}{'FCP':>8}{'DCL':>8}{'Load':>8}"
+    if references:
+        header += f"{'ΔFCP':>9}{'ΔLoad':>9}"
+    print(header)
+    for result in results:
+        line = (f"{result['page']:<34}{result['requests']:>5}{result['bytes'] / 1024:>8.1f}"
+                f"{format_ms(result['ttfb']):>8}{format_ms(result['fcp']):>8}"
+                f"{format_ms(result['dcl']):>8}{format_ms(result['load']):>8}")
+        if references:
+            reference = references.get(result['page'])
+            line += (f"{format_delta(result['fcp'], reference and reference['fcp']):>9}"
+                     f"{format_delta(result['load'], reference and reference['load']):>9}")
+        if result['estimated_requests']:
+            line += f"  ⚠ {result['estimated_requests']} remote size(s) assumed"
+        print(line)
+    if references and reference_label:
+        print(f"  Δ against {reference_label}")
+
+
+def print_waterfall(result, width=40):
+    """Print when each request of a page was found, sent, started and finished."""
+    end = result['load'] or max((request['done'] or 0) for request in result['timeline']) or 1
+    print(f"\n🌊 {result['page']}")
+    for request in sorted(result['timeline'], key=lambda request: (request['discovered'] is None, request['discovered'] or 0)):
+        name = request['url'] if len(request['url']) <= 36 else '…' + request['url'][-35:]
+        if request['done'] is None:
+            print(f"  {name:<36} {request['role']:<9} never finished")
+            continue
+        start = int(request['sent'] / end * width)
+        first = int(request['first_byte'] / end * width)
+        done = max(int(request['done'] / end * width), first + 1)
+        bar = ' ' * start + '·' * (first - start) + '█' * (done - first)
+        print(f"  {name:<36} {request['role']:<9}{request['bytes'] / 1024:>7.1f}KB "
+              f"{format_ms(request['discovered']):>7}→{format_ms(request['done']):<7} |{bar:<{width}}|")
+    print(f"  {'':<36} {'':<9}{'':>9} · waiting   █ downloading")
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Estimate page load times over a simulated network, offline.')
+    parser.add_argument('pages', nargs='*', help='pages to simulate (default: every page)')
+    parser.add_argument('--site-dir', default=str(SITE_DIR), help='site directory (default: this directory)')
+    parser.add_argument('--variants', action='store_true',
+                        help=f"compare {INDEX_VARIANTS[0]} with its mobile variants")
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                        help=f'network profile, repeatable (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--rtt', type=float, help='override the round-trip time (ms)')
+    parser.add_argument('--bandwidth', type=float, help='override the downstream bandwidth (kbit/s)')
+    parser.add_argument('--connections', type=int, help='override the connections per origin')
+    parser.add_argument('--encoding', choices=sorted(ENCODING_SUFFIXES), default='br',
+                        help='transfer encoding the sizes assume (default: br)')
+    parser.add_argument('--waterfall', action='store_true', help='print each request of every page')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare with results written by an earlier --json')
+    args = parser.parse_args(argv)
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("⏱️  Page Load Simulator")
+    print("=" * 50)
+
+    site_dir = Path(args.site_dir)
+    pages = args.pages or (INDEX_VARIANTS if args.variants else discover_pages(site_dir))
+    missing = [page for page in pages if not (site_dir / page).is_file()]
+    if missing:
+        print(f"❌ Not found in {site_dir}: {', '.join(missing)}")
+        return 1
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            for result in json.load(f)['results']:
+                baseline.setdefault(result['profile'], {})[result['page']] = result
+
+    overrides = {key: value for key, value in (('rtt_ms', args.rtt), ('down_kbps', args.bandwidth),
+                                               ('connections', args.connections)) if value is not None}
+    recorded = []
+    for profile_name in args.profile or [DEFAULT_PROFILE]:
+        profile = dict(PROFILES[profile_name], **overrides)
+        label = f"{profile_name} (custom)" if overrides else profile_name
+        results = [simulate_page(site_dir, page, profile, args.encoding) for page in pages]
+
+        if args.baseline:
+            print_results(label, profile, args.encoding, results, baseline.get(label, {}), args.baseline)
+        elif args.variants:
+            references = {result['page']: results[0] for result in results}
+            print_results(label, profile, args.encoding, results, references, results[0]['page'])
+        else:
+            print_results(label, profile, args.encoding, results)
+
+        if args.waterfall:
+            for result in results:
+                print_waterfall(result)
+
+        recorded.extend(dict({key: value for key, value in result.items() if key != 'timeline'},
+                             profile=label, network=profile, encoding=args.encoding) for result in results)
+
+    if args.json:
+        write_text(args.json, json.dumps({'site_dir': str(site_dir), 'results': recorded}, indent=2) + '\n')
+        print(f"\n📝 Wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Origin Load Test
+Replays a realistic page-view mix against a local origin and reports
+throughput, latency percentiles and bytes per view.
+
+Usage:
+    python3 load_test.py                          # in-process serve_site.py on dist/
+    python3 load_test.py --views 2000 -c 32 --json before.json
+    python3 load_test.py --url http://127.0.0.1:8000 --duration 30
+    python3 load_test.py --no-keepalive --warm
+
+A page view is the page plus every local stylesheet, script, icon and image
+it loads (see page_resources.py). The pages of generate_sitemap.PAGE_CONFIG
+that the link graph ranks are picked at random, weighted by their sitemap
+priority (link_graph.py).
+Each virtual user (-c) opens up to --connections connections like a browser
+and, unless --no-keepalive is given, reuses them across requests and views. --warm makes each user
+revalidate what it fetched before with If-None-Match, like a repeat visit.
+
+Latencies and view sizes are recorded in HDR-style log-linear histograms
+(about 1% precision at any magnitude), so percentiles stay accurate for long
+runs without storing every sample. --json writes the summary and the
+histogram buckets for comparing runs before and after a pipeline change.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from file_writes import write_text
+from generate_sitemap import PAGE_CONFIG
+from link_graph import crawl_site, page_priorities
+from page_resources import page_resources
+
+SITE_DIR = Path(__file__).parent
+DIST_DIR = SITE_DIR / 'dist'
+
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """Log-linear histogram: 2**SUB_BITS buckets per power of two."""
+
+    SUB_BITS = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        """Bucket index of a non-negative integer value."""
+        if value < (1 << self.SUB_BITS):
+            return value
+        shift = value.bit_length() - self.SUB_BITS - 1
+        return ((shift + 1) << self.SUB_BITS) + (value >> shift) - (1 << self.SUB_BITS)
+
+    def bucket_value(self, index):
+        """Highest value that falls into a bucket."""
+        if index < (1 << self.SUB_BITS):
+            return index
+        shift = (index >> self.SUB_BITS) - 1
+        mantissa = (index & ((1 << self.SUB_BITS) - 1)) + (1 << self.SUB_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self.bucket(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """Value at or below which the given percentage of samples fall."""
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * percent / 100.0))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'min': self.min or 0,
+            'mean': self.sum / self.total if self.total else 0,
+            'max': self.max or 0,
+            **{f'p{percent}': self.percentile(percent) for percent in PERCENTILES},
+        }
+
+    def buckets(self):
+        """[upper bound, count] pairs for the JSON report."""
+        return [[self.bucket_value(index), self.counts[index]] for index in sorted(self.counts)]
+
+
+def build_views(root):
+    """URL paths fetched by a view of each page, with the page weights."""
+    views = {}
+    priorities = page_priorities(crawl_site(SITE_DIR))
+    for page in PAGE_CONFIG:
+        if page not in priorities or not (Path(root) / page).is_file():
+            continue
+        paths = []
+        for resource in page_resources(root, page):
+            path = resource['path'].resolve() if resource['path'] is not None else None
+            # Only files inside the root are served
+            if path is not None and resource['bytes'] is not None and path.is_relative_to(Path(root).resolve()):
+                paths.append('/' + quote(path.relative_to(Path(root).resolve()).as_posix()))
+        views[page] = {'paths': paths, 'weight': float(priorities[page])}
+    return views
+
+
+class Connection:
+    """One HTTP/1.1 client connection."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, path, headers, keep_alive):
+        """Send a GET and return (status, headers, body_bytes)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status = int(status_line.split(' ', 2)[1])
+        response_headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, _, value = line.partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            length = int(response_headers['content-length'])
+            await self.reader.readexactly(length)
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            length = await self.read_chunked()
+        elif status in (204, 304):
+            length = 0
+        else:
+            length = len(await self.reader.read())
+            response_headers['connection'] = 'close'
+
+        if not keep_alive or response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, length
+
+    async def read_chunked(self):
+        length = 0
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return length
+            await self.reader.readexactly(size + 2)
+            length += size
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+class VirtualUser:
+    """A browser-like client with its own connections and HTTP cache."""
+
+    def __init__(self, host, port, options, stats):
+        self.connections = [Connection(host, port) for _ in range(options.connections)]
+        self.options = options
+        self.stats = stats
+        self.etags = {}
+
+    async def fetch(self, connection, path):
+        headers = {'Accept-Encoding': self.options.encoding} if self.options.encoding else {}
+        if self.options.warm and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        started = time.perf_counter()
+        try:
+            status, response_headers, length = await connection.request(path, headers, self.options.keepalive)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            await connection.close()
+            self.stats['errors'][type(e).__name__] = self.stats['errors'].get(type(e).__name__, 0) + 1
+            return 0
+        self.stats['request_latency'].record((time.perf_counter() - started) * 1e6)
+        self.stats['requests'] += 1
+        self.stats['status'][status] = self.stats['status'].get(status, 0) + 1
+        if 'etag' in response_headers:
+            self.etags[path] = response_headers['etag']
+        return length
+
+    async def view(self, page, paths):
+        """Fetch the page, then its resources spread over the user's connections."""
+        started = time.perf_counter()
+        total = await self.fetch(self.connections[0], paths[0])
+        queue = list(paths[1:])
+
+        async def worker(connection):
+            fetched = 0
+            while queue:
+                fetched += await self.fetch(connection, queue.pop(0))
+            return fetched
+
+        total += sum(await asyncio.gather(*(worker(connection) for connection in self.connections)))
+        self.stats['view_latency'].record((time.perf_counter() - started) * 1e6)
+        self.stats['view_bytes'].record(total)
+        self.stats['views'] += 1
+        self.stats['pages'][page] = self.stats['pages'].get(page, 0) + 1
+
+    async def close(self):
+        for connection in self.connections:
+            await connection.close()
+
+
+async def run_load(host, port, views, options):
+    """Run the virtual users until the view count or duration is reached."""
+    stats = {
+        'requests': 0, 'views': 0, 'status': {}, 'errors': {}, 'pages': {},
+        'request_latency': Histogram(), 'view_latency': Histogram(), 'view_bytes': Histogram(),
+    }
+    names = list(views)
+    weights = [views[name]['weight'] for name in names]
+    rng = random.Random(options.seed)
+    deadline = time.perf_counter() + options.duration if options.duration else None
+    remaining = [options.views]
+
+    async def user_loop():
+        user = VirtualUser(host, port, options, stats)
+        try:
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        break
+                elif remaining[0] <= 0:
+                    break
+                else:
+                    remaining[0] -= 1
+                page = rng.choices(names, weights)[0]
+                await user.view(page, views[page]['paths'])
+        finally:
+            await user.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_loop() for _ in range(options.concurrency)))
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+
+def build_report(stats, options, target):
+    """JSON-serializable summary of a run."""
+    elapsed = stats['elapsed'] or 1e-9
+    return {
+        'target': target,
+        'config': {
+            'concurrency': options.concurrency, 'connections': options.connections,
+            'keepalive': options.keepalive, 'warm': options.warm, 'encoding': options.encoding,
+            'views': options.views, 'duration': options.duration, 'seed': options.seed,
+        },
+        'elapsed_seconds': round(stats['elapsed'], 3),
+        'views': stats['views'],
+        'requests': stats['requests'],
+        'views_per_second': stats['views'] / elapsed,
+        'requests_per_second': stats['requests'] / elapsed,
+        'bytes_per_second': stats['view_bytes'].sum / elapsed,
+        'status': {str(code): count for code, count in sorted(stats['status'].items())},
+        'errors': stats['errors'],
+        'pages': dict(sorted(stats['pages'].items())),
+        'request_latency_us': dict(stats['request_latency'].summary(), buckets=stats['request_latency'].buckets()),
+        'view_latency_us': dict(stats['view_latency'].summary(), buckets=stats['view_latency'].buckets()),
+        'view_bytes': dict(stats['view_bytes'].summary(), buckets=stats['view_bytes'].buckets()),
+    }
+
+
+def print_report(report):
+    """Human-readable summary."""
+    print(f"\n📊 {report['views']:,} views, {report['requests']:,} requests in {report['elapsed_seconds']:.2f}s")
+    print(f"  Throughput: {report['views_per_second']:,.1f} views/s, {report['requests_per_second']:,.1f} req/s, "
+          f"{report['bytes_per_second'] / 1e6:,.2f} MB/s")
+    print(f"{'':<18}{'p50':>12}{'p95':>12}{'p99':>12}{'max':>12}")
+    for label, key, scale, unit in (('Request latency', 'request_latency_us', 1000, 'ms'),
+                                    ('View latency', 'view_latency_us', 1000, 'ms'),
+                                    ('Bytes per view', 'view_bytes', 1024, 'KB')):
+        summary = report[key]
+        cells = ''.join(f"{summary[name] / scale:>10.1f}{unit}" for name in ('p50', 'p95', 'p99', 'max'))
+        print(f"  {label:<16}{cells}")
+    print(f"  Status codes: {', '.join(f'{code}: {count}' for code, count in report['status'].items())}")
+    if report['errors']:
+        print(f"  ❌ Errors: {report['errors']}")
+
+
+async def main_async(options):
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("🔥 Origin Load Test")
+    print("=" * 50)
+
+    if options.url:
+        parts = urlsplit(options.url)
+        host, port = parts.hostname, parts.port or 80
+        server = None
+    else:
+        from serve_site import start_server
+        server = await start_server(options.root, '127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    views = build_views(options.root)
+    if not views:
+        print(f"❌ No pages from PAGE_CONFIG found in {options.root}")
+        return 1
+    target = options.url or f"http://{host}:{port} (in-process, {Path(options.root).resolve()})"
+    print(f"🚀 {options.concurrency} users x {options.connections} connections against {target}")
+    try:
+        stats = await run_load(host, port, views, options)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            # Let the handlers see the clients' EOF before the loop shuts down
+            await asyncio.sleep(0.1)
+
+    report = build_report(stats, options, target)
+    print_report(report)
+    if options.json:
+        write_text(options.json, json.dumps(report, indent=2) + '\n')
+        print(f"\n📝 Wrote {options.json}")
+    return 1 if report['errors'] else 0
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Replay a weighted page-view mix against a local origin.')
+    parser.add_argument('--url', help='origin to test (default: start serve_site.py in-process)')
+    parser.add_argument('--root', default=str(DIST_DIR if DIST_DIR.exists() else SITE_DIR),
+                        help='site directory the page mix is read from (default: dist/ if built)')
+    parser.add_argument('--concurrency', '-c', type=int, default=8, help='virtual users (default: 8)')
+    parser.add_argument('--connections', type=int, default=6, help='connections per user (default: 6)')
+    parser.add_argument('--views', '-n', type=int, default=500, help='page views to run (default: 500)')
+    parser.add_argument('--duration', type=float, help='run for this many seconds instead of --views')
+    parser.add_argument('--no-keepalive', dest='keepalive', action='store_false',
+                        help='open a new connection for every request')
+    parser.add_argument('--warm', action='store_true', help='revalidate cached responses with If-None-Match')
+    parser.add_argument('--encoding', default='br, gzip', help="Accept-Encoding to send ('' for none)")
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the page mix')
+    parser.add_argument('--json', help='write the report and histograms to this file')
+    options = parser.parse_args(argv)
+    return asyncio.run(main_async(options))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Minify Stage
+Build stage (see build_site.py) that minifies the HTML pages and the CSS and
+JS files in dist/ without changing what they do.
+
+    HTML  comments dropped (conditional comments kept), whitespace runs between
+          tags collapsed to one character; inline <style> and <script> are
+          minified as CSS / JS. <pre>, <textarea> and non-JavaScript scripts
+          - above all <script type="application/ld+json"> - are kept byte
+          for byte.
+    CSS   comments dropped (/*! ... */ kept), whitespace collapsed and removed
+          around { } ; , > and after ':', the last ';' of a block dropped.
+    JS    comments dropped and whitespace collapsed; line breaks are only
+          removed after { ; , and before } ) so automatic semicolon
+          insertion still sees the same program.
+
+Strings, template literals and regular expression literals are never
+touched. The stage runs before fingerprint-assets, so the hashed files hold
+the minified bytes; precompress (see precompress.py) reports the sizes.
+"""
+
+import re
+
+from css_tools import skip_string
+from file_writes import write_text
+from js_tools import JS_PUNCTUATION, JS_TYPES, JS_WORD, SCRIPT_TYPE, regex_allowed, skip_regex, skip_template
+from site_pipeline import register_stage
+
+CSS_TOKEN = re.compile(
+    r'/\*.*?(?:\*/|$)'                          # comment
+    r'|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''  # string
+    r'|\s+'
+    r'|[^"\'/\s{};,>:!]+|[{};,>:!/]',
+    re.DOTALL
+)
+CSS_TIGHT_AFTER = set('{};,>:')
+CSS_TIGHT_BEFORE = set('{};,>!')
+
+HTML_TOKEN = re.compile(
+    r'<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>'
+    r'|<!--.*?-->'
+    r'|<[^>]+>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def minify_css(css):
+    """Minify a stylesheet."""
+    output = []
+    pending_space = False
+    for match in CSS_TOKEN.finditer(css):
+        token = match.group(0)
+        if token.startswith('/*'):
+            if not token.startswith('/*!'):
+                # A comment still separates the tokens around it
+                pending_space = True
+                continue
+        elif token.isspace():
+            pending_space = True
+            continue
+
+        previous = output[-1][-1] if output else ''
+        if pending_space and previous and previous not in CSS_TIGHT_AFTER and token[0] not in CSS_TIGHT_BEFORE:
+            output.append(' ')
+        pending_space = False
+        if token == '}' and output and output[-1] == ';':
+            output.pop()
+        output.append(token)
+    return ''.join(output)
+
+
+def js_needs_space(previous, following):
+    """Whether the space between two characters can be dropped."""
+    if previous in JS_PUNCTUATION or following in JS_PUNCTUATION:
+        return False
+    return True
+
+
+def minify_js(source):
+    """Minify a script, keeping one line break wherever the source had any."""
+    output = []
+    last = ''
+    pending = ''
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char.isspace():
+            j = i
+            while j < len(source) and source[j].isspace():
+                j += 1
+            if '\n' in source[i:j] or '\r' in source[i:j]:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i = j
+            continue
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = len(source) if end == -1 else end + 2
+            if source.startswith('/*!', i):
+                token = source[i:end]
+            else:
+                # A comment spanning lines still ends the statement before it
+                pending = '\n' if '\n' in source[i:end] else (pending or ' ')
+                i = end
+                continue
+        elif char in '"\'':
+            end = skip_string(source, i)
+            token = source[i:end]
+        elif char == '`':
+            end = skip_template(source, i)
+            token = source[i:end]
+        elif char == '/' and regex_allowed(last) and skip_regex(source, i):
+            end = skip_regex(source, i)
+            token = source[i:end]
+        else:
+            word = JS_WORD.match(source, i)
+            end = word.end() if word else i + 1
+            token = source[i:end]
+
+        if output and pending:
+            if pending == '\n' and output[-1][-1] not in '{;,' and token[0] not in '})':
+                output.append('\n')
+            elif js_needs_space(output[-1][-1], token[0]):
+                output.append(' ')
+        pending = ''
+        output.append(token)
+        last = token
+        i = end
+    return ''.join(output)
+
+
+def collapse_whitespace(text):
+    """Collapse each whitespace run to a single space or line break."""
+    return re.sub(r'\s+', lambda match: '\n' if '\n' in match.group(0) else ' ', text)
+
+
+def minify_html(content):
+    """Minify a page, minifying its inline CSS and JS."""
+    output = []
+    position = 0
+    for match in HTML_TOKEN.finditer(content):
+        output.append(collapse_whitespace(content[position:match.start()]))
+        position = match.end()
+        token = match.group(0)
+        tag = (match.group(1) or '').lower()
+
+        if token.startswith('<!--'):
+            if token.startswith('<!--[if') or token.startswith('<!--<![endif]'):
+                output.append(token)
+        elif tag == 'style':
+            output.append(f"<style{match.group(2)}>{minify_css(match.group(3))}</style>")
+        elif tag == 'script':
+            script_type = SCRIPT_TYPE.search(match.group(2))
+            if script_type and script_type.group(1).lower() not in JS_TYPES:
+                # JSON-LD and other data blocks are kept exactly as written
+                output.append(token)
+            else:
+                output.append(f"<script{match.group(2)}>{minify_js(match.group(3)).strip()}</script>")
+        else:
+            output.append(token)
+    output.append(collapse_whitespace(content[position:]))
+    return ''.join(output).strip() + '\n'
+
+
+def record_size(context, name, data):
+    """Remember the size of a file before minification, preferring its source."""
+    source = context.get('source_dir')
+    if source and (source / name).is_file():
+        context['minify'][name] = (source / name).stat().st_size
+    else:
+        context['minify'][name] = len(data.encode('utf-8'))
+
+
+def prepare_minify(context):
+    """Minify every stylesheet and script in the build output."""
+    site_dir = context['site_dir']
+    context['minify'] = {}
+    minifiers = {'.css': minify_css, '.js': minify_js}
+    before = after = 0
+    for path in sorted(list(site_dir.glob('*.css')) + list(site_dir.glob('*.js'))):
+        text = path.read_text(encoding='utf-8')
+        record_size(context, path.name, text)
+        minified = minifiers[path.suffix](text).strip() + '\n'
+        write_text(path, minified)
+        before += len(text.encode('utf-8'))
+        after += len(minified.encode('utf-8'))
+    print(f"🗜️  Minified stylesheets and scripts: {before:,} -> {after:,} bytes")
+
+
+@register_stage(
+    'minify',
+    'Minify HTML, inline CSS/JS and stylesheets/scripts (JSON-LD kept as is)',
+    group='build',
+    prepare=prepare_minify,
+)
+def minify_page(page):
+    """Minify the page markup and its inline styles and scripts"""
+    record_size(page['context'], page['name'], page['content'])
+    before = len(page['content'].encode('utf-8'))
+    page['content'] = minify_html(page['content'])
+    saved = before - len(page['content'].encode('utf-8'))
+    page['counters']['minify_bytes_saved'] = saved
+    if saved:
+        page['log'].append(f"✅ Minified markup ({saved:,} bytes saved)")
@@ -0,0 +1,235 @@
+"""
+Page Resources
+Resolves everything a page makes the browser download: the HTML itself,
+linked and preloaded stylesheets, scripts, icons, <img> sources and the
+url() references inside its styles and stylesheets.
+
+    resources = page_resources(SITE_DIR, 'index.html')
+    # [{'url': 'index.html', 'path': Path(...), 'kind': 'html', 'blocking': True,
+    #   'via': 'page', 'parent': None, 'line': None, 'bytes': 62248, 'gzip_bytes': 9557}, ...]
+
+'parent' is the url of the stylesheet that referenced a resource (None for
+the page and what the page references itself) and 'line' the page line of
+the tag that references it, or of the tag that pulls in its stylesheet.
+
+A resource is render-blocking when the browser must fetch it before the
+first paint: the page, stylesheets linked from the <head> without a
+non-matching media query, and scripts in the <head> without async/defer.
+What is inside <noscript> is ignored, as a browser with scripting does.
+Remote resources are listed with bytes of None since their size is not
+known offline, and a stylesheet that resolves outside the site is listed
+without what it references. Each resource appears once, however often it is referenced;
+a file that is both an icon (or the manifest) and, say, an <img> is listed
+with the <img> reference, since that is the one the page waits for.
+"""
+
+import gzip
+import os
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+CSS_IMPORT = re.compile(r'''@import\s+(?:url\()?\s*['"]?([^'")\s;]+)''')
+NON_BLOCKING_MEDIA = re.compile(r'^\s*print\s*$', re.IGNORECASE)
+
+# References the browser fetches on its own schedule, if at all
+SIDE_VIAS = ('icon', 'manifest')
+
+# <link rel="preload" as="..."> values
+AS_KINDS = {'style': 'css', 'script': 'js', 'image': 'image', 'font': 'font', 'document': 'html'}
+
+KIND_BY_SUFFIX = {
+    '.css': 'css', '.js': 'js', '.html': 'html',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.webp': 'image', '.gif': 'image',
+    '.svg': 'image', '.ico': 'image', '.avif': 'image',
+    '.woff': 'font', '.woff2': 'font', '.ttf': 'font', '.otf': 'font',
+}
+
+
+class ReferenceParser(HTMLParser):
+    """Collect the resource references of a page in document order."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.references = []
+        self.inline_styles = []
+        self.in_head = True
+        self.in_style = False
+        self.in_noscript = False
+
+    def add(self, url, kind, blocking, via):
+        self.references.append({'url': url, 'kind': kind, 'blocking': blocking, 'via': via,
+                                'line': self.getpos()[0]})
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if tag == 'noscript':
+            # Fallbacks for browsers without scripting (e.g. next to an async stylesheet)
+            self.in_noscript = True
+        if self.in_noscript:
+            return
+        if tag == 'body':
+            self.in_head = False
+        elif tag == 'style':
+            self.in_style = True
+        elif tag == 'link' and attrs.get('href'):
+            rel = attrs.get('rel', '').lower().split()
+            if 'stylesheet' in rel:
+                media = attrs.get('media', '')
+                blocking = self.in_head and not NON_BLOCKING_MEDIA.match(media)
+                self.add(attrs['href'], 'css', blocking, 'link')
+            elif 'preload' in rel or 'prefetch' in rel or 'modulepreload' in rel:
+                self.add(attrs['href'], AS_KINDS.get(attrs.get('as', '').lower()), False, 'preload')
+            elif 'icon' in rel or 'apple-touch-icon' in rel or 'mask-icon' in rel:
+                self.add(attrs['href'], 'image', False, 'icon')
+            elif 'manifest' in rel:
+                self.add(attrs['href'], 'other', False, 'manifest')
+        elif tag == 'script' and attrs.get('src'):
+            deferred = 'async' in attrs or 'defer' in attrs or attrs.get('type') == 'module'
+            self.add(attrs['src'], 'js', self.in_head and not deferred, 'script')
+        elif tag == 'img' and attrs.get('src'):
+            self.add(attrs['src'], 'image', False, 'img')
+        if attrs.get('style'):
+            self.inline_styles.append(attrs['style'])
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript':
+            self.in_noscript = False
+        elif tag == 'style':
+            self.in_style = False
+        elif tag == 'head':
+            self.in_head = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self.inline_styles.append(data)
+
+
+def resolve_url(site_dir, base, url):
+    """Map a reference to a file in the site, or None if it is remote or inline."""
+    if not url or url.startswith(('data:', '#', 'mailto:', 'tel:', 'javascript:')):
+        return None
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc:
+        return None
+    path = unquote(parts.path)
+    if not path:
+        return None
+    if path.startswith('/'):
+        return Path(site_dir) / path.lstrip('/')
+    return (Path(site_dir) / base).parent / path
+
+
+def kind_of(url, default=None):
+    """Resource kind from its file extension."""
+    return KIND_BY_SUFFIX.get(Path(urlsplit(url).path).suffix.lower(), default or 'other')
+
+
+@lru_cache(maxsize=None)
+def _sizes(path, mtime_ns, size):
+    data = Path(path).read_bytes()
+    return len(data), len(gzip.compress(data, 9, mtime=0))
+
+
+def file_sizes(path):
+    """Raw and gzip-compressed size of a file, or (None, None) if it does not exist."""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None, None
+    return _sizes(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def css_references(css):
+    """Local url() and @import references of a stylesheet."""
+    references = []
+    for url in CSS_IMPORT.findall(css):
+        references.append({'url': url, 'kind': 'css', 'via': 'css-import'})
+    for _, url in CSS_URL.findall(css):
+        if not url.startswith(('data:', '#')) and not url.endswith('.css'):
+            references.append({'url': url, 'kind': kind_of(url, 'image'), 'via': 'css-url'})
+    return references
+
+
+def page_resources(site_dir, page_name):
+    """Every resource the page downloads, starting with the page itself."""
+    site_dir = Path(site_dir)
+    page_path = site_dir / page_name
+    content = page_path.read_text(encoding='utf-8')
+
+    parser = ReferenceParser()
+    parser.feed(content)
+    parser.close()
+
+    resources = {}
+
+    def add(reference, base, blocking, parent=None):
+        path = resolve_url(site_dir, base, reference['url'])
+        key = path.resolve() if path else reference['url']
+        existing = resources.get(key)
+        if existing and not (existing['via'] in SIDE_VIAS and reference['via'] not in SIDE_VIAS):
+            # Referenced twice: blocking if any reference blocks
+            existing['blocking'] = existing['blocking'] or blocking
+            return None
+        kind = reference['kind'] or kind_of(reference['url'])
+        raw, gzipped = file_sizes(path) if path else (None, None)
+        resources[key] = {
+            'url': reference['url'], 'path': path, 'kind': kind, 'blocking': blocking,
+            'via': reference['via'], 'parent': parent['url'] if parent else None,
+            'line': parent['line'] if parent else reference.get('line'), 'bytes': raw, 'gzip_bytes': gzipped,
+        }
+        if existing:
+            # An icon that is also an <img> (or a CSS image) is listed as what the page waits for
+            resources[key]['blocking'] = existing['blocking'] or blocking
+        return resources[key]
+
+    add({'url': page_name, 'kind': 'html', 'via': 'page'}, page_name, True)
+    for style in parser.inline_styles:
+        for reference in css_references(style):
+            add(reference, page_name, False)
+
+    pending = []
+    for reference in parser.references:
+        resource = add(reference, page_name, reference['blocking'])
+        if resource and resource['kind'] == 'css':
+            pending.append(resource)
+
+    # Stylesheets pull in their own imports, images and fonts
+    root = Path(os.path.normpath(site_dir.absolute()))
+    while pending:
+        stylesheet = pending.pop(0)
+        if not stylesheet['path'] or not stylesheet['path'].is_file():
+            continue
+        # Normalized without following symlinks: a linked file is still served from the site
+        path = Path(os.path.normpath(stylesheet['path'].absolute()))
+        if not path.is_relative_to(root):
+            # A ../ past the site root: listed, but not something the site serves
+            continue
+        base = path.relative_to(root).as_posix()
+        css = stylesheet['path'].read_text(encoding='utf-8')
+        for reference in css_references(css):
+            blocking = stylesheet['blocking'] and reference['kind'] == 'css'
+            resource = add(reference, base, blocking, stylesheet)
+            if resource and resource['kind'] == 'css':
+                pending.append(resource)
+
+    return list(resources.values())
+
+
+def summarize(resources):
+    """Total and render-blocking bytes (raw and gzipped) of a resource list."""
+    local = [resource for resource in resources if resource['bytes'] is not None]
+    blocking = [resource for resource in local if resource['blocking']]
+    return {
+        'requests': len(resources),
+        'remote_requests': len(resources) - len(local),
+        'blocking_remote_requests': sum(1 for resource in resources
+                                        if resource['bytes'] is None and resource['blocking']),
+        'total_bytes': sum(resource['bytes'] for resource in local),
+        'total_gzip_bytes': sum(resource['gzip_bytes'] for resource in local),
+        'blocking_bytes': sum(resource['bytes'] for resource in blocking),
+        'blocking_gzip_bytes': sum(resource['gzip_bytes'] for resource in blocking),
+    }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Page Weight Benchmark
+Measures what every page makes the browser download - the HTML, its
+stylesheets and scripts, icons and images (see page_resources.py) - and
+checks it against per-page budgets and the previous run.
+
+Usage:
+    python3 page_weight.py                     # measure, record and check every page
+    python3 page_weight.py index.html about.html
+    python3 page_weight.py --site-dir dist     # measure the build output instead
+    python3 page_weight.py --threshold 2 --no-record
+
+Each run is appended to .build-cache/page-weight-history.json with the
+commit it was measured at. Budgets and regressions are reported separately:
+the exit code is 1 when a page is over its budget, or when a page grew by
+more than --threshold percent since the last recorded run of the same pages
+in the same site directory - whether that run was within budget or not - so
+a change that makes pages heavier fails before it ships even while some
+page is still over budget.
+"""
+
+import argparse
+import datetime
+import json
+import sys
+from pathlib import Path
+
+from build_cache import CACHE_DIR
+from file_writes import write_text
+from page_resources import page_resources, summarize
+from site_history import git_head
+
+SITE_DIR = Path(__file__).parent
+HISTORY_FILE = CACHE_DIR / 'page-weight-history.json'
+
+# Never measured: test pages
+SKIP_FILES = ['test-mobile-performance.html']
+
+# Byte budgets per page; pages without an entry use 'default'.
+# blocking: what arrives in the first round trip - an initial congestion
+#   window of 10 segments (RFC 6928) is 14,600 bytes, less the headers.
+# total: what the slow-4g profile (1.6 Mbit/s, see load_simulator.py)
+#   delivers in about 2.5 seconds.
+BUDGETS = {
+    'default': {'total_gzip_bytes': 500000, 'blocking_gzip_bytes': 14000},
+}
+
+# Metrics compared against the previous run
+TRACKED_METRICS = ['total_bytes', 'total_gzip_bytes', 'blocking_bytes', 'blocking_gzip_bytes']
+DEFAULT_THRESHOLD = 5.0
+
+
+def discover_pages(site_dir):
+    """The pages of a site that get measured."""
+    return sorted(
+        path.name for path in Path(site_dir).glob('*.html')
+        if not any(skip in path.name for skip in SKIP_FILES)
+    )
+
+
+def measure(site_dir, pages):
+    """Resource totals per page."""
+    return {page: summarize(page_resources(site_dir, page)) for page in pages}
+
+
+def load_history(path):
+    """Load the run history, or an empty one."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return []
+    return history if isinstance(history, list) else []
+
+
+def save_history(path, history):
+    """Write the run history back."""
+    write_text(path, json.dumps(history, indent=2, sort_keys=True) + '\n')
+
+
+def site_label(site_dir):
+    """How a site directory is named in the history: relative to the repository if inside it."""
+    site_dir = Path(site_dir).resolve()
+    if site_dir.is_relative_to(SITE_DIR.resolve()):
+        return site_dir.relative_to(SITE_DIR.resolve()).as_posix()
+    return str(site_dir)
+
+
+def previous_run(history, label, pages):
+    """The latest run of the same pages in the same site directory, within budget or not."""
+    for run in reversed(history):
+        if run.get('site') == label and set(run.get('pages', {})) == set(pages):
+            return run
+    return None
+
+
+def check_budgets(results):
+    """List of budget violations."""
+    failures = []
+    for page, metrics in results.items():
+        budget = BUDGETS.get(page, BUDGETS['default'])
+        for metric, limit in budget.items():
+            if metrics[metric] > limit:
+                failures.append(f"{page}: {metric} {metrics[metric]:,} over budget {limit:,}")
+    return failures
+
+
+def check_regressions(results, previous, threshold):
+    """List of metrics that grew by more than threshold percent."""
+    failures = []
+    if not previous:
+        return failures
+    for page, metrics in results.items():
+        before = previous['pages'].get(page)
+        if not before:
+            continue
+        for metric in TRACKED_METRICS:
+            old = before.get(metric)
+            if old and (metrics[metric] - old) * 100.0 / old > threshold:
+                growth = (metrics[metric] - old) * 100.0 / old
+                failures.append(f"{page}: {metric} grew {growth:.1f}% ({old:,} -> {metrics[metric]:,})")
+    return failures
+
+
+def print_results(results, previous):
+    """Per-page table with the change since the previous run."""
+    print(f"{'Page':<30}{'Reqs':>6}{'Total':>12}{'Total gz':>11}{'Blocking':>11}{'Block gz':>10}{'Δ gz':>9}")
+    for page, metrics in results.items():
+        before = previous['pages'].get(page) if previous else None
+        delta = f"{metrics['total_gzip_bytes'] - before['total_gzip_bytes']:>+9,}" if before else f"{'new':>9}"
+        print(f"{page:<30}{metrics['requests']:>6}{metrics['total_bytes']:>12,}{metrics['total_gzip_bytes']:>11,}"
+              f"{metrics['blocking_bytes']:>11,}{metrics['blocking_gzip_bytes']:>10,}{delta}")
+        if metrics['blocking_remote_requests']:
+            print(f"  ⚠ {metrics['blocking_remote_requests']} render-blocking remote request(s) not counted in bytes")
+
+
+def benchmark(site_dir, pages, history_path=HISTORY_FILE, threshold=DEFAULT_THRESHOLD, record=True):
+    """Measure the pages, check them against the budgets and the previous run, and record the run."""
+    results = measure(site_dir, pages)
+    history = load_history(history_path)
+    label = site_label(site_dir)
+    previous = previous_run(history, label, pages)
+    over_budget = check_budgets(results)
+    regressions = check_regressions(results, previous, threshold)
+
+    if record:
+        history.append({
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_head(SITE_DIR),
+            'site': label,
+            'pages': results,
+            'within_budget': not over_budget,
+            'regressions': len(regressions),
+        })
+        save_history(history_path, history)
+
+    return {'results': results, 'previous': previous, 'over_budget': over_budget, 'regressions': regressions,
+            'recorded': len(history) if record else None}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Measure page weight against budgets and the previous run.')
+    parser.add_argument('pages', nargs='*', help='pages to measure (default: every page)')
+    parser.add_argument('--site-dir', default=str(SITE_DIR), help='directory holding the pages (e.g. dist)')
+    parser.add_argument('--history', default=str(HISTORY_FILE), help='JSON history file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'allowed growth per metric in percent (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--no-record', action='store_true', help='check without appending to the history')
+    args = parser.parse_args(argv)
+
+    site_dir = Path(args.site_dir)
+    pages = args.pages or discover_pages(site_dir)
+    missing = [page for page in pages if not (site_dir / page).is_file()]
+    if missing:
+        print(f"❌ No such page(s): {', '.join(missing)}")
+        return 1
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("⚖️  Page Weight Benchmark")
+    print("=" * 50)
+
+    run = benchmark(site_dir, pages, args.history, args.threshold, record=not args.no_record)
+    previous = run['previous']
+
+    print_results(run['results'], previous)
+    if run['recorded']:
+        print(f"\n📝 Recorded run #{run['recorded']} in {Path(args.history).name}")
+
+    if run['over_budget']:
+        print(f"\n❌ Budgets: {len(run['over_budget'])} metric(s) over budget")
+        for failure in run['over_budget']:
+            print(f"  - {failure}")
+    else:
+        print("\n✅ Budgets: all pages within budget")
+
+    if not previous:
+        print("➖ Regressions: no previous run of these pages to compare")
+    elif run['regressions']:
+        print(f"❌ Regressions: {len(run['regressions'])} metric(s) grew more than {args.threshold:g}% "
+              f"since {previous['timestamp']} ({(previous.get('commit') or 'no commit')[:7]})")
+        for failure in run['regressions']:
+            print(f"  - {failure}")
+    else:
+        print(f"✅ Regressions: none since {previous['timestamp']} ({(previous.get('commit') or 'no commit')[:7]})")
+
+    return 1 if run['over_budget'] or run['regressions'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Precompress Stage
+Last build stage (see build_site.py): writes a .gz - and a .br when the
+brotli package is installed (pip install brotli) - next to every text file in
+dist/, so the server can send compressed bytes without compressing on each
+request. Files are compressed in a process pool; a compressed copy is only
+rewritten when its bytes change and is dropped when it would not be smaller
+than the file itself.
+
+Prints a per-file table of source, minified and compressed sizes.
+"""
+
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from file_writes import remove_file, write_bytes
+from site_pipeline import register_stage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.html', '.css', '.js', '.json', '.xml', '.txt', '.webmanifest', '.svg', '.ico')
+
+
+def write_compressed(path, data, original_size):
+    """Write a compressed copy if it is smaller, else remove a stale one."""
+    if len(data) >= original_size:
+        remove_file(path)
+        return None
+    write_bytes(path, data)
+    return len(data)
+
+
+def compress_file(path):
+    """Write the .gz and .br of one file (runs in a worker process)."""
+    data = path.read_bytes()
+    # mtime=0 keeps the .gz bytes reproducible between builds
+    gz_size = write_compressed(path.with_name(path.name + '.gz'), gzip.compress(data, 9, mtime=0), len(data))
+    br_size = None
+    if brotli is not None:
+        br_size = write_compressed(path.with_name(path.name + '.br'), brotli.compress(data, quality=11), len(data))
+    return path.name, len(data), gz_size, br_size
+
+
+def compressible_files(site_dir):
+    """Text files of the build output that are worth compressing."""
+    return sorted(path for path in site_dir.rglob('*') if path.is_file() and path.suffix in COMPRESSIBLE)
+
+
+def remove_orphans(site_dir):
+    """Delete .gz/.br copies whose file no longer exists (e.g. old hashed names)."""
+    for pattern in ('*.gz', '*.br'):
+        for path in site_dir.rglob(pattern):
+            source = path.with_name(path.stem)
+            # Published .gz files such as sitemap.xml.gz have no dist source to follow
+            if source.suffix in COMPRESSIBLE and not source.exists():
+                remove_file(path)
+
+
+def format_size(size):
+    """Right-aligned byte count, or '-' when unknown."""
+    return f"{size:>10,}" if size is not None else f"{'-':>10}"
+
+
+def print_size_table(results, source_sizes):
+    """Print original, minified and compressed sizes per file."""
+    print("\n📦 Output sizes")
+    print(f"{'File':<48}{'Original':>10}{'Minified':>10}{'Gzip':>10}{'Brotli':>10}")
+    totals = [0, 0, 0, 0]
+    for name, size, gz_size, br_size in results:
+        original = source_sizes.get(name)
+        print(f"{name:<48}{format_size(original)}{format_size(size)}{format_size(gz_size)}{format_size(br_size)}")
+        for index, value in enumerate((original or size, size, gz_size or size, br_size or gz_size or size)):
+            totals[index] += value
+    print("-" * 88)
+    if brotli is None:
+        totals[3] = None
+    print(f"{'Total':<48}" + ''.join(format_size(total) for total in totals))
+    if brotli is None:
+        print("  ⚠ brotli not installed - only .gz files written (pip install brotli)")
+
+
+def finish_precompress(context):
+    """Compress every text file once all pages have been written."""
+    site_dir = context['site_dir']
+    remove_orphans(site_dir)
+    paths = compressible_files(site_dir)
+    with ProcessPoolExecutor(max_workers=context.get('jobs') or os.cpu_count()) as pool:
+        results = list(pool.map(compress_file, paths))
+
+    # Hashed files report the source size of the file they were made from
+    source_sizes = dict(context.get('minify', {}))
+    fingerprints = context.get('fingerprints')
+    if fingerprints:
+        for logical, hashed in fingerprints['mapping'].items():
+            if logical in source_sizes:
+                source_sizes[hashed] = source_sizes[logical]
+    results = [(path.relative_to(site_dir).as_posix(),) + result[1:] for path, result in zip(paths, results)]
+    print_size_table(results, source_sizes)
+
+
+@register_stage(
+    'precompress',
+    'Write .gz (and .br) copies of every text file in the build output',
+    group='build',
+    finish=finish_precompress,
+)
+def count_page_bytes(page):
+    """Record the final size of each page for the build totals"""
+    page['counters']['html_bytes'] = len(page['content'].encode('utf-8'))
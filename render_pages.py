@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Page Renderer
+Renders the site's pages from their sources in templates/pages/, which fill
+the blocks of templates/layouts/page.html and share the navigation, footer
+and mobile header through templates/partials/ (see templates.py).
+
+Usage:
+    python3 render_pages.py                    # re-render pages whose templates changed
+    python3 render_pages.py about.html         # only these pages
+    python3 render_pages.py --force            # re-render everything, overwriting hand edits
+
+Edit templates/pages/<page>.html rather than <page>.html: the page in the
+site root is an output. Rendering is incremental: the hash of every template
+a page uses and of the page written are kept in .build-cache/render-pages.json,
+so after a change to partials/nav.html only the pages including it are
+rendered again. A page changed on disk since it was last rendered is left
+alone with a warning, so hand edits are never silently lost.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from build_cache import file_digest, load_manifest, save_manifest, text_digest
+from file_writes import add_dry_run_argument, set_dry_run, write_text
+from templates import Environment, TemplateError
+
+SITE_DIR = Path(__file__).parent
+PAGES_PREFIX = 'pages/'
+MANIFEST_NAME = 'render-pages'
+
+
+def page_names(env):
+    """Pages that have a source in templates/pages/."""
+    return sorted(path.name for path in (env.template_dir / PAGES_PREFIX).glob('*.html'))
+
+
+def pages_using(env, template, names=None):
+    """Pages whose output depends on a template (a layout, partial or page source)."""
+    return [name for name in (names or page_names(env))
+            if template in env.dependencies(PAGES_PREFIX + name)]
+
+
+def render_page(env, name):
+    """Render one page."""
+    return env.render(PAGES_PREFIX + name, {'page': name})
+
+
+def render_pages(names=None, force=False, site_dir=SITE_DIR, env=None):
+    """Render the pages whose templates changed since they were last rendered.
+
+    Returns {'rendered': [...], 'unchanged': [...], 'edited': [...]}, where
+    edited lists pages skipped because they were changed by hand.
+    """
+    site_dir = Path(site_dir)
+    env = env or Environment()
+    manifest = load_manifest(MANIFEST_NAME)
+    recorded = manifest.get('pages', {}) if manifest.get('site') == str(site_dir.resolve()) else {}
+    result = {'rendered': [], 'unchanged': [], 'edited': []}
+
+    for name in names or page_names(env):
+        digests = env.dependency_digests(PAGES_PREFIX + name)
+        entry = recorded.get(name, {})
+        on_disk = file_digest(site_dir / name)
+        if not force and entry.get('templates') == digests and entry.get('output') == on_disk:
+            result['unchanged'].append(name)
+            continue
+        if not force and on_disk and entry.get('output') and entry['output'] != on_disk:
+            result['edited'].append(name)
+            continue
+
+        content = render_page(env, name)
+        if write_text(site_dir / name, content):
+            result['rendered'].append(name)
+        else:
+            result['unchanged'].append(name)
+        recorded[name] = {'templates': digests, 'output': text_digest(content)}
+
+    save_manifest(MANIFEST_NAME, {'site': str(site_dir.resolve()), 'pages': recorded})
+    return result
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Render the pages from templates/pages/.')
+    parser.add_argument('pages', nargs='*', help='pages to render (default: all)')
+    parser.add_argument('--force', action='store_true', help='render every page, overwriting hand edits')
+    add_dry_run_argument(parser)
+    args = parser.parse_args(argv)
+    set_dry_run(args.dry_run)
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("🧱 Page Renderer")
+    print("=" * 50)
+
+    env = Environment()
+    known = page_names(env)
+    unknown = [name for name in args.pages if name not in known]
+    if unknown:
+        print(f"❌ No template for: {', '.join(unknown)} (expected in templates/{PAGES_PREFIX})")
+        return 1
+
+    try:
+        result = render_pages(args.pages, args.force, env=env)
+    except TemplateError as e:
+        print(f"❌ {e}")
+        return 1
+
+    for name in result['rendered']:
+        print(f"✅ {name}")
+    for name in result['edited']:
+        print(f"⚠ {name} was edited by hand since it was last rendered - move the change into "
+              f"templates/{PAGES_PREFIX}{name} or use --force to overwrite it")
+    print(f"\n📊 {len(result['rendered'])} rendered, {len(result['unchanged'])} up to date, "
+          f"{len(result['edited'])} skipped "
+          f"({env.stats['compiled']} template(s) compiled, {env.stats['cached']} loaded from cache)")
+    return 1 if result['edited'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Critical Request Chains
+The downloads that stand between a page and its first paint, in the order
+the browser finds them, for check-for-issues.py.
+
+    chain = request_chain(SITE_DIR, 'index.html')
+    # {'page': 'index.html', 'depth': 2, 'blocking_requests': 1, 'blocking_bytes': ...,
+    #  'entries': [{'url': 'index.html', 'depth': 0, 'action': None, ...},
+    #              {'url': 'styles.css', 'depth': 1, 'blocking': True, 'action': 'defer', ...}, ...]}
+
+Entries come in tree order (each one followed by what it pulls in), and the
+blocking byte counts include the page itself, since all of it arrives before
+the first paint.
+
+The page is depth 0. What its <head> links and loads synchronously (see
+page_resources.py) is depth 1, what those stylesheets @import and the fonts
+they use are one deeper, and so on - every level is another round trip
+before anything is drawn. Stylesheets and scripts that inline or linked
+scripts create with document.createElement() (js_tools.injected_elements)
+hang off the script that inserts them: the browser cannot see them until
+that script runs, so they are not render-blocking but are discovered late.
+Resource hints (prefetch, dns-prefetch, preconnect) that scripts inject are
+listed with them but are off the critical path.
+
+Each entry on the path gets at most one action:
+
+    defer      a blocking script (add defer/async) or a blocking stylesheet
+               too big to inline (load it asynchronously; critical_css.py
+               does that at build time)
+    inline     a blocking stylesheet small enough to ship inside the page
+    preload    a late-discovered stylesheet, script or font that is not
+               preloaded yet
+"""
+
+from pathlib import Path
+
+import js_tools
+from page_resources import AS_KINDS, ReferenceParser, file_sizes, kind_of, page_resources, resolve_url
+
+# Blocking stylesheets up to this many gzipped bytes are cheaper inlined
+INLINE_MAX_GZIP_BYTES = 2048
+
+# Kinds that can sit on the critical path
+CHAIN_KINDS = {'html', 'css', 'js', 'font'}
+HINT_RELS = {'prefetch', 'dns-prefetch', 'preconnect', 'prerender'}
+
+
+def preloaded_paths(site_dir, page_name, content):
+    """Resolved paths (or urls) the page already preloads."""
+    parser = ReferenceParser()
+    parser.feed(content)
+    parser.close()
+    preloaded = set()
+    for reference in parser.references:
+        if reference['via'] == 'preload':
+            path = resolve_url(site_dir, page_name, reference['url'])
+            preloaded.add(path.resolve() if path else reference['url'])
+    return preloaded
+
+
+def injected_entries(site_dir, page_name, content, resources):
+    """Chain entries for the elements inline and local scripts insert."""
+    line_starts = [0] + [index + 1 for index, char in enumerate(content) if char == '\n']
+    sources = []
+    for offset, source in js_tools.inline_scripts(content):
+        sources.append((source, page_name, None, lambda position, offset=offset: offset + position))
+    for resource in resources:
+        if resource['kind'] == 'js' and resource['path'] and resource['path'].is_file():
+            sources.append((resource['path'].read_text(encoding='utf-8'), resource['url'], resource, None))
+
+    entries = []
+    for source, parent, resource, page_offset in sources:
+        for element in js_tools.injected_elements(source):
+            attributes = element['attributes']
+            rel = (attributes.get('rel') or [''])[0].lower()
+            if element['tag'] == 'script':
+                kind = 'js'
+            elif rel == 'stylesheet':
+                kind = 'css'
+            elif rel in ('preload', 'modulepreload'):
+                kind = AS_KINDS.get((attributes.get('as') or [''])[0].lower(), 'other')
+            else:
+                kind = 'hint' if rel in HINT_RELS else 'other'
+            if page_offset:
+                line = sum(1 for start in line_starts if start <= page_offset(element['offset']))
+            else:
+                line = resource['line']
+            urls = attributes.get('src' if element['tag'] == 'script' else 'href') or [None]
+            for url in urls:
+                path = resolve_url(site_dir, page_name, url) if url else None
+                raw, gzipped = file_sizes(path) if path else (None, None)
+                entries.append({
+                    'url': url or '(computed at runtime)', 'path': path,
+                    'kind': kind if kind != 'other' or not url else kind_of(url), 'rel': rel or element['tag'],
+                    'via': 'injected', 'parent': None if parent == page_name else parent, 'line': line,
+                    'blocking': False, 'bytes': raw, 'gzip_bytes': gzipped,
+                })
+    return entries
+
+
+def recommend(entry, preloaded):
+    """The action that takes an entry off (or earlier on) the critical path, or None."""
+    key = entry['path'].resolve() if entry['path'] else entry['url']
+    if entry['depth'] == 0 or entry['kind'] == 'hint':
+        return None
+    if entry['blocking'] and entry['kind'] == 'js':
+        return 'defer'
+    if entry['blocking'] and entry['kind'] == 'css':
+        if entry['depth'] > 1:
+            # An @import: found only once its parent stylesheet arrives
+            return 'preload' if key not in preloaded else None
+        if entry['gzip_bytes'] is not None and entry['gzip_bytes'] <= INLINE_MAX_GZIP_BYTES:
+            return 'inline'
+        return 'defer'
+    if entry['kind'] in ('css', 'js', 'font') and (entry['depth'] > 1 or entry['via'] == 'injected'):
+        return 'preload' if key not in preloaded else None
+    return None
+
+
+def tree_order(entries):
+    """Entries reordered so each is followed by the entries it pulled in."""
+    children = {}
+    for entry in entries[1:]:
+        children.setdefault(entry['parent'], []).append(entry)
+    ordered = [entries[0]]
+
+    def visit(parent):
+        for child in children.pop(parent, []):
+            ordered.append(child)
+            visit(child['url'])
+
+    visit(None)
+    # Anything whose parent is not on the path itself
+    for orphans in children.values():
+        ordered.extend(orphans)
+    return ordered
+
+
+def request_chain(site_dir, page_name):
+    """The critical request chain of a page, with depth, bytes and an action per entry."""
+    site_dir = Path(site_dir)
+    content = (site_dir / page_name).read_text(encoding='utf-8')
+    resources = page_resources(site_dir, page_name)
+    preloaded = preloaded_paths(site_dir, page_name, content)
+
+    depths = {}
+    entries = []
+    for resource in resources:
+        parent_depth = depths.get(resource['parent'], 0)
+        depth = 0 if resource['via'] == 'page' else parent_depth + 1
+        depths[resource['url']] = depth
+        on_path = resource['blocking'] or (
+            resource['kind'] == 'font' and any(other['blocking'] and other['url'] == resource['parent']
+                                               for other in resources))
+        if on_path and resource['kind'] in CHAIN_KINDS:
+            entries.append(dict(resource, rel=None, depth=depth))
+
+    for entry in injected_entries(site_dir, page_name, content, resources):
+        entry['depth'] = depths.get(entry['parent'], 0) + 1
+        entries.append(entry)
+
+    for entry in entries:
+        entry['action'] = recommend(entry, preloaded)
+    entries = tree_order(entries)
+
+    blocking = [entry for entry in entries if entry['blocking']]
+    critical = [entry for entry in entries if entry['kind'] != 'hint']
+    return {
+        'page': page_name,
+        'entries': entries,
+        'depth': max(entry['depth'] for entry in critical),
+        'blocking_requests': len(blocking) - 1,
+        'blocking_remote_requests': sum(1 for entry in blocking if entry['bytes'] is None),
+        'blocking_bytes': sum(entry['bytes'] or 0 for entry in blocking),
+        'blocking_gzip_bytes': sum(entry['gzip_bytes'] or 0 for entry in blocking),
+    }
+
+
+def summarize_chains(chains):
+    """Site-wide totals: the deepest chain, blocking bytes, actions and the most shared blockers."""
+    actions = {}
+    blockers = {}
+    for chain in chains:
+        for entry in chain['entries']:
+            if entry['action']:
+                actions[entry['action']] = actions.get(entry['action'], 0) + 1
+            if entry['blocking'] and entry['depth'] > 0:
+                blockers.setdefault(entry['url'], set()).add(chain['page'])
+    deepest = max(chains, key=lambda chain: (chain['depth'], chain['blocking_gzip_bytes']), default=None)
+    return {
+        'pages': len(chains),
+        'deepest': deepest,
+        'blocking_requests': sum(chain['blocking_requests'] for chain in chains),
+        'blocking_remote_requests': sum(chain['blocking_remote_requests'] for chain in chains),
+        'blocking_gzip_bytes': sum(chain['blocking_gzip_bytes'] for chain in chains),
+        'actions': actions,
+        'shared_blockers': sorted(((url, sorted(pages)) for url, pages in blockers.items()),
+                                  key=lambda item: (-len(item[1]), item[0])),
+    }
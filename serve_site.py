@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Local Static Server
+An asyncio HTTP/1.1 server for the built site that behaves like the CDN
+origin: strong ETags with If-None-Match/304, byte ranges, prebuilt .br/.gz
+files chosen by Accept-Encoding, and Cache-Control per asset type.
+
+Usage:
+    python3 serve_site.py                       # serve dist/ on http://127.0.0.1:8000
+    python3 serve_site.py --root . --port 8080  # serve the source tree instead
+    python3 serve_site.py --quiet
+
+Caching rules:
+    fingerprinted assets (asset-manifest.json)   public, max-age=31536000, immutable
+    HTML and unversioned files                   no-cache (always revalidated)
+    images and icons                             public, max-age=86400
+    other CSS/JS                                 public, max-age=3600
+
+Only what the site publishes is served (build_site.collect_source_files,
+plus the image variants the build adds): with --root . the repository's
+.git/, .build-cache/, scripts and notes stay private, as does any path with
+a dot-prefixed segment.
+
+File bodies go out with loop.sendfile(), which uses os.sendfile() zero-copy
+where the platform and transport support it and falls back to reads
+elsewhere. Tests can run the server in-process with start_server().
+"""
+
+import argparse
+import asyncio
+import email.utils
+import hashlib
+import json
+import mimetypes
+import sys
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from asset_fingerprint import HASHED_NAME, IMMUTABLE, MANIFEST_FILE
+from build_site import PUBLISH_PATTERNS, is_published
+
+SITE_DIR = Path(__file__).parent
+DIST_DIR = SITE_DIR / 'dist'
+
+# Encodings we have prebuilt files for, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+KEEP_ALIVE_SECONDS = 15
+MAX_HEADER_BYTES = 16 * 1024
+# Request bodies up to this size are read and dropped to keep the connection
+MAX_DISCARD_BYTES = 64 * 1024
+
+# What the server hands out: the published files and the variants the build adds
+SERVED_PATTERNS = PUBLISH_PATTERNS + ['images/variants/*']
+
+CACHE_RULES = {
+    'html': 'no-cache',
+    'image': 'public, max-age=86400',
+    'asset': 'public, max-age=3600',
+    'default': 'no-cache',
+}
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/x-icon', '.ico')
+
+REASONS = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed', 416: 'Range Not Satisfiable'}
+
+
+class StaticSite:
+    """Resolves request paths to files and remembers their ETags."""
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self.etags = {}
+        self.immutable = set()
+        manifest = self.root / MANIFEST_FILE
+        if manifest.exists():
+            self.immutable = set(json.loads(manifest.read_text(encoding='utf-8')).values())
+
+    def resolve(self, target):
+        """Map a request target to a published file under the root, or None."""
+        path = unquote(urlsplit(target).path)
+        relative = path.lstrip('/')
+        if any(part.startswith('.') for part in relative.split('/')):
+            # .git/, .build-cache/, dotfiles - and ../ traversal
+            return None
+        candidate = (self.root / relative).resolve()
+        if candidate != self.root and self.root not in candidate.parents:
+            return None
+        if candidate.is_dir():
+            candidate = candidate / 'index.html'
+        elif not candidate.exists() and not candidate.suffix:
+            candidate = candidate.with_suffix('.html')
+        if not candidate.is_file() or not is_published(candidate.relative_to(self.root).as_posix(), SERVED_PATTERNS):
+            return None
+        return candidate
+
+    def etag(self, path, stat):
+        """Strong ETag from the content hash, cached until the file changes."""
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        if key not in self.etags:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self.etags[key] = f'"{digest.hexdigest()[:32]}"'
+        return self.etags[key]
+
+    def cache_control(self, path):
+        """Cache-Control value for a file."""
+        name = path.relative_to(self.root).as_posix()
+        if name in self.immutable or (not self.immutable and HASHED_NAME.search(path.name)):
+            return IMMUTABLE
+        content_type = mimetypes.guess_type(path.name)[0] or ''
+        if content_type == 'text/html':
+            return CACHE_RULES['html']
+        if content_type.startswith('image/'):
+            return CACHE_RULES['image']
+        if path.suffix in ('.css', '.js'):
+            return CACHE_RULES['asset']
+        return CACHE_RULES['default']
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (q > 0)."""
+    accepted = set()
+    for part in header.split(','):
+        fields = part.strip().split(';')
+        coding = fields[0].strip().lower()
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def choose_representation(path, accept_encoding):
+    """Pick the prebuilt compressed file the client accepts, else the file itself."""
+    accepted = accepted_encodings(accept_encoding)
+    for coding, suffix in ENCODINGS:
+        if coding in accepted or '*' in accepted:
+            compressed = path.with_name(path.name + suffix)
+            if compressed.is_file():
+                return compressed, coding
+    return path, None
+
+
+def etag_matches(header, etag):
+    """Evaluate If-None-Match against the current ETag (weak comparison)."""
+    if header.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in header.split(','))
+
+
+def parse_range(header, size):
+    """Return (start, end) for a single byte range, 'invalid' if unsatisfiable, None to ignore."""
+    unit, _, ranges = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in ranges:
+        # Multiple ranges are allowed to be answered with the whole file
+        return None
+    first, _, last = ranges.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length == 0:
+                return 'invalid'
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+async def read_request(reader):
+    """Read one request head; returns (method, target, version, headers) or None at EOF."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_SECONDS)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        return 'bad'
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        return 'bad'
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+async def discard_body(reader, headers):
+    """Read past a request body so the next request starts clean; False if the connection must close."""
+    if 'transfer-encoding' in headers:
+        return False
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        return False
+    if length < 0 or length > MAX_DISCARD_BYTES:
+        return False
+    try:
+        await asyncio.wait_for(reader.readexactly(length), KEEP_ALIVE_SECONDS)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return False
+    return True
+
+
+def response_head(status, headers):
+    """Serialize a status line and headers."""
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+class Server:
+    """Connection handler for one StaticSite."""
+
+    def __init__(self, site, quiet=False):
+        self.site = site
+        self.quiet = quiet
+
+    def log(self, method, target, status, length):
+        if not self.quiet:
+            print(f"{method} {target} {status} {length}")
+
+    async def handle(self, reader, writer):
+        """Serve requests on one keep-alive connection."""
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                if request == 'bad':
+                    await self.send_simple(writer, 400, close=True)
+                    break
+                method, target, version, headers = request
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                # A body left unread would be parsed as the next request
+                keep_alive = await discard_body(reader, headers) and keep_alive
+                await self.respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def send_simple(self, writer, status, close=False, extra=None, method='GET', target=''):
+        body = f"{status} {REASONS.get(status, '')}\n".encode('utf-8')
+        headers = {'Date': email.utils.formatdate(usegmt=True), 'Content-Type': 'text/plain; charset=utf-8',
+                   'Content-Length': str(len(body))}
+        headers.update(extra or {})
+        if close:
+            headers['Connection'] = 'close'
+        writer.write(response_head(status, headers) + (body if method != 'HEAD' else b''))
+        await writer.drain()
+        self.log(method, target, status, len(body))
+
+    async def respond(self, writer, method, target, request_headers, keep_alive):
+        """Answer one request."""
+        close = not keep_alive
+        if method not in ('GET', 'HEAD'):
+            await self.send_simple(writer, 405, close, {'Allow': 'GET, HEAD'}, method, target)
+            return
+        path = self.site.resolve(target)
+        if path is None:
+            await self.send_simple(writer, 404, close, method=method, target=target)
+            return
+
+        file_path, coding = choose_representation(path, request_headers.get('accept-encoding', ''))
+        stat = file_path.stat()
+        etag = self.site.etag(file_path, stat)
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        headers = {
+            'Date': email.utils.formatdate(usegmt=True),
+            'Content-Type': content_type,
+            'ETag': etag,
+            'Last-Modified': email.utils.formatdate(stat.st_mtime, usegmt=True),
+            'Cache-Control': self.site.cache_control(path),
+            'Accept-Ranges': 'bytes',
+        }
+        if any(path.with_name(path.name + suffix).is_file() for _, suffix in ENCODINGS):
+            headers['Vary'] = 'Accept-Encoding'
+        if coding:
+            headers['Content-Encoding'] = coding
+        if close:
+            headers['Connection'] = 'close'
+
+        if 'if-none-match' in request_headers and etag_matches(request_headers['if-none-match'], etag):
+            del headers['Accept-Ranges']
+            writer.write(response_head(304, headers))
+            await writer.drain()
+            self.log(method, target, 304, 0)
+            return
+
+        size = stat.st_size
+        status, offset, length = 200, 0, size
+        range_header = request_headers.get('range')
+        if range_header and request_headers.get('if-range', etag) == etag:
+            byte_range = parse_range(range_header, size)
+            if byte_range == 'invalid':
+                await self.send_simple(writer, 416, close, {'Content-Range': f'bytes */{size}'}, method, target)
+                return
+            if byte_range:
+                start, end = byte_range
+                status, offset, length = 206, start, end - start + 1
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+        headers['Content-Length'] = str(length)
+        writer.write(response_head(status, headers))
+        if method == 'GET' and length:
+            await writer.drain()
+            with open(file_path, 'rb') as f:
+                # Zero-copy where the platform supports it
+                await asyncio.get_running_loop().sendfile(writer.transport, f, offset, length)
+        await writer.drain()
+        self.log(method, target, status, length)
+
+
+async def start_server(root=DIST_DIR, host='127.0.0.1', port=8000, quiet=True):
+    """Start serving root and return the asyncio server (port 0 picks a free port)."""
+    handler = Server(StaticSite(root), quiet=quiet)
+    return await asyncio.start_server(handler.handle, host, port, limit=MAX_HEADER_BYTES)
+
+
+async def serve_forever(root, host, port, quiet):
+    server = await start_server(root, host, port, quiet)
+    address = server.sockets[0].getsockname()
+    print(f"🌐 Serving {Path(root).resolve()} on http://{address[0]}:{address[1]}/ (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Serve the site like the production origin.')
+    parser.add_argument('--root', default=str(DIST_DIR if DIST_DIR.exists() else SITE_DIR),
+                        help='directory to serve (default: dist/ if built, else the site)')
+    parser.add_argument('--host', default='127.0.0.1', help='address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: 8000)')
+    parser.add_argument('--quiet', action='store_true', help='do not log requests')
+    args = parser.parse_args(argv)
+
+    if not Path(args.root).is_dir():
+        print(f"❌ No such directory: {args.root}")
+        return 1
+    try:
+        asyncio.run(serve_forever(args.root, args.host, args.port, args.quiet))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
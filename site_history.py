@@ -0,0 +1,133 @@
+"""
+Page History
+Resolves the sitemap lastmod of each page from the last commit that changed
+its content, instead of file mtimes (which every checkout and every run of
+the optimization scripts resets).
+
+All pages are resolved with one batched `git log` walk that stops as soon as
+every page has been seen. Results are cached in .build-cache/lastmod.json
+keyed by HEAD and the page's content hash, so an unchanged tree needs no
+history walk at all. Pages with uncommitted changes, untracked pages and
+sites outside a git repository fall back to the date their content hash
+last changed.
+"""
+
+import datetime
+import os
+import subprocess
+from pathlib import Path
+
+from build_cache import CACHE_DIR, file_digest, load_manifest, save_manifest
+
+MANIFEST_NAME = 'lastmod'
+
+
+def run_git(site_dir, *args):
+    """Run a git command in the site directory, returning stdout or None."""
+    try:
+        result = subprocess.run(
+            ['git', '-C', str(site_dir)] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def git_head(site_dir):
+    """Return the HEAD commit of the repository holding the site, if any."""
+    output = run_git(site_dir, 'rev-parse', 'HEAD')
+    return output.strip() if output else None
+
+
+def git_dirty_files(site_dir, filenames):
+    """Return the pages whose working tree content differs from HEAD."""
+    output = run_git(site_dir, 'diff', '--name-only', '--relative', 'HEAD', '--', *filenames)
+    return set(output.split()) if output else set()
+
+
+def git_commit_dates(site_dir, filenames):
+    """Walk history once and return the last commit date of each page."""
+    remaining = set(filenames)
+    dates = {}
+    try:
+        process = subprocess.Popen(
+            ['git', '-C', str(site_dir), 'log', '--format=%x00%cI', '--name-only', '--relative', '--', *filenames],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+    except OSError:
+        return dates
+
+    commit_date = None
+    with process:
+        for line in process.stdout:
+            line = line.rstrip('\n')
+            if line.startswith('\x00'):
+                commit_date = line[1:11]
+            elif line and line in remaining:
+                # Newest commits come first, so the first sighting wins
+                dates[line] = commit_date
+                remaining.discard(line)
+                if not remaining:
+                    process.terminate()
+                    break
+    return dates
+
+
+def today():
+    """Today's date as a sitemap lastmod string."""
+    return datetime.date.today().strftime('%Y-%m-%d')
+
+
+def mtime_date(path):
+    """The file's mtime as a lastmod string - only used the first time a page is seen."""
+    try:
+        return datetime.datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d')
+    except OSError:
+        return today()
+
+
+def resolve_lastmod(site_dir, filenames, use_git=True, cache_dir=CACHE_DIR):
+    """Return {filename: 'YYYY-MM-DD'} for every page."""
+    site_dir = Path(site_dir)
+    manifest = load_manifest(MANIFEST_NAME, cache_dir)
+    cached_pages = manifest.get('pages', {})
+    head = git_head(site_dir) if use_git else None
+
+    digests = {name: file_digest(site_dir / name) for name in filenames}
+    dates = {}
+    pending = []
+    for name in filenames:
+        cached = cached_pages.get(name)
+        if cached and cached['hash'] == digests[name] and cached.get('head') == head:
+            dates[name] = cached['date']
+        else:
+            pending.append(name)
+
+    commit_dates = {}
+    dirty = set()
+    if pending and head:
+        dirty = git_dirty_files(site_dir, pending)
+        clean = [name for name in pending if name not in dirty]
+        if clean:
+            commit_dates = git_commit_dates(site_dir, clean)
+
+    for name in pending:
+        cached = cached_pages.get(name)
+        if name in commit_dates:
+            dates[name] = commit_dates[name]
+        elif cached and cached['hash'] == digests[name]:
+            # Content unchanged since we last looked - keep the date it changed
+            dates[name] = cached['date']
+        elif cached:
+            dates[name] = today()
+        else:
+            dates[name] = mtime_date(site_dir / name)
+
+    # Keep entries for pages not asked about this time
+    pages = dict(cached_pages)
+    for name in filenames:
+        pages[name] = {'hash': digests[name], 'date': dates[name], 'head': head}
+    if pages != cached_pages:
+        save_manifest(MANIFEST_NAME, {'pages': pages}, cache_dir)
+    return dates
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+HTML Transform Pipeline
+Loads every page once, runs the enabled transform stages in order on the
+in-memory document and writes each page back at most once.
+
+Usage:
+    python3 site_pipeline.py                      # run every registered stage
+    python3 site_pipeline.py disable-mobile-stars fix-escaped-characters
+    python3 site_pipeline.py --list               # show the registered stages
+
+Stages are plain functions registered with @register_stage. Each one receives
+a page dict and edits page['content'] in place. Stages belong to a group:
+'maintenance' stages (the default for this script) edit the page sources in
+templates/pages/ in place - the pages in the site root are rendered from
+them, so the pages a run changes are rendered again (see render_pages.py) -
+and 'build' stages run from build_site.py over the copy in dist/.
+Before a maintenance run writes its first page, the site is snapshotted
+(see site_snapshots.py), so any run can be rolled back. A stage
+may also register a prepare(context) hook that runs once before any page is
+loaded, for work shared by every page (e.g. encoding images), and a
+finish(context) hook that runs once after every page has been written.
+Pages a prepare hook rewrites on disk, so that later hooks see the change,
+count towards its stage in the report like the changes made page by page.
+
+    page = {
+        'name': 'about.html',      # file name relative to the site root
+        'path': Path(...),         # absolute path on disk
+        'original': '...',         # content as loaded from disk
+        'content': '...',          # current in-memory document
+        'log': [],                 # messages printed after the page runs
+        'counters': {},            # numbers summed across pages into the result
+        'context': {...},          # shared by every page and prepare() hook of a run
+    }
+"""
+
+import argparse
+import importlib
+import sys
+import time
+from pathlib import Path
+
+from file_writes import add_dry_run_argument, dry_run_enabled, set_dry_run, write_text
+from render_pages import render_pages
+from site_snapshots import take_snapshot
+
+SITE_DIR = Path(__file__).parent
+# Where the maintenance stages edit pages: the sources the site root is rendered from
+PAGE_SOURCE_DIR = SITE_DIR / 'templates' / 'pages'
+
+# Modules that register stages when imported
+STAGE_MODULES = ['site_stages', 'image_pipeline', 'starfield', 'inline_dedupe', 'critical_css', 'css_pruning', 'minify', 'asset_fingerprint', 'precompress']
+
+# Registered stages, in run order
+STAGES = {}
+
+
+def register_stage(name, description, skip_files=(), group='maintenance', prepare=None, finish=None):
+    """Register a page transform stage under the given name."""
+    def decorator(func):
+        STAGES[name] = {
+            'name': name,
+            'description': description,
+            'skip_files': tuple(skip_files),
+            'group': group,
+            'prepare': prepare,
+            'finish': finish,
+            'func': func,
+        }
+        return func
+    return decorator
+
+
+def load_stages():
+    """Import every stage module so its stages are registered."""
+    for module_name in STAGE_MODULES:
+        importlib.import_module(module_name)
+    return STAGES
+
+
+def applies_to(stage, page_name):
+    """Check whether a stage should run on the given page."""
+    return not any(skip in page_name for skip in stage['skip_files'])
+
+
+def new_report(stage_names):
+    """Create an empty per-stage report."""
+    return {
+        name: {'seconds': 0.0, 'pages': 0, 'pages_changed': 0, 'bytes_changed': 0, 'size_delta': 0}
+        for name in stage_names
+    }
+
+
+def changed_bytes(before, after):
+    """Estimate how many bytes differ between two versions of a document."""
+    if before == after:
+        return 0
+    before = before.encode('utf-8')
+    after = after.encode('utf-8')
+    # Trim the common prefix and suffix - the rest is what the stage touched
+    limit = min(len(before), len(after))
+    start = 0
+    while start < limit and before[start] == after[start]:
+        start += 1
+    end = 0
+    while end < limit - start and before[-1 - end] == after[-1 - end]:
+        end += 1
+    return max(len(before), len(after)) - start - end
+
+
+def read_pages(site_dir):
+    """Content of every page on disk."""
+    return {path.name: path.read_text(encoding='utf-8') for path in sorted(Path(site_dir).glob('*.html'))}
+
+
+def record_change(stats, before, after):
+    """Add one page's change to a stage's report entry."""
+    if after != before:
+        stats['pages_changed'] += 1
+        stats['bytes_changed'] += changed_bytes(before, after)
+        stats['size_delta'] += len(after.encode('utf-8')) - len(before.encode('utf-8'))
+
+
+def run_pipeline(stage_names=None, site_dir=None, verbose=True, group='maintenance', context=None):
+    """Run the given stages (default: all stages of the group) over every HTML page.
+
+    site_dir defaults to the page sources for maintenance stages and to the
+    site root otherwise.
+    """
+    load_stages()
+    if site_dir is None:
+        site_dir = PAGE_SOURCE_DIR if group == 'maintenance' else SITE_DIR
+    # Page sources are snapshotted, and rolled back, as part of the whole site
+    sources = Path(site_dir).resolve() == PAGE_SOURCE_DIR.resolve()
+    if stage_names is None:
+        stage_names = [name for name, stage in STAGES.items() if stage['group'] == group]
+
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    other_group = [name for name in stage_names if STAGES[name]['group'] != group]
+    if other_group:
+        raise ValueError(f"Not '{group}' stage(s): {', '.join(other_group)}")
+
+    # Keep the registration order no matter how the stages were requested
+    stages = [STAGES[name] for name in STAGES if name in stage_names]
+    report = new_report([stage['name'] for stage in stages])
+    written = []
+    counters = {}
+    snapshot = None
+
+    context = dict(context or {}, site_dir=Path(site_dir))
+    for stage in stages:
+        if stage['prepare']:
+            before = read_pages(site_dir)
+            started = time.perf_counter()
+            stage['prepare'](context)
+            report[stage['name']]['seconds'] += time.perf_counter() - started
+            # Pages the hook rewrote on disk are its changes too
+            for name, content in read_pages(site_dir).items():
+                record_change(report[stage['name']], before.get(name, ''), content)
+
+    page_paths = sorted(Path(site_dir).glob('*.html'))
+    page_paths = [p for p in page_paths if any(applies_to(s, p.name) for s in stages)]
+
+    if verbose:
+        print(f"Found {len(page_paths)} HTML files for {len(stages)} stage(s)")
+
+    for path in page_paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            print(f"  ❌ Error reading {path.name}: {str(e)}")
+            continue
+
+        page = {'name': path.name, 'path': path, 'original': content, 'content': content,
+                'log': [], 'counters': {}, 'context': context}
+
+        if verbose:
+            print(f"Processing: {path.name}")
+
+        for stage in stages:
+            if not applies_to(stage, path.name):
+                continue
+
+            before = page['content']
+            started = time.perf_counter()
+            try:
+                stage['func'](page)
+            except Exception as e:
+                page['content'] = before
+                page['log'].append(f"❌ {stage['name']} failed: {str(e)}")
+            elapsed = time.perf_counter() - started
+
+            stats = report[stage['name']]
+            stats['seconds'] += elapsed
+            stats['pages'] += 1
+            record_change(stats, before, page['content'])
+
+        for key, value in page['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+
+        if verbose:
+            for message in page['log']:
+                print(f"  {message}")
+
+        # One write per page, and only if something actually changed
+        if page['content'] != page['original']:
+            if group == 'maintenance' and snapshot is None and not dry_run_enabled():
+                # Source pages are about to change: record the tree as it is first
+                snapshot, _ = take_snapshot(f"before {', '.join(stage['name'] for stage in stages)}",
+                                            SITE_DIR if sources else site_dir)
+                if verbose:
+                    print(f"  📸 Snapshot {snapshot['id']} (site_snapshots.py rollback to undo)")
+            try:
+                write_text(path, page['content'])
+                written.append(path.name)
+                if verbose:
+                    print(f"  {'🔎 Would save' if dry_run_enabled() else '💾 Saved'} {path.name}")
+            except Exception as e:
+                print(f"  ❌ Error writing {path.name}: {str(e)}")
+
+    for stage in stages:
+        if stage['finish']:
+            started = time.perf_counter()
+            stage['finish'](context)
+            report[stage['name']]['seconds'] += time.perf_counter() - started
+
+    rendered = None
+    if sources and written and not dry_run_enabled():
+        # The pages in the site root are outputs of the sources just edited
+        rendered = render_pages(written)
+        if verbose and rendered['edited']:
+            print(f"  ⚠️  Not re-rendered (changed by hand): {', '.join(rendered['edited'])}")
+
+    return {'stages': report, 'written': written, 'pages': len(page_paths), 'counters': counters, 'context': context,
+            'snapshot': snapshot['id'] if snapshot else None, 'rendered': rendered}
+
+
+def print_report(result):
+    """Print time and bytes changed per stage."""
+    print("\n" + "=" * 72)
+    print("📊 PIPELINE REPORT")
+    print("=" * 72)
+    print(f"{'Stage':<28}{'Time':>10}{'Pages':>8}{'Changed':>9}{'Bytes':>9}{'Δ Size':>8}")
+    for name, stats in result['stages'].items():
+        print(f"{name:<28}{stats['seconds'] * 1000:>8.1f}ms{stats['pages']:>8}"
+              f"{stats['pages_changed']:>9}{stats['bytes_changed']:>9}{stats['size_delta']:>+8}")
+    print("-" * 72)
+    print(f"📄 {result['pages']} pages loaded, {len(result['written'])} written")
+    if result.get('rendered'):
+        print(f"🧩 {len(result['rendered']['rendered'])} page(s) re-rendered from templates/pages/")
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Run HTML transform stages over every page in one pass.')
+    parser.add_argument('stages', nargs='*', help='stages to run (default: all registered stages)')
+    parser.add_argument('--list', action='store_true', help='list the registered stages and exit')
+    parser.add_argument('--site-dir', help='directory containing the HTML pages '
+                                           '(default: templates/pages/ for maintenance stages)')
+    add_dry_run_argument(parser)
+    args = parser.parse_args(argv)
+    set_dry_run(args.dry_run)
+
+    load_stages()
+
+    if args.list:
+        for stage in STAGES.values():
+            print(f"{stage['name']:<28}{stage['group']:<13}{stage['description']}")
+        return 0
+
+    try:
+        result = run_pipeline(args.stages or None, site_dir=args.site_dir)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return 1
+
+    print_report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    # Stage modules register against the importable module, not __main__
+    import site_pipeline
+    sys.exit(site_pipeline.main())
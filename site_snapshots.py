@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Site Snapshots
+A content-addressed snapshot store for the site's source files, kept in
+.snapshots/ next to the site. The maintenance pipeline (site_pipeline.py)
+snapshots the pages as they were before it rewrites them, in place of the
+*.original.html copies it used to leave next to every page.
+
+Usage:
+    python3 site_snapshots.py snapshot -m "before menu rework"
+    python3 site_snapshots.py list
+    python3 site_snapshots.py diff                       # latest snapshot vs working tree
+    python3 site_snapshots.py diff 20250905 latest -f about.html
+    python3 site_snapshots.py rollback latest about.html # restore one page
+    python3 site_snapshots.py rollback 20250905 --dry-run  # show what a rollback would change
+    python3 site_snapshots.py import-backups             # move *.original.html into a snapshot
+
+Every distinct file content is stored once, zlib-compressed, under
+.snapshots/objects/ by its SHA-256; a snapshot is a small JSON file mapping
+paths to those digests. A snapshot of a tree where one page changed adds one
+blob, so backups cost what actually changed, and taking a snapshot identical
+to the latest one does nothing. Snapshots are named by time and can be
+referred to by any unique prefix of their id, or as 'latest'.
+"""
+
+import argparse
+import datetime
+import difflib
+import json
+import os
+import sys
+import zlib
+from pathlib import Path
+
+from build_cache import bytes_digest, json_digest
+from file_writes import add_dry_run_argument, dry_run_enabled, set_dry_run, write_bytes
+
+SITE_DIR = Path(__file__).parent
+STORE_NAME = '.snapshots'
+
+# What a snapshot covers, relative to the site root
+SNAPSHOT_PATTERNS = ['*.html', '*.css', '*.js', '*.webmanifest', '*.txt', '*.xml', 'templates/**/*.html']
+
+BACKUP_SUFFIX = '.original.html'
+
+
+def store_dir(site_dir=SITE_DIR):
+    return Path(site_dir) / STORE_NAME
+
+
+def write_atomically(path, data):
+    """Write bytes through a temporary file so readers never see half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + '.tmp')
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+def blob_path(digest, site_dir=SITE_DIR):
+    return store_dir(site_dir) / 'objects' / digest[:2] / digest[2:]
+
+
+def store_blob(data, site_dir=SITE_DIR):
+    """Store some bytes (once) and return their digest."""
+    digest = bytes_digest(data)
+    path = blob_path(digest, site_dir)
+    if not path.exists():
+        write_atomically(path, zlib.compress(data, 9))
+    return digest
+
+
+def read_blob(digest, site_dir=SITE_DIR):
+    """Bytes stored under a digest."""
+    return zlib.decompress(blob_path(digest, site_dir).read_bytes())
+
+
+def tracked_files(site_dir=SITE_DIR):
+    """Files of the site that snapshots cover, relative to its root."""
+    site_dir = Path(site_dir)
+    files = set()
+    for pattern in SNAPSHOT_PATTERNS:
+        for path in site_dir.glob(pattern):
+            if path.is_file():
+                files.add(path.relative_to(site_dir).as_posix())
+    return sorted(files)
+
+
+def list_snapshots(site_dir=SITE_DIR):
+    """Every snapshot, oldest first."""
+    snapshots = []
+    for path in (store_dir(site_dir) / 'snapshots').glob('*.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshots.append(json.load(f))
+    return sorted(snapshots, key=lambda snapshot: snapshot['created'])
+
+
+def find_snapshot(ref, site_dir=SITE_DIR):
+    """A snapshot by id, unique id prefix or 'latest'; raises ValueError otherwise."""
+    snapshots = list_snapshots(site_dir)
+    if not snapshots:
+        raise ValueError("No snapshots yet - run 'site_snapshots.py snapshot' first")
+    if ref == 'latest':
+        return snapshots[-1]
+    matches = [snapshot for snapshot in snapshots if snapshot['id'].startswith(ref)]
+    if len(matches) != 1:
+        raise ValueError(f"{'Ambiguous' if matches else 'Unknown'} snapshot: {ref}")
+    return matches[0]
+
+
+def take_snapshot(message='', site_dir=SITE_DIR, overrides=None, skip=()):
+    """Snapshot the tracked files; overrides maps paths to content to record instead of the disk's.
+
+    Returns (snapshot, created); nothing is stored when the files match the
+    latest snapshot.
+    """
+    site_dir = Path(site_dir)
+    overrides = overrides or {}
+    files = {}
+    for name in sorted((set(tracked_files(site_dir)) - set(skip)) | set(overrides)):
+        data = overrides[name] if name in overrides else (site_dir / name).read_bytes()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        files[name] = store_blob(data, site_dir)
+
+    snapshots = list_snapshots(site_dir)
+    if snapshots and snapshots[-1]['files'] == files:
+        return snapshots[-1], False
+
+    now = datetime.datetime.now()
+    snapshot = {
+        'id': f"{now:%Y%m%d-%H%M%S}-{json_digest(files)[:6]}",
+        'created': now.isoformat(timespec='microseconds'),
+        'message': message,
+        'parent': snapshots[-1]['id'] if snapshots else None,
+        'files': files,
+    }
+    path = store_dir(site_dir) / 'snapshots' / f"{snapshot['id']}.json"
+    write_atomically(path, json.dumps(snapshot, indent=2, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return snapshot, True
+
+
+def working_files(site_dir=SITE_DIR):
+    """Digests of the tracked files as they are on disk now."""
+    site_dir = Path(site_dir)
+    return {name: bytes_digest((site_dir / name).read_bytes()) for name in tracked_files(site_dir)}
+
+
+def changed_files(old, new):
+    """Paths added, removed and modified between two {path: digest} maps."""
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    modified = sorted(name for name in set(old) & set(new) if old[name] != new[name])
+    return added, removed, modified
+
+
+def unified_diff(old_text, new_text, old_label, new_label):
+    """Lines of a unified diff between two texts."""
+    return difflib.unified_diff(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                old_label, new_label)
+
+
+def diff_lines(old, new, read_old, read_new, old_label, new_label, names=None):
+    """Unified diff between two {path: digest} maps, reading content through the callbacks."""
+    added, removed, modified = changed_files(old, new)
+    for name in sorted(added + removed + modified):
+        if names and name not in names:
+            continue
+        old_text = read_old(name).decode('utf-8', 'replace') if name in old else ''
+        new_text = read_new(name).decode('utf-8', 'replace') if name in new else ''
+        yield from unified_diff(old_text, new_text,
+                                f"a/{name} ({old_label})" if name in old else '/dev/null',
+                                f"b/{name} ({new_label})" if name in new else '/dev/null')
+
+
+def rollback(ref, names=None, site_dir=SITE_DIR):
+    """Restore files from a snapshot, snapshotting the current state first.
+
+    Returns (restored, untouched): the paths written, and paths tracked now
+    that the snapshot does not have (these are left in place).
+    """
+    site_dir = Path(site_dir)
+    snapshot = find_snapshot(ref, site_dir)
+    unknown = [name for name in names or [] if name not in snapshot['files']]
+    if unknown:
+        raise ValueError(f"Not in snapshot {snapshot['id']}: {', '.join(unknown)}")
+
+    if not dry_run_enabled():
+        take_snapshot(f"before rollback to {snapshot['id']}", site_dir)
+    restored = [name for name in names or sorted(snapshot['files'])
+                if write_bytes(site_dir / name, read_blob(snapshot['files'][name], site_dir))]
+    current = tracked_files(site_dir)
+    untouched = [] if names else sorted(set(current) - set(snapshot['files']))
+    return restored, untouched
+
+
+def import_backups(site_dir=SITE_DIR):
+    """Record the *.original.html copies as a snapshot of their pages, then delete them.
+
+    Returns (snapshot or None, backup paths imported).
+    """
+    site_dir = Path(site_dir)
+    backups = sorted(site_dir.glob(f"*{BACKUP_SUFFIX}"))
+    if not backups:
+        return None, []
+    overrides = {path.name[:-len(BACKUP_SUFFIX)] + '.html': path.read_bytes() for path in backups}
+    snapshot, _ = take_snapshot('imported *.original.html backups', site_dir, overrides,
+                                skip={path.name for path in backups})
+    for path in backups:
+        path.unlink()
+    return snapshot, [path.name for path in backups]
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Snapshot, compare and restore the site source files.')
+    parser.add_argument('--site-dir', default=str(SITE_DIR), help='site root (default: this directory)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot_parser = commands.add_parser('snapshot', help='record the current files')
+    snapshot_parser.add_argument('-m', '--message', default='', help='note stored with the snapshot')
+    commands.add_parser('list', help='list the snapshots')
+    diff_parser = commands.add_parser('diff', help='show what changed between snapshots or since one')
+    diff_parser.add_argument('old', nargs='?', default='latest', help='snapshot to compare from (default: latest)')
+    diff_parser.add_argument('new', nargs='?', help='snapshot to compare to (default: the working tree)')
+    diff_parser.add_argument('--stat', action='store_true', help='only list the changed files')
+    diff_parser.add_argument('-f', '--file', dest='files', action='append', help='limit the diff to this file (repeatable)')
+    rollback_parser = commands.add_parser('rollback', help='restore files from a snapshot')
+    rollback_parser.add_argument('snapshot', help='snapshot id, id prefix or latest')
+    rollback_parser.add_argument('files', nargs='*', help='files to restore (default: every file in the snapshot)')
+    add_dry_run_argument(rollback_parser)
+    commands.add_parser('import-backups', help='move *.original.html copies into a snapshot')
+    args = parser.parse_args(argv)
+    set_dry_run(getattr(args, 'dry_run', False))
+    site_dir = Path(args.site_dir)
+
+    try:
+        if args.command == 'snapshot':
+            snapshot, created = take_snapshot(args.message, site_dir)
+            if created:
+                print(f"📸 Snapshot {snapshot['id']}: {len(snapshot['files'])} files")
+            else:
+                print(f"✓ Nothing changed since snapshot {snapshot['id']}")
+
+        elif args.command == 'list':
+            snapshots = list_snapshots(site_dir)
+            if not snapshots:
+                print("No snapshots yet")
+            previous = {}
+            for snapshot in snapshots:
+                added, removed, modified = changed_files(previous, snapshot['files'])
+                print(f"{snapshot['id']}  {len(snapshot['files']):>4} files  "
+                      f"+{len(added)} -{len(removed)} ~{len(modified)}  {snapshot['message']}")
+                previous = snapshot['files']
+
+        elif args.command == 'diff':
+            old = find_snapshot(args.old, site_dir)
+            if args.new:
+                new = find_snapshot(args.new, site_dir)
+                new_files, new_label = new['files'], new['id']
+                read_new = lambda name: read_blob(new_files[name], site_dir)
+            else:
+                new_files, new_label = working_files(site_dir), 'working tree'
+                read_new = lambda name: (site_dir / name).read_bytes()
+            if args.stat:
+                added, removed, modified = changed_files(old['files'], new_files)
+                for mark, names in (('+', added), ('-', removed), ('~', modified)):
+                    for name in names:
+                        if not args.files or name in args.files:
+                            print(f"{mark} {name}")
+            else:
+                sys.stdout.writelines(diff_lines(old['files'], new_files,
+                                                 lambda name: read_blob(old['files'][name], site_dir), read_new,
+                                                 old['id'], new_label, args.files))
+
+        elif args.command == 'rollback':
+            restored, untouched = rollback(args.snapshot, args.files, site_dir)
+            for name in restored:
+                print(f"↩️  {name}")
+            for name in untouched:
+                print(f"⚠ {name} is not in the snapshot - left in place")
+            if dry_run_enabled():
+                print(f"🔎 Dry run: {len(restored)} file(s) would be restored")
+            else:
+                print(f"✅ {len(restored)} file(s) restored (the previous state was snapshotted first)")
+
+        elif args.command == 'import-backups':
+            snapshot, imported = import_backups(site_dir)
+            if not imported:
+                print("✓ No *.original.html backups to import")
+            else:
+                print(f"📸 {len(imported)} backup(s) stored as snapshot {snapshot['id']} and deleted")
+
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Page Transform Stages
+The maintenance transforms that used to live in apply-mobile-optimizations.py,
+disable-mobile-stars.py and fix-escaped-characters.py, registered as stages of
+the shared HTML pipeline (see site_pipeline.py).
+
+The stages run over the page sources in templates/pages/, which fill the
+head and body blocks of templates/layouts/page.html rather than carrying
+their own </head> and </body>: what used to go right before </head> goes at
+the end of the head block, and so on (see section_end). Complete documents,
+such as the pages in the site root, still work the old way.
+"""
+
+import re
+
+from site_pipeline import register_stage
+
+# Mobile scroll optimization CSS to inject
+MOBILE_CSS_INJECTION = '''
+  <!-- ULTIMATE MOBILE SCROLL OPTIMIZATION -->
+  <link rel="stylesheet" href="mobile-scroll-ultimate.css">
+  <style>
+    /* CRITICAL MOBILE SCROLL OPTIMIZATIONS - INLINE FOR INSTANT LOADING */
+    @media (max-width: 768px) {
+      html {
+        height: 100%;
+        overflow-y: scroll !important;
+        -webkit-overflow-scrolling: touch;
+        scroll-behavior: auto !important;
+        overscroll-behavior: contain;
+        transform: translateZ(0);
+        will-change: scroll-position;
+      }
+      body {
+        min-height: 100vh;
+        min-height: -webkit-fill-available;
+        overflow-y: scroll !important;
+        -webkit-overflow-scrolling: touch;
+        overscroll-behavior: contain;
+        transform: translateZ(0);
+        backface-visibility: hidden;
+        perspective: 1000px;
+        will-change: scroll-position;
+        contain: layout style;
+        -webkit-tap-highlight-color: transparent;
+      }
+      section, nav, .nav-links, main, article, aside {
+        contain: layout style;
+        transform: translateZ(0);
+        -webkit-overflow-scrolling: touch;
+        overscroll-behavior: contain;
+      }
+      .nav-links {
+        position: fixed;
+        top: 120px;
+        left: 0;
+        right: 0;
+        height: calc(100vh - 120px);
+        overflow-y: auto;
+        overflow-x: hidden;
+        -webkit-overflow-scrolling: touch;
+        overscroll-behavior: contain;
+      }
+      * {
+        -webkit-tap-highlight-color: transparent !important;
+        touch-action: manipulation !important;
+      }
+      p, span, div, h1, h2, h3, h4, h5, h6, label, li {
+        -webkit-user-select: text !important;
+        user-select: text !important;
+      }
+      a, button, .btn, input, select, textarea, .menu-toggle {
+        -webkit-user-select: none !important;
+        user-select: none !important;
+        min-height: 44px;
+        min-width: 44px;
+      }
+      input, select, textarea {
+        font-size: 16px !important;
+      }
+    }
+  </style>'''
+
+# JavaScript optimization to inject
+MOBILE_JS_INJECTION = '''
+  <!-- ULTIMATE MOBILE SCROLL OPTIMIZATION JS -->
+  <script src="mobile-scroll-ultimate.js" defer></script>'''
+
+OPTIMIZED_VIEWPORT = '<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0, user-scalable=yes, viewport-fit=cover">'
+
+MOBILE_META_TAGS = [
+    '<meta name="mobile-web-app-capable" content="yes">',
+    '<meta name="apple-mobile-web-app-capable" content="yes">',
+    '<meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">'
+]
+
+# Mobile star disable CSS to add
+MOBILE_STAR_DISABLE_CSS = '''
+      /* DISABLE STARS ON MOBILE FOR OPTIMAL PERFORMANCE */
+      @media (max-width: 768px) {
+        .star, .stars, #stars {
+          display: none !important;
+          visibility: hidden !important;
+          opacity: 0 !important;
+          animation: none !important;
+          transform: none !important;
+          will-change: auto !important;
+        }
+      }'''
+
+
+def section_end(content, section):
+    """Offset where the page's <head> or <body> ends, before any whitespace, or None
+
+    That is the closing tag in a complete document, or the {% endblock %} of
+    the block with the same name in a page source.
+    """
+    match = re.search(rf'\s*</{section}>', content, re.IGNORECASE)
+    if not match:
+        block = re.search(rf'{{%\s*block\s+{section}\s*%}}', content)
+        if block:
+            match = re.compile(r'\s*\{%\s*endblock\s*%\}').search(content, block.end())
+    return match.start() if match else None
+
+
+def insert_at(content, offset, text):
+    """Insert text at an offset"""
+    return content[:offset] + text + content[offset:]
+
+
+@register_stage(
+    'fix-escaped-characters',
+    "Remove literal '\\1' and '\\n' artifacts left by earlier regex passes",
+    skip_files=['test-mobile-performance.html'],
+)
+def fix_escaped_characters(page):
+    """Fix escaped characters left behind in a page"""
+    content = page['content']
+    replacements = 0
+
+    # Fix literal \1 characters (regex backreferences that got escaped)
+    replacements += content.count('\\1')
+    content = content.replace('\\1', '')
+
+    # Fix viewport meta tags followed by literal \n separators
+    fixed = re.sub(
+        r'(<meta name="viewport"[^>]+>)\\n\s*(<meta[^>]+>)\\n\s*(<meta[^>]+>)\\n\s*(<meta[^>]+>)',
+        r'\1\n  \2\n  \3\n  \4',
+        content
+    )
+    replacements += content.count('\\n') - fixed.count('\\n')
+    content = fixed
+
+    page['content'] = content
+    page['counters']['fixed_characters'] = replacements
+    if replacements:
+        page['log'].append(f"✅ Fixed {replacements} escaped characters")
+    else:
+        page['log'].append("✓ No escaped characters found")
+
+
+@register_stage(
+    'disable-mobile-stars',
+    'Hide the animated star background on mobile devices',
+    skip_files=['test-mobile-performance.html', 'sitemap.html'],
+)
+def disable_mobile_stars(page):
+    """Add the mobile star disable CSS to the page's inline styles"""
+    content = page['content']
+
+    # Check if mobile star disable is already present
+    if 'DISABLE STARS ON MOBILE' in content:
+        page['log'].append("✓ Already has mobile star disable CSS")
+        return
+
+    # Find the closing </style> tag of the inline CSS that ends the head
+    head_end = section_end(content, 'head')
+    style = re.search(r'\s*</style>\s*$', content[:head_end]) if head_end is not None else None
+    if not style:
+        page['log'].append("⚠ Could not find </style> tag to update")
+        return
+
+    page['content'] = insert_at(content, style.start(), MOBILE_STAR_DISABLE_CSS)
+    page['log'].append("✅ Added mobile star disable CSS")
+
+
+def add_loading_class(match):
+    """Add the loading class to a <body> tag"""
+    attrs = match.group(1)
+    if 'class=' in attrs:
+        # Add loading to existing class
+        attrs = re.sub(r'class="([^"]*)"', r'class="loading \1"', attrs)
+    else:
+        # Add new class attribute
+        attrs += ' class="loading"'
+    return f'<body{attrs}>'
+
+
+@register_stage(
+    'mobile-optimizations',
+    'Inject the ultimate mobile scroll CSS/JS, viewport and mobile meta tags',
+    skip_files=[
+        'index-ultra-mobile.html',
+        'index-smooth-mobile.html',
+        'index-mobile-optimized.html',
+        'sitemap.html'
+    ],
+)
+def apply_mobile_optimizations(page):
+    """Apply mobile scrolling optimizations to a page"""
+    content = page['content']
+    log = page['log']
+
+    # Skip if already optimized
+    if 'mobile-scroll-ultimate.css' in content:
+        log.append("✓ Already optimized, skipping")
+        return
+
+    # Find where to inject CSS (at the end of the head)
+    head_end = section_end(content, 'head')
+    if head_end is None:
+        log.append("⚠ Could not find </head> tag")
+        return
+    content = insert_at(content, head_end, MOBILE_CSS_INJECTION)
+    log.append("✓ Injected mobile CSS optimizations")
+
+    # Find where to inject JS (at the end of the body)
+    body_end = section_end(content, 'body')
+    if body_end is None:
+        log.append("⚠ Could not find </body> tag")
+        return
+    content = insert_at(content, body_end, MOBILE_JS_INJECTION)
+    log.append("✓ Injected mobile JS optimizations")
+
+    # Ensure viewport meta tag is optimized
+    viewport_pattern = r'<meta name="viewport"[^>]*>'
+    if re.search(viewport_pattern, content):
+        content = re.sub(viewport_pattern, OPTIMIZED_VIEWPORT, content)
+        log.append("✓ Optimized viewport meta tag")
+    else:
+        # Add viewport if missing
+        charset_pattern = r'(<meta charset="[^"]*">)'
+        if re.search(charset_pattern, content):
+            content = re.sub(charset_pattern, lambda match: match.group(1) + '\n  ' + OPTIMIZED_VIEWPORT, content)
+            log.append("✓ Added optimized viewport meta tag")
+
+    # Add mobile-specific meta tags if missing
+    for meta_tag in MOBILE_META_TAGS:
+        if meta_tag not in content:
+            content = content.replace(OPTIMIZED_VIEWPORT, OPTIMIZED_VIEWPORT + '\n  ' + meta_tag)
+    log.append("✓ Added mobile-specific meta tags")
+
+    # Ensure body has loading class for optimization (page sources get it
+    # from the layout's default body_class)
+    body_tag_pattern = r'<body([^>]*)>'
+    if re.search(body_tag_pattern, content):
+        content = re.sub(body_tag_pattern, add_loading_class, content)
+        log.append("✓ Added loading class to body")
+
+    page['content'] = content
+    log.append(f"✅ Successfully optimized {page['name']}")
@@ -0,0 +1,211 @@
+"""
+Streaming Sitemap Writer
+Writes <url> entries straight to disk as they are added, so memory use stays
+constant however many pages the site has. Output is split into shards at the
+sitemap protocol limits (50,000 URLs or 50 MB uncompressed per file) and a
+sitemap_index.xml is written whenever more than one shard is needed.
+
+    writer = SitemapWriter(CURRENT_DIR, DOMAIN, gzip=True)
+    for entry in entries:
+        writer.add(entry['loc'], entry['lastmod'], entry['changefreq'], entry['priority'])
+    outputs = writer.close()   # {filename: sha256} of every file it owns
+
+Each shard is streamed into a temporary file and only moved into place if
+its content differs from what is already on disk, so unchanged sitemaps keep
+their bytes and mtimes.
+"""
+
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from build_cache import file_digest
+from file_writes import remove_file, replace_file
+
+# Sitemap protocol limits
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+XML_HEADER = '<?xml version="1.0" ?>\n'
+URLSET_OPEN = ('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+               'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+               'xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 '
+               'http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">\n')
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = '</sitemapindex>\n'
+
+
+def render_url(loc, lastmod, changefreq, priority):
+    """Render one <url> entry."""
+    return (
+        '    <url>\n'
+        f'        <loc>{escape(loc)}</loc>\n'
+        f'        <lastmod>{escape(lastmod)}</lastmod>\n'
+        f'        <changefreq>{escape(changefreq)}</changefreq>\n'
+        f'        <priority>{escape(priority)}</priority>\n'
+        '    </url>\n'
+    )
+
+
+def replace_if_changed(temp_path, target, sha256):
+    """Move a finished temp file over the target, or drop it if identical."""
+    if file_digest(target) == sha256:
+        os.remove(temp_path)
+    else:
+        replace_file(temp_path, target)
+
+
+class SitemapWriter:
+    """Stream sitemap entries into one or more shard files."""
+
+    def __init__(self, out_dir, domain, base_name='sitemap', gzip=False,
+                 max_urls=MAX_URLS, max_bytes=MAX_BYTES):
+        self.out_dir = Path(out_dir)
+        self.domain = domain.rstrip('/')
+        self.base_name = base_name
+        self.gzip = gzip
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        # Per shard: temp path, sha256, url count, latest lastmod
+        self.shards = []
+        self.handle = None
+        self.temp_path = None
+        self.digest = None
+        self.shard_urls = 0
+        self.shard_bytes = 0
+        self.shard_lastmod = ''
+        self.total_urls = 0
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self.handle.write(data)
+        self.digest.update(data)
+        self.shard_bytes += len(data)
+
+    def _open_shard(self):
+        temp_path = self.out_dir / f".{self.base_name}-shard-{len(self.shards) + 1}.tmp"
+        self.handle = open(temp_path, 'wb')
+        self.digest = hashlib.sha256()
+        self.shard_urls = 0
+        self.shard_bytes = 0
+        self.shard_lastmod = ''
+        self.temp_path = temp_path
+        self._write(XML_HEADER + URLSET_OPEN)
+
+    def _close_shard(self):
+        self._write(URLSET_CLOSE)
+        self.handle.close()
+        self.shards.append({
+            'temp_path': self.temp_path,
+            'sha256': self.digest.hexdigest(),
+            'urls': self.shard_urls,
+            'lastmod': self.shard_lastmod,
+        })
+        self.handle = None
+
+    def add(self, loc, lastmod, changefreq, priority):
+        """Append a URL, starting a new shard when a limit would be exceeded."""
+        entry = render_url(loc, lastmod, changefreq, priority)
+        entry_bytes = len(entry.encode('utf-8'))
+
+        if self.handle is None:
+            self._open_shard()
+        elif (self.shard_urls >= self.max_urls or
+              self.shard_bytes + entry_bytes + len(URLSET_CLOSE) > self.max_bytes):
+            self._close_shard()
+            self._open_shard()
+
+        self._write(entry)
+        self.shard_urls += 1
+        self.total_urls += 1
+        self.shard_lastmod = max(self.shard_lastmod, lastmod)
+
+    def shard_name(self, number, count):
+        """File name of a shard; a single shard keeps the plain sitemap.xml name."""
+        if count == 1:
+            return f"{self.base_name}.xml"
+        return f"{self.base_name}-{number}.xml"
+
+    def close(self):
+        """Finish every shard, move changed files into place and return their digests."""
+        if self.handle is None:
+            # An empty site still gets a valid, empty urlset
+            self._open_shard()
+        self._close_shard()
+
+        outputs = {}
+        count = len(self.shards)
+        for number, shard in enumerate(self.shards, 1):
+            name = self.shard_name(number, count)
+            outputs.update(self._publish(shard['temp_path'], name, shard['sha256']))
+            shard['name'] = name
+
+        if count > 1:
+            outputs.update(self._write_index())
+
+        self._remove_stale_shards(count)
+        return outputs
+
+    def _publish(self, temp_path, name, sha256):
+        """Move a finished shard into place (and gzip it) unless it is unchanged."""
+        outputs = {name: sha256}
+        if self.gzip:
+            outputs[name + '.gz'] = self._publish_gzip(temp_path, name + '.gz')
+        replace_if_changed(temp_path, self.out_dir / name, sha256)
+        return outputs
+
+    def _publish_gzip(self, temp_path, gz_name):
+        """Compress a finished shard next to it and return the digest of the .gz."""
+        gz_temp = self.out_dir / f".{gz_name}.tmp"
+        with open(temp_path, 'rb') as source, open(gz_temp, 'wb') as raw:
+            # mtime=0 keeps the compressed bytes reproducible
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as compressed:
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    compressed.write(chunk)
+        sha256 = file_digest(gz_temp)
+        replace_if_changed(gz_temp, self.out_dir / gz_name, sha256)
+        return sha256
+
+    def _write_index(self):
+        """Write sitemap_index.xml listing every shard."""
+        suffix = '.gz' if self.gzip else ''
+        parts = [XML_HEADER, INDEX_OPEN]
+        for shard in self.shards:
+            parts.append('    <sitemap>\n')
+            parts.append(f"        <loc>{escape(self.domain)}/{escape(shard['name'] + suffix)}</loc>\n")
+            if shard['lastmod']:
+                parts.append(f"        <lastmod>{escape(shard['lastmod'])}</lastmod>\n")
+            parts.append('    </sitemap>\n')
+        parts.append(INDEX_CLOSE)
+        content = ''.join(parts).encode('utf-8')
+
+        name = f"{self.base_name}_index.xml"
+        temp_path = self.out_dir / f".{name}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        sha256 = hashlib.sha256(content).hexdigest()
+        replace_if_changed(temp_path, self.out_dir / name, sha256)
+        return {name: sha256}
+
+    def _remove_stale_shards(self, count):
+        """Delete sitemap files a previous run wrote that this run did not."""
+        current = {shard['name'] for shard in self.shards}
+        if self.gzip:
+            current |= {name + '.gz' for name in list(current)}
+        if count > 1:
+            current.add(f"{self.base_name}_index.xml")
+
+        candidates = [f"{self.base_name}.xml", f"{self.base_name}_index.xml"]
+        number = 1
+        while (self.out_dir / f"{self.base_name}-{number}.xml").exists() or number <= count:
+            candidates.append(f"{self.base_name}-{number}.xml")
+            number += 1
+
+        for name in candidates:
+            for candidate in (name, name + '.gz'):
+                path = self.out_dir / candidate
+                if candidate not in current:
+                    remove_file(path)
@@ -0,0 +1,137 @@
+"""
+Starfield Stage
+Build stage (see build_site.py) that replaces the star field the pages build
+at runtime - one absolutely positioned <div> per star, created with
+document.createElement and animated on its own - with a pre-rendered one.
+
+The stars are drawn once, at build time, into a few SVG layers in
+images/starfield-<layer>.svg from a fixed seed, so every build produces the
+same bytes (and the same fingerprinted names). A page opts in by marking its
+star container:
+
+    <div class="stars" id="stars" data-starfield></div>
+
+which the stage replaces with one element per layer, each showing its SVG as
+a background and sharing one CSS animation with every other star on that
+layer:
+
+    <div class="starfield" aria-hidden="true">
+      <div class="starfield-layer starfield-far"></div>
+      ...
+    </div>
+
+That is a handful of composited layers instead of ~200 animated elements, and
+no script work at load, so the effect is cheap enough to keep on mobile too.
+The page's own star script must do nothing once #stars is gone.
+"""
+
+import random
+import re
+
+from file_writes import write_text
+from site_pipeline import register_stage
+
+SEED = 'kw-wizards-starfield'
+
+# The SVGs are scaled to cover the viewport, like the percentage positions of
+# the runtime stars; coordinates are in this box
+WIDTH = 1600
+HEIGHT = 1000
+
+# name: stars, radius range (px at 1600 wide), twinkle period (None = static),
+# opacity (when static, or when the visitor prefers reduced motion)
+LAYERS = [
+    {'name': 'far', 'count': 80, 'radius': (0.3, 0.9), 'period': None, 'opacity': 0.5},
+    {'name': 'twinkle-a', 'count': 25, 'radius': (0.5, 1.5), 'period': 3, 'opacity': 0.8},
+    {'name': 'twinkle-b', 'count': 25, 'radius': (0.5, 1.5), 'period': 4, 'opacity': 0.8},
+    {'name': 'twinkle-c', 'count': 25, 'radius': (0.5, 1.5), 'period': 5, 'opacity': 0.8},
+    {'name': 'shimmer', 'count': 50, 'radius': (0.8, 1.8), 'period': 3, 'opacity': 1.0},
+]
+
+CONTAINER = re.compile(r'<div\b[^>]*\bdata-starfield\b[^>]*>\s*</div>', re.IGNORECASE)
+HEAD_END = re.compile(r'</head>', re.IGNORECASE)
+
+
+def layer_path(layer):
+    """Site-relative path of a layer's SVG."""
+    return f"images/starfield-{layer['name']}.svg"
+
+
+def render_layer(layer, seed=SEED):
+    """SVG markup of one layer, the same for the same seed."""
+    rng = random.Random(f"{seed}:{layer['name']}")
+    low, high = layer['radius']
+    circles = ''.join(
+        f'<circle cx="{rng.uniform(0, WIDTH):.1f}" cy="{rng.uniform(0, HEIGHT):.1f}" r="{rng.uniform(low, high):.2f}"/>'
+        for _ in range(layer['count'])
+    )
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" '
+            f'preserveAspectRatio="xMidYMid slice"><g fill="#fff">{circles}</g></svg>\n')
+
+
+def starfield_markup():
+    """The element tree that takes the place of the runtime star container."""
+    layers = ''.join(f'<div class="starfield-layer starfield-{layer["name"]}"></div>' for layer in LAYERS)
+    return f'<div class="starfield" aria-hidden="true">{layers}</div>'
+
+
+def starfield_css():
+    """Styles for the layers; the animation durations hold against the pages' mobile 'fast animation' overrides."""
+    rules = [
+        '.starfield{position:fixed;top:0;left:0;width:100%;height:100%;z-index:-1;pointer-events:none;contain:strict}',
+        '.starfield-layer{position:absolute;top:0;left:0;width:100%;height:100%;'
+        'background-position:center;background-size:cover;background-repeat:no-repeat}',
+    ]
+    for index, layer in enumerate(LAYERS):
+        rule = f"background-image:url({layer_path(layer)});opacity:{layer['opacity']}"
+        if layer['period']:
+            # Negative delays so the layers are out of phase from the first frame
+            rule += (f";animation:starfield-twinkle {layer['period']}s ease-in-out -{index * 0.7:.1f}s infinite alternate"
+                     f";animation-duration:{layer['period']}s!important")
+        rules.append(f".starfield-{layer['name']}{{{rule}}}")
+    rules.append('@keyframes starfield-twinkle{from{opacity:.2}to{opacity:.85}}')
+    rules.append('@media (prefers-reduced-motion:reduce){.starfield-layer{animation:none!important}}')
+    return '\n'.join(rules)
+
+
+def prerender(content):
+    """A page with its data-starfield container swapped for the layers, or None if it has none."""
+    if not CONTAINER.search(content):
+        return None
+    content = CONTAINER.sub(lambda match: starfield_markup(), content, count=1)
+    return HEAD_END.sub(lambda match: f"<style>\n{starfield_css()}\n</style>\n</head>", content, count=1)
+
+
+def prepare_starfield(context):
+    """Draw the layer SVGs and swap them into the pages that opt in."""
+    site_dir = context['site_dir']
+    written = sum(write_text(site_dir / layer_path(layer), render_layer(layer)) for layer in LAYERS)
+
+    # Done here rather than page by page so the prepare hooks of the later
+    # stages (critical CSS, pruning) index the layers like any other markup;
+    # the pipeline report counts these rewrites against this stage
+    pages = {}
+    for path in sorted(site_dir.glob('*.html')):
+        original = path.read_text(encoding='utf-8')
+        content = prerender(original)
+        if content is not None:
+            write_text(path, content)
+            pages[path.name] = len(content.encode('utf-8')) - len(original.encode('utf-8'))
+
+    stars = sum(layer['count'] for layer in LAYERS)
+    print(f"✨ Starfield: {stars} stars in {len(LAYERS)} layers ({written} layer(s) updated), "
+          f"pre-rendered into {len(pages)} page(s)")
+    context['starfield'] = pages
+
+
+@register_stage(
+    'starfield',
+    'Swap the runtime-generated star field for pre-rendered, seeded SVG layers',
+    group='build',
+    prepare=prepare_starfield,
+)
+def report_starfield(page):
+    """Note the pages whose star field prepare() pre-rendered"""
+    delta = page['context']['starfield'].get(page['name'])
+    if delta is not None:
+        page['log'].append(f"✅ Pre-rendered star field ({len(LAYERS)} layers, no star elements, {delta:+,} bytes)")
@@ -0,0 +1,434 @@
+"""
+Templates
+A small template engine for the site's pages: layouts, partials and
+compiled-template caching, with the dependencies of every template tracked
+so callers can tell which outputs a changed file affects.
+
+    env = Environment()
+    html = env.render('pages/about.html', {'page': 'about.html'})
+    env.dependencies('pages/about.html')
+    # {'pages/about.html', 'layouts/page.html', 'partials/nav.html', ...}
+
+Syntax (a subset of Jinja):
+    {{ expr }}                                output, HTML-escaped unless |safe
+    {% extends "layouts/page.html" %}         the template only fills the layout's blocks
+                                              (and runs its top-level set tags)
+    {% block name %}...{% endblock %}
+    {% include "partials/nav.html" with logo="x.png" %}
+    {% if expr %}...{% elif expr %}...{% else %}...{% endif %}
+    {% for item in expr %}...{% else %}...{% endfor %}   (loop.index, loop.first, loop.last)
+    {% set name = expr %}
+    {# comment #}
+
+Expressions are Python expressions limited to names, a.b lookups (dict keys
+or attributes), item access, literals, arithmetic, comparisons, and/or/not
+and filters: |safe |escape |default("x") |join(", ") |length |lower |upper.
+Undefined names are None and print as nothing. A newline right after a
+{% tag %} or {# comment #} is dropped, like Jinja's trim_blocks, so tags on
+lines of their own leave no blank lines behind.
+
+Each template compiles to Python code once; the code object is kept in memory
+and marshalled to .build-cache/templates/ keyed by the template's content
+hash, this engine and the Python version, so later runs skip compiling.
+"""
+
+import ast
+import html
+import marshal
+import os
+import re
+import sys
+from collections import ChainMap
+from pathlib import Path
+
+from build_cache import CACHE_DIR, file_digest, text_digest
+
+SITE_DIR = Path(__file__).parent
+TEMPLATE_DIR = SITE_DIR / 'templates'
+COMPILED_DIR = CACHE_DIR / 'templates'
+
+ENGINE_DIGEST = file_digest(__file__)
+MAX_LAYOUT_DEPTH = 10
+
+TOKEN = re.compile(r'(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})', re.DOTALL)
+TAG = re.compile(r'\{%\s*(\w+)\s*(.*?)\s*%\}$', re.DOTALL)
+QUOTED = re.compile(r'''^(["'])(.+?)\1\s*(?:with\s+(.*))?$''', re.DOTALL)
+FOR_TAG = re.compile(r'^(\w+(?:\s*,\s*\w+)*)\s+in\s+(.+)$', re.DOTALL)
+SET_TAG = re.compile(r'^(\w+)\s*=\s*(.+)$', re.DOTALL)
+
+ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Attribute, ast.Subscript, ast.Slice, ast.Constant,
+    ast.Compare, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.IfExp,
+    ast.BinOp, ast.BitOr, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot,
+    ast.List, ast.Tuple, ast.Dict, ast.Call, ast.keyword,
+)
+
+
+class TemplateError(Exception):
+    """A template that cannot be compiled or rendered."""
+
+
+class Markup(str):
+    """A string that is already safe HTML."""
+
+
+def escape(value):
+    """HTML-escape a value unless it is Markup; None becomes empty."""
+    if isinstance(value, Markup):
+        return value
+    if value is None:
+        return Markup('')
+    return Markup(html.escape(str(value), quote=True))
+
+
+FILTERS = {
+    'safe': lambda value: Markup('' if value is None else value),
+    'escape': escape,
+    'default': lambda value, fallback='': fallback if value is None or value == '' else value,
+    'join': lambda value, separator='': separator.join(str(item) for item in value),
+    'length': len,
+    'lower': lambda value: str(value).lower(),
+    'upper': lambda value: str(value).upper(),
+}
+
+
+def lookup(scope, name):
+    """Value of a name in the render scope, or None."""
+    return scope.get(name)
+
+
+def attribute(value, name):
+    """a.b: a dict key or an attribute, or None."""
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+
+class ExpressionCompiler(ast.NodeTransformer):
+    """Rewrite a template expression into Python reading from the scope."""
+
+    def __init__(self, where):
+        self.where = where
+
+    def visit_Name(self, node):
+        return ast.Call(ast.Name('_lookup', ast.Load()), [ast.Name('_s', ast.Load()), ast.Constant(node.id)], [])
+
+    def visit_Attribute(self, node):
+        return ast.Call(ast.Name('_attr', ast.Load()), [self.visit(node.value), ast.Constant(node.attr)], [])
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, ast.BitOr):
+            return self.generic_visit(node)
+        target = node.right
+        if isinstance(target, ast.Name):
+            name, args, keywords = target.id, [], []
+        elif isinstance(target, ast.Call) and isinstance(target.func, ast.Name):
+            name, args, keywords = target.func.id, target.args, target.keywords
+        else:
+            raise TemplateError(f"{self.where}: a filter must be a name or a call")
+        if name not in FILTERS:
+            raise TemplateError(f"{self.where}: unknown filter '{name}'")
+        function = ast.Subscript(ast.Name('_filters', ast.Load()), ast.Constant(name), ast.Load())
+        return ast.Call(function, [self.visit(node.left)] + [self.visit(arg) for arg in args],
+                        [ast.keyword(keyword.arg, self.visit(keyword.value)) for keyword in keywords])
+
+    def visit_Call(self, node):
+        raise TemplateError(f"{self.where}: function calls are not allowed, only filters")
+
+
+def compile_expression(source, where):
+    """Python source evaluating a template expression against the scope _s."""
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError as e:
+        raise TemplateError(f"{where}: invalid expression {source.strip()!r} ({e.msg})") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise TemplateError(f"{where}: {type(node).__name__} is not allowed in {source.strip()!r}")
+        if isinstance(node, (ast.Name, ast.Attribute)) and getattr(node, 'id', getattr(node, 'attr', '')).startswith('_'):
+            raise TemplateError(f"{where}: names starting with '_' are private in {source.strip()!r}")
+    tree = ast.fix_missing_locations(ExpressionCompiler(where).visit(tree))
+    return ast.unparse(tree)
+
+
+class CodeWriter:
+    """Indented Python source for one render function."""
+
+    def __init__(self, name):
+        self.lines = [f"def {name}(_s, _b):", "    _o = []", "    _w = _o.append"]
+        self.depth = 1
+
+    def line(self, text):
+        self.lines.append('    ' * self.depth + text)
+
+    def open(self, text):
+        self.line(text)
+        self.depth += 1
+        # Blocks may end up with no output statements
+        self.line('pass')
+
+    def close(self):
+        self.depth -= 1
+
+    def source(self):
+        return '\n'.join(self.lines + ["    return ''.join(_o)", ''])
+
+
+def tokenize(source):
+    """Split a template into (kind, text, line) tokens of kind 'text', 'output' or 'tag'."""
+    tokens = []
+    line = 1
+    trim = False
+    for part in TOKEN.split(source):
+        if part.startswith('{{') and part.endswith('}}'):
+            tokens.append(('output', part[2:-2], line))
+            trim = False
+        elif part.startswith('{%') and part.endswith('%}'):
+            tokens.append(('tag', part, line))
+            trim = True
+        elif part.startswith('{#') and part.endswith('#}'):
+            trim = True
+        else:
+            text = part[1:] if trim and part.startswith('\n') else part
+            if text:
+                tokens.append(('text', text, line))
+            trim = False
+        line += part.count('\n')
+    return tokens
+
+
+def compile_template(source, name):
+    """Compile template source into the Python source of a module."""
+    root = CodeWriter('_root')
+    writers = [root]
+    functions = []
+    blocks = []
+    stack = []
+    extends = None
+    includes = []
+    counter = 0
+
+    for kind, text, line in tokenize(source):
+        where = f"{name}:{line}"
+        writer = writers[-1]
+        # Outside its blocks a child template only runs its set tags
+        silent = extends is not None and writer is root
+        if silent and (kind != 'tag' or not TAG.match(text) or TAG.match(text).group(1) not in ('block', 'set')):
+            continue
+        if kind == 'text':
+            writer.line(f"_w({text!r})")
+            continue
+        if kind == 'output':
+            writer.line(f"_w(_escape({compile_expression(text, where)}))")
+            continue
+
+        match = TAG.match(text)
+        if not match:
+            raise TemplateError(f"{where}: malformed tag {text!r}")
+        tag, args = match.groups()
+
+        if tag == 'extends':
+            quoted = QUOTED.match(args)
+            if not quoted or quoted.group(3) or extends:
+                raise TemplateError(f"{where}: extends needs one quoted template name")
+            extends = quoted.group(2)
+        elif tag == 'include':
+            quoted = QUOTED.match(args)
+            if not quoted:
+                raise TemplateError(f"{where}: include needs a quoted template name")
+            values = '{}'
+            if quoted.group(3):
+                try:
+                    call = ast.parse(f"_({quoted.group(3)})", mode='eval').body
+                except SyntaxError:
+                    raise TemplateError(f"{where}: include arguments must be name=value pairs") from None
+                if call.args:
+                    raise TemplateError(f"{where}: include arguments must be name=value pairs")
+                values = '{' + ', '.join(
+                    f"{keyword.arg!r}: {compile_expression(ast.unparse(keyword.value), where)}"
+                    for keyword in call.keywords
+                ) + '}'
+            includes.append(quoted.group(2))
+            writer.line(f"_w(_env.include({quoted.group(2)!r}, _s, {values}))")
+        elif tag == 'block':
+            if not re.fullmatch(r'\w+', args) or args in blocks:
+                raise TemplateError(f"{where}: block needs a unique name")
+            blocks.append(args)
+            if not silent:
+                writer.line(f"_w(_b[{args!r}](_s, _b))")
+            writers.append(CodeWriter(f"_block_{args}"))
+            stack.append(('block', where))
+        elif tag == 'endblock':
+            if not stack or stack[-1][0] != 'block':
+                raise TemplateError(f"{where}: endblock without block")
+            stack.pop()
+            functions.append(writers.pop().source())
+        elif tag == 'if':
+            writer.open(f"if {compile_expression(args, where)}:")
+            stack.append(('if', where))
+        elif tag in ('elif', 'else') and stack and stack[-1][0] == 'if':
+            writer.close()
+            if tag == 'elif':
+                writer.open(f"elif {compile_expression(args, where)}:")
+            else:
+                writer.open("else:")
+        elif tag == 'endif':
+            if not stack or stack[-1][0] != 'if':
+                raise TemplateError(f"{where}: endif without if")
+            stack.pop()
+            writer.close()
+        elif tag == 'for':
+            loop = FOR_TAG.match(args)
+            if not loop:
+                raise TemplateError(f"{where}: expected 'for name in expression'")
+            counter += 1
+            targets = [target.strip() for target in loop.group(1).split(',')]
+            writer.line(f"_items{counter} = list({compile_expression(loop.group(2), where)})")
+            writer.line(f"_outer{counter} = _s")
+            writer.open(f"for _index{counter}, _item{counter} in enumerate(_items{counter}):")
+            writer.line(f"_s = _outer{counter}.new_child({{'loop': _loop(_index{counter}, len(_items{counter}))}})")
+            assigned = ', '.join(f"_s[{target!r}]" for target in targets)
+            writer.line(f"{assigned} = _item{counter}" if len(targets) == 1 else f"({assigned}) = _item{counter}")
+            stack.append(('for', where, counter))
+        elif tag == 'else' and stack and stack[-1][0] == 'for':
+            number = stack[-1][2]
+            writer.close()
+            writer.line(f"_s = _outer{number}")
+            writer.open(f"if not _items{number}:")
+            stack[-1] = ('for-else', where, number)
+        elif tag == 'endfor':
+            if not stack or stack[-1][0] not in ('for', 'for-else'):
+                raise TemplateError(f"{where}: endfor without for")
+            number = stack.pop()[2]
+            writer.close()
+            writer.line(f"_s = _outer{number}")
+        elif tag == 'set':
+            assignment = SET_TAG.match(args)
+            if not assignment:
+                raise TemplateError(f"{where}: expected 'set name = expression'")
+            writer.line(f"_s[{assignment.group(1)!r}] = {compile_expression(assignment.group(2), where)}")
+        else:
+            raise TemplateError(f"{where}: unknown or misplaced tag '{tag}'")
+
+    if stack:
+        raise TemplateError(f"{stack[-1][1]}: '{stack[-1][0]}' is never closed")
+
+    return '\n'.join(
+        [root.source()] + functions + [
+            "_blocks = {" + ', '.join(f"{block!r}: _block_{block}" for block in blocks) + "}",
+            f"_extends = {extends!r}",
+            f"_includes = {includes!r}",
+        ]
+    ) + '\n'
+
+
+def loop_info(index, length):
+    """The loop variable of a for tag."""
+    return {'index': index + 1, 'index0': index, 'first': index == 0, 'last': index == length - 1,
+            'length': length}
+
+
+class Environment:
+    """Loads, compiles and renders the templates of one directory."""
+
+    def __init__(self, template_dir=TEMPLATE_DIR, cache_dir=COMPILED_DIR, globals=None):
+        self.template_dir = Path(template_dir).resolve()
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.globals = dict(globals or {})
+        self.templates = {}
+        self.stats = {'compiled': 0, 'cached': 0}
+
+    def path(self, name):
+        """File of a template, which must lie inside the template directory."""
+        path = (self.template_dir / name).resolve()
+        if self.template_dir not in path.parents:
+            raise TemplateError(f"Template outside {self.template_dir}: {name}")
+        return path
+
+    def load(self, name):
+        """Compiled template, recompiled when its file changed."""
+        try:
+            source = self.path(name).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            raise TemplateError(f"Template not found: {name}") from None
+        digest = text_digest(source)
+        template = self.templates.get(name)
+        if template and template['digest'] == digest:
+            return template
+
+        namespace = {'_env': self, '_lookup': lookup, '_attr': attribute, '_filters': FILTERS,
+                     '_escape': escape, '_loop': loop_info}
+        exec(self.load_code(name, source, digest), namespace)
+        template = {
+            'name': name,
+            'digest': digest,
+            'root': namespace['_root'],
+            'blocks': namespace['_blocks'],
+            'extends': namespace['_extends'],
+            'includes': namespace['_includes'],
+        }
+        self.templates[name] = template
+        return template
+
+    def load_code(self, name, source, digest):
+        """Code object of a template, from the on-disk cache when possible."""
+        key = text_digest(f"{digest}:{ENGINE_DIGEST}:{sys.version}")
+        cache_path = self.cache_dir / f"{key}.code" if self.cache_dir else None
+        if cache_path:
+            try:
+                code = marshal.loads(cache_path.read_bytes())
+                self.stats['cached'] += 1
+                return code
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+
+        code = compile(compile_template(source, name), f"<template {name}>", 'exec')
+        self.stats['compiled'] += 1
+        if cache_path:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = cache_path.with_suffix('.tmp')
+            temp_path.write_bytes(marshal.dumps(code))
+            os.replace(temp_path, cache_path)
+        return code
+
+    def render(self, name, context=None):
+        """Render a template with the given variables."""
+        return self.render_scope(name, ChainMap(dict(context or {}), self.globals))
+
+    def render_scope(self, name, scope):
+        chain = [self.load(name)]
+        while chain[-1]['extends']:
+            if len(chain) > MAX_LAYOUT_DEPTH:
+                raise TemplateError(f"Layouts of {name} extend each other in a loop")
+            chain.append(self.load(chain[-1]['extends']))
+        blocks = {}
+        for template in reversed(chain):
+            blocks.update(template['blocks'])
+        # Child templates run their top-level set tags before the layout renders
+        for template in chain[:-1]:
+            template['root'](scope, blocks)
+        return chain[-1]['root'](scope, blocks)
+
+    def include(self, name, scope, values):
+        """Render a partial with the including template's variables."""
+        return self.render_scope(name, scope.new_child(values))
+
+    def dependencies(self, name):
+        """Every template a template needs to render, itself included."""
+        seen = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            template = self.load(current)
+            if template['extends']:
+                pending.append(template['extends'])
+            pending.extend(template['includes'])
+        return seen
+
+    def dependency_digests(self, name):
+        """Content hash of every template a template depends on."""
+        return {dependency: self.load(dependency)['digest'] for dependency in sorted(self.dependencies(name))}
@@ -0,0 +1,20 @@
+"""Shared fixture for the tests: a throwaway site with a build cache of its own."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class SiteTestCase(unittest.TestCase):
+    """A test with an empty site in self.site_dir and its cache in self.cache_dir."""
+
+    def setUp(self):
+        self.site_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.cache_dir = self.site_dir / '.build-cache'
+
+    def write(self, name, text):
+        """Write a text file into the site, creating its directories."""
+        path = self.site_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+        return path
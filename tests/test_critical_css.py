@@ -0,0 +1,96 @@
+"""Critical CSS keeps the cascade: the same rule wins before and after the split."""
+
+import re
+import unittest
+from pathlib import Path
+
+import critical_css
+from support import SiteTestCase
+
+NOSCRIPT = re.compile(r'<noscript>.*?</noscript>', re.IGNORECASE | re.DOTALL)
+STYLESHEET = re.compile(r'<style[^>]*>(.*?)</style>|<link\b([^>]*)>', re.IGNORECASE | re.DOTALL)
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<link rel="stylesheet" href="base.css">
+<style>
+h1 { color: blue; }
+.note { color: green; }
+</style>
+</head>
+<body>
+<header><h1>Wizards</h1></header>
+<section><p>First screen</p></section>
+<footer class="note">Below the fold</footer>
+</body>
+</html>
+"""
+
+BASE_CSS = """h1 { color: red; }
+.note { color: red; }
+"""
+
+
+def cascade(site_dir, content):
+    """All CSS the page applies once every stylesheet has loaded, in cascade order."""
+    sheets = []
+    for match in STYLESHEET.finditer(NOSCRIPT.sub('', content)):
+        if match.group(1) is not None:
+            sheets.append(match.group(1))
+            continue
+        attrs = critical_css.parse_attributes(f"<link{match.group(2)}>")
+        if attrs.get('rel') == 'stylesheet' or attrs.get('as') == 'style':
+            sheets.append((Path(site_dir) / attrs['href']).read_text(encoding='utf-8'))
+    return '\n'.join(sheets)
+
+
+def winner(css, selector):
+    """The color of the last rule for a selector."""
+    colors = re.findall(re.escape(selector) + r'\s*\{[^}]*?color\s*:\s*(\w+)', css)
+    return colors[-1] if colors else None
+
+
+class CriticalCssCascadeTest(SiteTestCase):
+
+    def build(self, content, files=None):
+        """Run the critical-css stage over one page and return its new content."""
+        self.write('page.html', content)
+        for name, text in (files or {}).items():
+            self.write(name, text)
+        context = {'site_dir': self.site_dir, 'cache_dir': self.cache_dir}
+        critical_css.prepare_critical(context)
+        page = {'name': 'page.html', 'content': content, 'counters': {}, 'log': [], 'context': context}
+        critical_css.inline_critical_css(page)
+        return page['content']
+
+    def test_conflicting_rules_keep_their_winner(self):
+        built = self.build(PAGE, {'base.css': BASE_CSS})
+        before = cascade(self.site_dir, PAGE)
+        after = cascade(self.site_dir, built)
+
+        self.assertEqual(winner(before, 'h1'), 'blue')
+        self.assertEqual(winner(before, '.note'), 'green')
+        self.assertEqual(winner(after, 'h1'), 'blue')
+        self.assertEqual(winner(after, '.note'), 'green')
+
+    def test_first_paint_uses_only_the_critical_rules(self):
+        built = self.build(PAGE, {'base.css': BASE_CSS})
+        inline = re.search(r'<style>(.*?)</style>', built, re.DOTALL).group(1)
+
+        self.assertEqual(winner(inline, 'h1'), 'blue')
+        self.assertIsNone(winner(inline, '.note'))
+        self.assertNotIn('<link rel="stylesheet" href="base.css">', NOSCRIPT.sub('', built))
+
+    def test_leading_critical_block_stays_inline(self):
+        content = PAGE.replace('<link rel="stylesheet" href="base.css">',
+                               '<style>h1 { margin: 0; }</style>\n<link rel="stylesheet" href="base.css">')
+        built = self.build(content, {'base.css': BASE_CSS})
+
+        self.assertEqual(sorted(path.name for path in self.site_dir.glob('*.deferred*.css')),
+                         ['page.deferred.css'])
+        self.assertEqual(winner(cascade(self.site_dir, built), 'h1'), 'blue')
+
+
+if __name__ == '__main__':
+    unittest.main()
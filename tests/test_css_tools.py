@@ -0,0 +1,119 @@
+"""Stylesheets flatten into declarations that know the viewport widths they apply at."""
+
+import unittest
+
+import css_tools
+import issue_scanner
+
+STYLESHEET = """/* .old { font-size: 10px } */
+.a { color: red !important; }
+@media (max-width: 768px) {
+  .nav a, .logo { font-size: 14px; }
+  @media (min-width: 400px) { .b { min-height: 48px; min-height: 60px } }
+}
+@media print { .c { font-size: 8px } }
+@supports (display: grid) { @media (max-width: 600px) { .rep-team-box { pointer-events: none } } }
+"""
+
+
+class MediaWidthRangeTest(unittest.TestCase):
+
+    def test_width_features(self):
+        cases = {
+            '@media (max-width: 768px)': (None, 768.0),
+            '@media screen and (min-width: 30em) and (max-width: 48em)': (480.0, 768.0),
+            '@media (orientation: portrait)': (None, None),
+        }
+        for query, widths in cases.items():
+            with self.subTest(query):
+                self.assertEqual(css_tools.media_width_range(query), widths)
+
+    def test_range_syntax(self):
+        cases = {
+            '@media (width < 600px)': (None, 600.0),
+            '@media (width >= 30em)': (480.0, None),
+            '@media (600px > width)': (None, 600.0),
+            '@media (400px <= width <= 700px)': (400.0, 700.0),
+        }
+        for query, widths in cases.items():
+            with self.subTest(query):
+                self.assertEqual(css_tools.media_width_range(query), widths)
+
+    def test_query_lists_match_where_any_query_does(self):
+        self.assertEqual(css_tools.media_width_range('@media print, (max-width: 500px)'), (None, 500.0))
+        self.assertEqual(css_tools.media_width_range('@media (max-width: 500px), (min-width: 900px)'), (None, None))
+        self.assertEqual(css_tools.media_width_range('@media not print'), (None, None))
+
+    def test_queries_that_never_match_on_screen(self):
+        self.assertIsNone(css_tools.media_width_range('@media print'))
+        self.assertIsNone(css_tools.media_width_range('@media (min-width: 800px) and (max-width: 600px)'))
+
+    def test_intersect_widths(self):
+        self.assertEqual(css_tools.intersect_widths((None, 768.0), (400.0, None)), (400.0, 768.0))
+        self.assertIsNone(css_tools.intersect_widths((None, 300.0), (400.0, None)))
+        self.assertIsNone(css_tools.intersect_widths((None, None), None))
+
+
+class StyleDeclarationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.declarations = css_tools.style_declarations(STYLESHEET)
+
+    def test_context_of_each_declaration(self):
+        self.assertEqual([(declaration['selectors'], declaration['property'], declaration['value'],
+                           declaration['min_width'], declaration['max_width'])
+                          for declaration in self.declarations], [
+            (('.a',), 'color', 'red', None, None),
+            (('.nav a', '.logo'), 'font-size', '14px', None, 768.0),
+            (('.b',), 'min-height', '48px', 400.0, 768.0),
+            (('.b',), 'min-height', '60px', 400.0, 768.0),
+            (('.rep-team-box',), 'pointer-events', 'none', None, 600.0),
+        ])
+        self.assertTrue(self.declarations[0]['important'])
+        self.assertEqual(self.declarations[2]['media'], ('@media (max-width: 768px)', '@media (min-width: 400px)'))
+
+    def test_offsets_point_into_the_stylesheet(self):
+        for declaration in self.declarations:
+            with self.subTest(declaration['property']):
+                self.assertTrue(STYLESHEET.startswith(declaration['property'], declaration['offset']))
+
+    def test_declarations_under(self):
+        under = css_tools.declarations_under(self.declarations, 700)
+        self.assertEqual([declaration['property'] for declaration in under], ['pointer-events'])
+
+    def test_sheet_media(self):
+        declarations = css_tools.style_declarations('.a { font-size: 12px }', '(max-width: 500px)')
+        self.assertEqual(declarations[0]['max_width'], 500.0)
+        self.assertEqual(css_tools.style_declarations('.a { font-size: 12px }', 'print'), ())
+
+    def test_inline_styles(self):
+        html = '<style>.a{}</style><style media="(max-width: 600px)">.b{}</style>'
+        self.assertEqual([(css, media) for _, css, media in css_tools.inline_styles(html)],
+                         [('.a{}', ''), ('.b{}', '(max-width: 600px)')])
+
+
+class StyleRulesTest(unittest.TestCase):
+
+    def test_mobile_rules_with_positions(self):
+        issues = issue_scanner.check_styles(STYLESHEET, 'site.css', [(0, STYLESHEET, '')])
+        self.assertEqual([(issue['rule'], issue['line'], issue['match']) for issue in issues], [
+            ('mobile-small-font', 4, '.nav a, .logo { font-size: 14px }'),
+            ('mobile-fixed-height', 5, '.b { min-height: 60px }'),
+            ('rep-team-pointer-events', 8, '.rep-team-box { pointer-events: none }'),
+        ])
+
+    def test_inline_style_offsets(self):
+        page = '<html>\n<head>\n<style media="screen and (max-width: 480px)">\nh1 {\n  font-size: 0.75rem;\n}\n</style>'
+        issues = issue_scanner.check_styles(page, 'index.html', css_tools.inline_styles(page))
+        self.assertEqual([(issue['rule'], issue['line'], issue['column']) for issue in issues],
+                         [('mobile-small-font', 5, 3)])
+
+    def test_length_px(self):
+        self.assertEqual(issue_scanner.length_px('14px'), 14.0)
+        self.assertEqual(issue_scanner.length_px('0.75rem'), 12.0)
+        self.assertIsNone(issue_scanner.length_px('1em'))
+        self.assertIsNone(issue_scanner.length_px('calc(1rem + 2px)'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Writes skip unchanged content and only print diffs in dry-run mode."""
+
+import contextlib
+import io
+import os
+import unittest
+
+import file_writes
+from support import SiteTestCase
+
+
+class FileWritesTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.page = self.write('index.html', '<h1>Home</h1>\n')
+        os.utime(self.page, (1_000_000_000, 1_000_000_000))
+
+    def dry_run(self, action):
+        """Run an action in dry-run mode and return (its result, what it printed)."""
+        file_writes.set_dry_run(True)
+        self.addCleanup(file_writes.set_dry_run, False)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = action()
+        return result, output.getvalue()
+
+    def test_unchanged_content_is_not_rewritten(self):
+        self.assertFalse(file_writes.write_text(self.page, '<h1>Home</h1>\n'))
+        self.assertEqual(self.page.stat().st_mtime, 1_000_000_000)
+
+    def test_changed_content_is_written_without_leftovers(self):
+        self.assertTrue(file_writes.write_text(self.page, '<h1>Welcome</h1>\n'))
+        self.assertEqual(self.page.read_text(encoding='utf-8'), '<h1>Welcome</h1>\n')
+        self.assertNotEqual(self.page.stat().st_mtime, 1_000_000_000)
+        self.assertEqual(sorted(path.name for path in self.site_dir.iterdir()), ['index.html'])
+
+    def test_new_files_get_their_directories(self):
+        self.assertTrue(file_writes.write_bytes(self.site_dir / 'css' / 'site.css', b'h1 {}'))
+        self.assertEqual((self.site_dir / 'css' / 'site.css').read_bytes(), b'h1 {}')
+
+    def test_copy_keeps_the_source_modification_time(self):
+        target = self.site_dir / 'dist' / 'index.html'
+        self.assertTrue(file_writes.copy_file(self.page, target))
+        self.assertEqual(target.stat().st_mtime, 1_000_000_000)
+        self.assertFalse(file_writes.copy_file(self.page, target))
+
+    def test_dry_run_prints_a_diff_and_writes_nothing(self):
+        changed, output = self.dry_run(lambda: file_writes.write_text(self.page, '<h1>Welcome</h1>\n'))
+        self.assertTrue(changed)
+        self.assertIn('-<h1>Home</h1>', output)
+        self.assertIn('+<h1>Welcome</h1>', output)
+        self.assertEqual(self.page.read_text(encoding='utf-8'), '<h1>Home</h1>\n')
+
+    def test_dry_run_of_unchanged_content_is_silent(self):
+        changed, output = self.dry_run(lambda: file_writes.write_text(self.page, '<h1>Home</h1>\n'))
+        self.assertFalse(changed)
+        self.assertEqual(output, '')
+
+    def test_dry_run_of_a_new_file(self):
+        target = self.site_dir / 'about.html'
+        changed, output = self.dry_run(lambda: file_writes.write_text(target, 'About'))
+        self.assertTrue(changed)
+        self.assertIn('--- /dev/null', output)
+        self.assertIn('\\ No newline at end of file', output)
+        self.assertFalse(target.exists())
+
+    def test_dry_run_of_binary_content(self):
+        target = self.site_dir / 'image.png'
+        changed, output = self.dry_run(lambda: file_writes.write_bytes(target, b'\x89PNG\xff'))
+        self.assertTrue(changed)
+        self.assertIn('Binary file', output)
+        self.assertFalse(target.exists())
+
+    def test_replace_file(self):
+        same = self.write('same.tmp', '<h1>Home</h1>\n')
+        self.assertFalse(file_writes.replace_file(same, self.page))
+        self.assertFalse(same.exists())
+        self.assertEqual(self.page.stat().st_mtime, 1_000_000_000)
+
+        different = self.write('different.tmp', '<h1>Welcome</h1>\n')
+        self.assertTrue(file_writes.replace_file(different, self.page))
+        self.assertFalse(different.exists())
+        self.assertEqual(self.page.read_text(encoding='utf-8'), '<h1>Welcome</h1>\n')
+
+    def test_dry_run_replace_drops_the_temp_file_only(self):
+        temp = self.write('page.tmp', '<h1>Welcome</h1>\n')
+        changed, output = self.dry_run(lambda: file_writes.replace_file(temp, self.page))
+        self.assertTrue(changed)
+        self.assertIn('+<h1>Welcome</h1>', output)
+        self.assertFalse(temp.exists())
+        self.assertEqual(self.page.read_text(encoding='utf-8'), '<h1>Home</h1>\n')
+
+    def test_remove_file(self):
+        changed, output = self.dry_run(lambda: file_writes.remove_file(self.page))
+        self.assertTrue(changed)
+        self.assertIn('Would delete', output)
+        self.assertTrue(self.page.exists())
+
+        file_writes.set_dry_run(False)
+        self.assertTrue(file_writes.remove_file(self.page))
+        self.assertFalse(self.page.exists())
+        self.assertFalse(file_writes.remove_file(self.page))
+
+
+if __name__ == '__main__':
+    unittest.main()
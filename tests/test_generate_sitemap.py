@@ -0,0 +1,35 @@
+"""The sitemap.html the template renders is the page the generator always wrote."""
+
+import re
+import unittest
+
+import generate_sitemap
+from support import SiteTestCase
+from templates import Environment
+
+CATEGORY = re.compile(r'<!-- (.*?) -->(.*?)</ul>', re.DOTALL)
+
+
+class HtmlSitemapTest(SiteTestCase):
+
+    def test_rendered_sitemap_matches_the_committed_page(self):
+        env = Environment(cache_dir=self.cache_dir / 'templates')
+        committed = (generate_sitemap.CURRENT_DIR / 'sitemap.html').read_text(encoding='utf-8')
+        last_updated = re.search(r'Last Updated: (.*?)</p>', committed).group(1)
+
+        # The same listing, in the same order, rendered again
+        categories = []
+        for match in CATEGORY.finditer(committed):
+            name = match.group(1)
+            pages = [{'html': generate_sitemap.render_page_link(
+                         filename, generate_sitemap.PAGE_CONFIG.get(filename, generate_sitemap.DEFAULT_CONFIG), env)}
+                     for filename in re.findall(r'<a href="([^"]+)"', match.group(2))]
+            categories.append({'name': name, 'icon': generate_sitemap.CATEGORY_INFO[name], 'pages': pages})
+        entries = [page for category in categories for page in category['pages']]
+
+        self.assertIn('Programs & Training', [category['name'] for category in categories])
+        self.assertEqual(generate_sitemap.render_html_sitemap(entries, categories, last_updated, env), committed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""The script checks work on tokens, so strings and comments cannot fool them."""
+
+import unittest
+
+import js_tools
+
+
+def rules(source):
+    return [finding['rule'] for finding in js_tools.lint_script(source)]
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_division_and_regex_literals(self):
+        tokens = js_tools.tokenize("a = b / c / d; x = /re\\/g/.test(y); `t${1}`")
+        self.assertEqual([kind for kind, text, _ in tokens if text.startswith(('/', '`'))],
+                         ['punct', 'punct', 'regex', 'template'])
+
+    def test_comments_are_dropped(self):
+        tokens = js_tools.tokenize("a(); // b()\n/* c() */ d();")
+        self.assertEqual([text for kind, text, _ in tokens if kind == 'name'], ['a', 'd'])
+
+    def test_inline_scripts_skip_external_and_data_blocks(self):
+        html = ('<script>a()</script><script src="x.js"></script>'
+                '<script type="application/ld+json">{}</script><script type="module">b()</script>')
+        self.assertEqual([source for _, source in js_tools.inline_scripts(html)], ['a()', 'b()'])
+
+
+class ListenerTest(unittest.TestCase):
+
+    def test_touch_listeners_need_passive(self):
+        findings = js_tools.lint_script(
+            "el.addEventListener('touchstart', onTouch);\n"
+            "el.addEventListener('wheel', f, {passive: true});\n"
+            "el.addEventListener('touchmove', f, {capture: true});\n"
+            "el.addEventListener('scroll', f, opts);")
+        self.assertEqual([finding['match'] for finding in findings],
+                         ["addEventListener('touchstart', onTouch)",
+                          "addEventListener('touchmove', f, {capture: true})"])
+        self.assertEqual({finding['rule'] for finding in findings}, {'non-passive-touch-listener'})
+
+    def test_scroll_listener_without_passive(self):
+        self.assertEqual(rules("window.addEventListener('scroll', () => {}, false);"),
+                         ['non-passive-scroll-listener'])
+
+    def test_scroll_handler_doing_dom_work(self):
+        source = ("function onScroll() { header.classList.toggle('small', window.scrollY > 10); }\n"
+                  "window.addEventListener('scroll', onScroll, {passive: true});")
+        self.assertEqual(rules(source), ['unthrottled-scroll-handler'])
+
+    def test_throttled_and_once_handlers_pass(self):
+        self.assertEqual(rules("window.addEventListener('resize', () => requestAnimationFrame(layout));\n"
+                               "window.addEventListener('resize', throttle(onScroll, 100));\n"
+                               "window.addEventListener('resize', () => el.remove(), {once: true});"), [])
+
+    def test_calls_in_strings_and_comments_are_ignored(self):
+        self.assertEqual(rules("const s = 'el.addEventListener(\"touchstart\", f)';\n"
+                               "// el.addEventListener('touchmove', f)\n"
+                               "const r = /addEventListener('wheel'/g;"), [])
+
+
+class LayoutTest(unittest.TestCase):
+
+    def test_read_after_write(self):
+        findings = js_tools.lint_script(
+            "function grow(el) { el.style.height = el.offsetHeight + 10 + 'px'; const h = el.offsetWidth; }")
+        self.assertEqual([finding['match'] for finding in findings], ['offsetWidth read after style.height write'])
+
+    def test_read_before_write_passes(self):
+        self.assertEqual(rules("function measure(el) { const h = el.offsetHeight; el.style.height = h + 'px'; }"), [])
+
+    def test_read_before_write_in_a_loop(self):
+        findings = js_tools.lint_script(
+            "for (const item of items) { total += item.offsetWidth; item.style.width = total + 'px'; }")
+        self.assertEqual([finding['match'] for finding in findings],
+                         ['offsetWidth read in a for loop that also does style.width'])
+
+    def test_writes_to_detached_elements_pass(self):
+        self.assertEqual(rules("function make() { const d = document.createElement('div');"
+                               " d.style.width = '1px'; return d.offsetWidth; }"), [])
+
+    def test_functions_are_separate_scopes(self):
+        self.assertEqual(rules("function a(el) { el.style.width = '1px'; }\n"
+                               "function b(el) { return el.offsetWidth; }"), [])
+
+
+class DomInLoopTest(unittest.TestCase):
+
+    def test_created_in_a_loop(self):
+        findings = js_tools.lint_script(
+            "items.forEach(item => { const li = document.createElement('li');"
+            " li.textContent = item; list.appendChild(li); });")
+        self.assertEqual([finding['match'] for finding in findings], ['createElement() inside a .forEach() loop'])
+
+    def test_reported_once_for_nested_loops(self):
+        source = ("for (const row of rows) { for (const cell of row) {"
+                  " table.append(document.createElement('td')); } }")
+        self.assertEqual(rules(source), ['dom-in-loop'])
+
+    def test_created_outside_the_loop_passes(self):
+        self.assertEqual(rules("const frag = document.createDocumentFragment();"
+                               " for (let i = 0; i < 3; i++) { frag.append(i); }"), [])
+
+
+class InjectedElementsTest(unittest.TestCase):
+
+    def test_inserted_links_and_scripts(self):
+        elements = js_tools.injected_elements(
+            "const font = 'inter'; const l = document.createElement('link'); l.rel = 'preload';"
+            " l.href = `/fonts/${font}.woff2`; document.head.appendChild(l);\n"
+            "['a.js', 'b.js'].forEach(src => { const s = document.createElement('script');"
+            " s.src = src; document.body.append(s); });\n"
+            "const x = document.createElement('link'); x.href = 'never.css';")
+        self.assertEqual([(element['tag'], element['attributes']) for element in elements], [
+            ('link', {'rel': ['preload'], 'href': ['/fonts/inter.woff2']}),
+            ('script', {'src': ['a.js', 'b.js']}),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
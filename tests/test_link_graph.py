@@ -0,0 +1,84 @@
+"""Sitemap priorities follow the link-graph ranks at one decimal."""
+
+import unittest
+
+import link_graph
+from support import SiteTestCase
+
+NAV_PAGES = ['about.html', 'events.html', 'gallery.html', 'registration.html']
+
+
+def page(links):
+    """A page whose body links to the given pages, in order."""
+    anchors = ''.join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<!DOCTYPE html><html><body><nav>{anchors}</nav></body></html>"
+
+
+class PagePrioritiesTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Every page shares the navigation; the homepage also promotes
+        # registration three times, events twice and the gallery once
+        nav = ['index.html'] + NAV_PAGES
+        self.write_page('index.html', nav + ['registration.html'] * 2 + ['events.html'] + ['flyer.html'])
+        for name in NAV_PAGES:
+            self.write_page(name, nav)
+        self.write_page('flyer.html', [])
+
+    def write_page(self, name, links):
+        self.write(name, page(links))
+
+    def priorities(self):
+        return link_graph.page_priorities(link_graph.crawl_site(self.site_dir, cache_dir=self.cache_dir))
+
+    def test_priorities_follow_the_ranks(self):
+        graph = link_graph.crawl_site(self.site_dir, cache_dir=self.cache_dir)
+        ranks = link_graph.page_ranks(graph)
+        priorities = link_graph.page_priorities(graph)
+
+        self.assertEqual(priorities['index.html'], '1.0')
+        self.assertEqual(priorities['registration.html'], '0.9')
+        by_rank = sorted((page for page in ranks if page != 'index.html'), key=ranks.get, reverse=True)
+        values = [float(priorities[page]) for page in by_rank]
+        self.assertEqual(values, sorted(values, reverse=True))
+        self.assertLess(values[-1], values[0])
+        self.assertTrue(all(0.1 <= value <= 0.9 for value in values))
+
+    def test_equally_linked_pages_share_a_priority(self):
+        priorities = self.priorities()
+
+        self.assertEqual(priorities['about.html'], priorities['gallery.html'])
+
+    def test_nearly_equal_ranks_share_a_priority(self):
+        # On the site every page is in the navigation; about.html scores a
+        # little lower than the program pages but is just as prominent
+        graph = link_graph.crawl_site(link_graph.SITE_DIR, cache_dir=self.cache_dir)
+        ranks = link_graph.page_ranks(graph)
+        priorities = link_graph.page_priorities(graph)
+
+        self.assertNotEqual(ranks['about.html'], ranks['development.html'])
+        self.assertEqual(priorities['about.html'], priorities['development.html'])
+
+    def test_an_unrelated_page_leaves_the_other_priorities_alone(self):
+        before = self.priorities()
+        self.write_page('flyer.html', ['news.html'])
+        self.write_page('news.html', [])
+        after = self.priorities()
+
+        self.assertIn('news.html', after)
+        del after['news.html']
+        self.assertEqual(after, before)
+
+    def test_unranked_pages_do_not_change_the_priorities(self):
+        before = self.priorities()
+        self.write_page('sitemap.html', ['index.html', 'flyer.html'] + NAV_PAGES)
+        self.write_page('index-ultra-mobile.html', ['flyer.html'] * 5)
+        after = self.priorities()
+
+        self.assertEqual(after, before)
+        self.assertNotIn('sitemap.html', after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""The load generator's histograms and its replay of page views."""
+
+import argparse
+import asyncio
+import random
+import unittest
+
+import load_test
+import serve_site
+from support import SiteTestCase
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets_hold_values_within_one_percent(self):
+        histogram = load_test.Histogram()
+        previous = -1
+        for value in list(range(0, 300)) + [1000, 4095, 4096, 123456, 10 ** 9]:
+            index = histogram.bucket(value)
+            upper = histogram.bucket_value(index)
+            self.assertGreaterEqual(index, previous)
+            self.assertLessEqual(value, upper)
+            self.assertLessEqual(upper - value, max(1, value) * 0.01)
+            previous = index
+
+    def test_small_values_are_exact(self):
+        histogram = load_test.Histogram()
+        for value in range(128):
+            self.assertEqual(histogram.bucket_value(histogram.bucket(value)), value)
+
+    def test_percentiles_match_the_samples(self):
+        histogram = load_test.Histogram()
+        rng = random.Random(7)
+        samples = sorted(int(rng.lognormvariate(8, 1.5)) for _ in range(20000))
+        for sample in samples:
+            histogram.record(sample)
+
+        for percent in load_test.PERCENTILES:
+            exact = samples[round(len(samples) * percent / 100.0) - 1]
+            self.assertAlmostEqual(histogram.percentile(percent), exact, delta=exact * 0.01 + 1)
+        summary = histogram.summary()
+        self.assertEqual((summary['count'], summary['min'], summary['max']), (len(samples), samples[0], samples[-1]))
+        self.assertEqual(sum(count for _, count in histogram.buckets()), len(samples))
+
+    def test_empty_histogram(self):
+        self.assertEqual(load_test.Histogram().summary(),
+                         {'count': 0, 'min': 0, 'mean': 0, 'max': 0, 'p50': 0, 'p95': 0, 'p99': 0})
+
+
+class ReplayTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('index.html', '<!DOCTYPE html><title>Home</title>')
+        self.write('styles.css', 'body { color: red; }')
+        self.views = {'index.html': {'paths': ['/index.html', '/styles.css'], 'weight': 1.0}}
+
+    def run_load(self, **options):
+        settings = argparse.Namespace(concurrency=2, connections=2, keepalive=True, warm=False, encoding=None,
+                                      views=10, duration=None, seed=1)
+        for name, value in options.items():
+            setattr(settings, name, value)
+
+        async def run():
+            server = await serve_site.start_server(self.site_dir, port=0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                return await load_test.run_load('127.0.0.1', port, self.views, settings)
+        return asyncio.run(run())
+
+    def test_every_view_fetches_the_page_and_its_resources(self):
+        stats = self.run_load()
+        size = sum((self.site_dir / name).stat().st_size for name in ('index.html', 'styles.css'))
+
+        self.assertEqual((stats['views'], stats['requests'], stats['errors']), (10, 20, {}))
+        self.assertEqual(stats['status'], {200: 20})
+        self.assertEqual(stats['view_bytes'].summary()['max'], size)
+        self.assertEqual(stats['request_latency'].total, 20)
+
+    def test_warm_users_revalidate(self):
+        stats = self.run_load(concurrency=1, keepalive=False, warm=True, views=3)
+
+        self.assertEqual(stats['status'], {200: 2, 304: 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""How page_resources resolves what a page downloads."""
+
+import unittest
+
+import load_simulator
+from page_resources import page_resources
+from support import SiteTestCase
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<link rel="icon" type="image/png" href="images/logo.png">
+<link rel="apple-touch-icon" href="images/touch.png">
+</head>
+<body>
+<nav><img src="images/logo.png" alt="Wizards"></nav>
+</body>
+</html>
+"""
+
+
+class SharedIconTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        (self.site_dir / 'images').mkdir()
+        (self.site_dir / 'images' / 'logo.png').write_bytes(b'\x89PNG' + bytes(5000))
+        (self.site_dir / 'images' / 'touch.png').write_bytes(b'\x89PNG' + bytes(3000))
+        self.write('page.html', PAGE)
+
+    def test_favicon_that_is_also_an_img_is_listed_as_the_img(self):
+        resources = [resource for resource in page_resources(self.site_dir, 'page.html')
+                     if resource['url'] == 'images/logo.png']
+
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(resources[0]['via'], 'img')
+        self.assertEqual(resources[0]['line'], 8)
+
+    def test_simulator_loads_the_img_but_not_the_icon_only_file(self):
+        requests, _, _ = load_simulator.page_requests(self.site_dir, 'page.html', encoding='gzip')
+        urls = [request['url'] for request in requests]
+
+        self.assertIn('images/logo.png', urls)
+        self.assertNotIn('images/touch.png', urls)
+
+
+class StylesheetOutsideSiteTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.root = self.site_dir / 'site'
+        self.write('shared.css', 'body { background: url(bg.png); }')
+        self.write('site/bg.png', 'png')
+
+    def urls(self, link):
+        self.write('site/page.html', f'<html><head>{link}</head><body></body></html>')
+        return [resource['url'] for resource in page_resources(self.root, 'page.html')]
+
+    def test_stylesheet_past_the_site_root_is_listed_without_its_references(self):
+        self.assertEqual(self.urls('<link rel="stylesheet" href="../shared.css">'), ['page.html', '../shared.css'])
+
+    def test_symlinked_stylesheet_is_followed(self):
+        (self.root / 'linked.css').symlink_to(self.site_dir / 'shared.css')
+
+        self.assertEqual(self.urls('<link rel="stylesheet" href="linked.css">'), ['page.html', 'linked.css', 'bg.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
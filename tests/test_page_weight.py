@@ -0,0 +1,55 @@
+"""Regressions are caught against the previous run even while a page is over budget."""
+
+import os
+import unittest
+
+import page_weight
+from support import SiteTestCase
+
+PAGE = '<!DOCTYPE html><html><head><title>Wizards</title></head><body><img src="logo.png" alt=""></body></html>'
+
+
+class RegressionTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.history = self.cache_dir / 'page-weight-history.json'
+        self.write('page.html', PAGE)
+
+    def run_with_logo(self, size):
+        # Random bytes do not compress, so the gzipped weight follows the size
+        (self.site_dir / 'logo.png').write_bytes(b'\x89PNG' + os.urandom(size))
+        return page_weight.benchmark(self.site_dir, ['page.html'], self.history)
+
+    def test_heavier_run_after_a_failing_one_is_a_regression(self):
+        first = self.run_with_logo(600000)
+        second = self.run_with_logo(700000)
+
+        self.assertTrue(first['over_budget'])
+        self.assertIsNone(first['previous'])
+        self.assertEqual(second['previous']['pages'], first['results'])
+        self.assertTrue(any(failure.startswith('page.html: total_gzip_bytes grew')
+                            for failure in second['regressions']))
+
+    def test_unchanged_run_over_budget_has_no_regressions(self):
+        self.run_with_logo(600000)
+        page_weight.benchmark(self.site_dir, ['page.html'], self.history)
+        run = page_weight.benchmark(self.site_dir, ['page.html'], self.history)
+
+        self.assertTrue(run['over_budget'])
+        self.assertEqual(run['regressions'], [])
+        self.assertEqual(run['recorded'], 3)
+
+    def test_only_runs_of_the_same_pages_are_compared(self):
+        self.write('other.html', PAGE)
+        self.run_with_logo(600000)
+        page_weight.benchmark(self.site_dir, ['page.html', 'other.html'], self.history)
+
+        run = self.run_with_logo(700000)
+
+        self.assertEqual(set(run['previous']['pages']), {'page.html'})
+        self.assertTrue(run['regressions'])
+
+
+if __name__ == '__main__':
+    unittest.main()
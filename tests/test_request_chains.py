@@ -0,0 +1,105 @@
+"""Request chains follow what a page pulls in before its first paint."""
+
+import unittest
+
+import request_chains
+from support import SiteTestCase
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<link rel="stylesheet" href="small.css">
+<link rel="stylesheet" href="big.css">
+<script src="app.js"></script>
+<script defer src="late.js"></script>
+<script>
+const l = document.createElement('link'); l.rel = 'stylesheet'; l.href = 'extra.css'; document.head.appendChild(l);
+</script>
+</head>
+<body><h1>Wizards</h1></body>
+</html>
+"""
+
+
+class RequestChainTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('page.html', PAGE)
+        self.write('small.css', '@import "base.css";\n@font-face { font-family: Body; src: url(fonts/body.woff2); }\n'
+                                'h1 { font-family: Body; }\n')
+        self.write('base.css', 'body { margin: 0 }')
+        # Distinct colours, so the stylesheet stays too big to inline once gzipped
+        self.write('big.css', ''.join(f'.c{i} {{ color: #{i * 7919 % 16777216:06x}; }}\n' for i in range(3000)))
+        self.write('app.js', "const s = document.createElement('script'); s.src = 'chunk.js'; document.body.append(s);")
+        self.write('late.js', '')
+        self.write('extra.css', 'p {}')
+        self.write('chunk.js', '')
+        self.write('fonts/body.woff2', 'wOF2')
+
+    def entries(self, chain):
+        return [(entry['url'], entry['depth'], entry['action']) for entry in chain['entries']]
+
+    def test_entries_in_tree_order_with_actions(self):
+        chain = request_chains.request_chain(self.site_dir, 'page.html')
+        self.assertEqual(self.entries(chain), [
+            ('page.html', 0, None),
+            ('small.css', 1, 'inline'),
+            ('base.css', 2, 'preload'),
+            ('fonts/body.woff2', 2, 'preload'),
+            ('big.css', 1, 'defer'),
+            ('app.js', 1, 'defer'),
+            ('chunk.js', 2, 'preload'),
+            ('extra.css', 1, 'preload'),
+        ])
+        self.assertEqual(chain['depth'], 2)
+
+    def test_blocking_totals_count_the_page_but_not_late_requests(self):
+        chain = request_chains.request_chain(self.site_dir, 'page.html')
+        blocking = [entry['url'] for entry in chain['entries'] if entry['blocking']]
+        self.assertEqual(blocking, ['page.html', 'small.css', 'base.css', 'big.css', 'app.js'])
+        self.assertEqual(chain['blocking_requests'], 4)
+        self.assertEqual(chain['blocking_bytes'],
+                         sum((self.site_dir / name).stat().st_size for name in blocking))
+
+    def test_injected_entries_point_at_their_script(self):
+        chain = request_chains.request_chain(self.site_dir, 'page.html')
+        injected = {entry['url']: entry for entry in chain['entries'] if entry['via'] == 'injected'}
+        self.assertEqual(injected['chunk.js']['parent'], 'app.js')
+        self.assertIsNone(injected['extra.css']['parent'])
+        self.assertEqual(injected['extra.css']['line'], 9)
+
+    def test_preloads_are_found_with_the_page(self):
+        self.write('page.html', PAGE.replace(
+            '<head>\n', '<head>\n<link rel="preload" href="base.css" as="style">\n'
+                        '<link rel="preload" href="fonts/body.woff2" as="font" crossorigin>\n'
+                        '<link rel="preload" href="chunk.js" as="script">\n'))
+        entries = {entry['url']: entry for entry in request_chains.request_chain(self.site_dir, 'page.html')['entries']}
+        self.assertEqual(entries['base.css']['depth'], 1)
+        self.assertNotIn('fonts/body.woff2', entries)
+        self.assertIsNone(entries['chunk.js']['action'])
+        self.assertEqual(entries['extra.css']['action'], 'preload')
+
+    def test_summarize_chains(self):
+        self.write('other.html', '<html><head><link rel="stylesheet" href="big.css"></head><body></body></html>')
+        chains = [request_chains.request_chain(self.site_dir, name) for name in ('page.html', 'other.html')]
+        summary = request_chains.summarize_chains(chains)
+        self.assertEqual(summary['pages'], 2)
+        self.assertEqual(summary['deepest']['page'], 'page.html')
+        self.assertEqual(summary['blocking_requests'], 5)
+        self.assertEqual(summary['actions'], {'inline': 1, 'preload': 4, 'defer': 3})
+        self.assertEqual(summary['shared_blockers'][0], ('big.css', ['other.html', 'page.html']))
+
+
+class TreeOrderTest(unittest.TestCase):
+
+    def test_children_follow_their_parent_and_orphans_come_last(self):
+        entries = [{'url': 'page.html', 'parent': None}, {'url': 'a.css', 'parent': None},
+                   {'url': 'lost.js', 'parent': 'gone.js'}, {'url': 'b.js', 'parent': None},
+                   {'url': 'c.css', 'parent': 'a.css'}]
+        self.assertEqual([entry['url'] for entry in request_chains.tree_order(entries)],
+                         ['page.html', 'a.css', 'c.css', 'b.js', 'lost.js'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""The local server behaves like the origin: published files, ETags, ranges, encodings."""
+
+import asyncio
+import re
+import unittest
+
+import serve_site
+from support import SiteTestCase
+
+STATUS = re.compile(rb'^HTTP/1\.1 (\d{3})', re.MULTILINE)
+
+
+class ServerTestCase(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('index.html', '<!DOCTYPE html><title>Home</title>')
+        self.write('styles.css', 'body { color: #123456; }\n' * 100)
+
+    def exchange(self, data):
+        """Send raw request bytes on one connection and return everything the server sends back."""
+        async def run():
+            server = await serve_site.start_server(self.site_dir, port=0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(data)
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                return response
+        return asyncio.run(run())
+
+    def get(self, target, **headers):
+        """Status, headers and body of one GET."""
+        lines = [f"GET {target} HTTP/1.1", 'Host: localhost', 'Connection: close']
+        lines += [f"{name.replace('_', '-')}: {value}" for name, value in headers.items()]
+        response = self.exchange(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        head, _, body = response.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        fields = dict(line.split(': ', 1) for line in header_lines)
+        return int(status_line.split()[1]), {name.lower(): value for name, value in fields.items()}, body
+
+
+class PublishedOnlyTest(ServerTestCase):
+
+    def test_private_files_are_not_served(self):
+        self.write('.git/config', '[core]')
+        self.write('.build-cache/render-pages.json', '{}')
+        self.write('.env', 'SECRET=1')
+        self.write('build_site.py', 'print()')
+        self.write('requests.jsonl', '{}')
+        self.write('templates/pages/index.html', '{% block body %}{% endblock %}')
+
+        for target in ['/.git/config', '/.build-cache/render-pages.json', '/.env', '/build_site.py',
+                       '/requests.jsonl', '/templates/pages/index.html', '/images/../.git/config']:
+            with self.subTest(target=target):
+                self.assertEqual(self.get(target)[0], 404)
+
+    def test_published_files_are_served(self):
+        self.write('images/logo.png', 'png')
+        self.write('images/variants/logo-100w.webp', 'webp')
+
+        for target in ['/', '/index.html', '/index', '/styles.css', '/images/logo.png',
+                       '/images/variants/logo-100w.webp']:
+            with self.subTest(target=target):
+                self.assertEqual(self.get(target)[0], 200)
+
+    def test_unsupported_method_body_is_not_read_as_a_request(self):
+        smuggled = b'GET /styles.css HTTP/1.1\r\nHost: localhost\r\n\r\n'
+        response = self.exchange(
+            b'POST /index.html HTTP/1.1\r\nHost: localhost\r\nContent-Length: ' + str(len(smuggled)).encode()
+            + b'\r\n\r\n' + smuggled + b'GET /index.html HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+
+        self.assertEqual(STATUS.findall(response), [b'405', b'200'])
+        self.assertIn(b'<title>Home</title>', response)
+
+    def test_chunked_body_closes_the_connection(self):
+        response = self.exchange(b'POST / HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n\r\n'
+                                 b'5\r\nhello\r\n0\r\n\r\nGET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+
+        self.assertEqual(STATUS.findall(response), [b'405'])
+        self.assertIn(b'Connection: close', response)
+
+
+class HeaderFunctionsTest(unittest.TestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(serve_site.parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(serve_site.parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(serve_site.parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(serve_site.parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(serve_site.parse_range('bytes=1000-', 1000), 'invalid')
+        self.assertEqual(serve_site.parse_range('bytes=-0', 1000), 'invalid')
+        self.assertEqual(serve_site.parse_range('bytes=50-10', 1000), 'invalid')
+        self.assertIsNone(serve_site.parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(serve_site.parse_range('items=0-1', 1000))
+
+    def test_etag_matches(self):
+        self.assertTrue(serve_site.etag_matches('"abc"', '"abc"'))
+        self.assertTrue(serve_site.etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(serve_site.etag_matches('*', '"abc"'))
+        self.assertFalse(serve_site.etag_matches('"abd"', '"abc"'))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(serve_site.accepted_encodings('gzip, br;q=0.8, deflate;q=0'), {'gzip', 'br'})
+        self.assertEqual(serve_site.accepted_encodings(''), set())
+
+
+class ConditionalAndRangeTest(ServerTestCase):
+
+    def test_etag_revalidates_with_304(self):
+        status, headers, body = self.get('/styles.css')
+        self.assertEqual(status, 200)
+
+        status, again, body = self.get('/styles.css', If_None_Match=headers['etag'])
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(again['etag'], headers['etag'])
+
+        self.write('styles.css', 'body { color: red; }')
+        self.assertEqual(self.get('/styles.css', If_None_Match=headers['etag'])[0], 200)
+
+    def test_range_request(self):
+        content = (self.site_dir / 'styles.css').read_bytes()
+
+        status, headers, body = self.get('/styles.css', Range='bytes=10-19')
+        self.assertEqual(status, 206)
+        self.assertEqual(body, content[10:20])
+        self.assertEqual(headers['content-range'], f'bytes 10-19/{len(content)}')
+
+        status, headers, _ = self.get('/styles.css', Range=f'bytes={len(content)}-')
+        self.assertEqual(status, 416)
+        self.assertEqual(headers['content-range'], f'bytes */{len(content)}')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        status, _, body = self.get('/styles.css', Range='bytes=0-9', If_Range='"stale"')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, (self.site_dir / 'styles.css').read_bytes())
+
+    def test_precompressed_file_is_negotiated(self):
+        self.write('styles.css.gz', 'gzipped')
+
+        status, headers, body = self.get('/styles.css', Accept_Encoding='gzip')
+        self.assertEqual((status, headers['content-encoding'], body), (200, 'gzip', b'gzipped'))
+        self.assertEqual(headers['vary'], 'Accept-Encoding')
+        self.assertNotIn('content-encoding', self.get('/styles.css')[1])
+
+    def test_traversal_is_refused(self):
+        outside = self.site_dir.parent / f"{self.site_dir.name}-outside.html"
+        outside.write_text('outside', encoding='utf-8')
+        self.addCleanup(outside.unlink, missing_ok=True)
+
+        for target in [f'/../{outside.name}', f'/%2e%2e/{outside.name}', f'/images/%2e%2e/..%2f{outside.name}']:
+            with self.subTest(target=target):
+                self.assertEqual(self.get(target)[0], 404)
+
+    def test_cache_control_per_asset_type(self):
+        self.write('images/logo.png', 'png')
+        self.write('app.0123456789.js', 'js')
+
+        self.assertEqual(self.get('/index.html')[1]['cache-control'], 'no-cache')
+        self.assertEqual(self.get('/images/logo.png')[1]['cache-control'], 'public, max-age=86400')
+        self.assertEqual(self.get('/styles.css')[1]['cache-control'], 'public, max-age=3600')
+        self.assertEqual(self.get('/app.0123456789.js')[1]['cache-control'], serve_site.IMMUTABLE)
+
+
+if __name__ == '__main__':
+    unittest.main()
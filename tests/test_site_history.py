@@ -0,0 +1,93 @@
+"""Page lastmod dates come from one git history walk, cached per HEAD."""
+
+import os
+import shutil
+import subprocess
+import unittest
+
+import site_history
+from build_cache import load_manifest, save_manifest
+from support import SiteTestCase
+
+
+@unittest.skipUnless(shutil.which('git'), 'git is not installed')
+class GitHistoryTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.git('init', '-q')
+        self.commit('2024-01-01', {'a.html': 'A', 'b.html': 'B'})
+        self.commit('2024-02-01', {'b.html': 'B2', 'notes.txt': 'notes'})
+        self.commit('2024-03-01', {'a.html': 'A2'})
+
+    def git(self, *args, date=None):
+        env = dict(os.environ, GIT_AUTHOR_NAME='Test', GIT_AUTHOR_EMAIL='test@example.com',
+                   GIT_COMMITTER_NAME='Test', GIT_COMMITTER_EMAIL='test@example.com')
+        if date:
+            env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = f"{date}T12:00:00+00:00"
+        subprocess.run(['git', '-C', str(self.site_dir)] + list(args), env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def commit(self, date, files):
+        for name, text in files.items():
+            self.write(name, text)
+        self.git('add', *files)
+        self.git('commit', '-q', '-m', f"Edit on {date}", date=date)
+
+    def lastmod(self, *names):
+        return site_history.resolve_lastmod(self.site_dir, list(names), cache_dir=self.cache_dir)
+
+    def test_one_walk_finds_each_page_s_last_commit(self):
+        dates = site_history.git_commit_dates(self.site_dir, ['a.html', 'b.html', 'missing.html'])
+        self.assertEqual(dates, {'a.html': '2024-03-01', 'b.html': '2024-02-01'})
+
+    def test_dirty_files(self):
+        self.write('b.html', 'B3')
+        self.assertEqual(site_history.git_dirty_files(self.site_dir, ['a.html', 'b.html']), {'b.html'})
+
+    def test_resolve_from_history(self):
+        self.assertEqual(self.lastmod('a.html', 'b.html'), {'a.html': '2024-03-01', 'b.html': '2024-02-01'})
+        pages = load_manifest(site_history.MANIFEST_NAME, self.cache_dir)['pages']
+        self.assertEqual(pages['a.html']['head'], site_history.git_head(self.site_dir))
+
+    def test_cached_dates_are_used_while_head_and_content_stay(self):
+        self.lastmod('a.html')
+        manifest = load_manifest(site_history.MANIFEST_NAME, self.cache_dir)
+        manifest['pages']['a.html']['date'] = '1999-01-01'
+        save_manifest(site_history.MANIFEST_NAME, manifest, self.cache_dir)
+
+        self.assertEqual(self.lastmod('a.html'), {'a.html': '1999-01-01'})
+
+        self.commit('2024-04-01', {'b.html': 'B3'})
+        self.assertEqual(self.lastmod('a.html'), {'a.html': '2024-03-01'})
+
+    def test_uncommitted_edits_date_from_when_the_content_changed(self):
+        self.lastmod('a.html')
+        self.write('a.html', 'A3')
+        self.assertEqual(self.lastmod('a.html'), {'a.html': site_history.today()})
+
+    def test_untracked_pages_use_their_mtime_the_first_time(self):
+        page = self.write('new.html', 'N')
+        os.utime(page, (1_700_000_000, 1_700_000_000))
+        self.assertEqual(self.lastmod('new.html'), {'new.html': site_history.mtime_date(page)})
+
+
+class NoGitTest(SiteTestCase):
+
+    def test_dates_without_history(self):
+        page = self.write('a.html', 'A')
+        os.utime(page, (1_700_000_000, 1_700_000_000))
+        first = site_history.resolve_lastmod(self.site_dir, ['a.html'], use_git=False, cache_dir=self.cache_dir)
+        self.assertEqual(first, {'a.html': site_history.mtime_date(page)})
+
+        os.utime(page, (1_800_000_000, 1_800_000_000))
+        again = site_history.resolve_lastmod(self.site_dir, ['a.html'], use_git=False, cache_dir=self.cache_dir)
+        self.assertEqual(again, first)
+
+        self.write('a.html', 'A2')
+        changed = site_history.resolve_lastmod(self.site_dir, ['a.html'], use_git=False, cache_dir=self.cache_dir)
+        self.assertEqual(changed, {'a.html': site_history.today()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Snapshots record the site files and roll them back."""
+
+import unittest
+
+import site_snapshots
+from file_writes import set_dry_run
+from support import SiteTestCase
+
+
+class SnapshotTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('index.html', '<h1>Home</h1>\n')
+        self.write('style.css', 'h1 { color: red; }\n')
+        self.write('templates/pages/index.html', '{% block body %}Home{% endblock %}\n')
+        self.write('notes.md', 'not tracked\n')
+        self.snapshot, self.created = site_snapshots.take_snapshot('first', self.site_dir)
+
+    def read(self, name):
+        return (self.site_dir / name).read_text(encoding='utf-8')
+
+    def test_snapshot_covers_the_tracked_files(self):
+        self.assertTrue(self.created)
+        self.assertEqual(sorted(self.snapshot['files']),
+                         ['index.html', 'style.css', 'templates/pages/index.html'])
+        self.assertEqual(site_snapshots.read_blob(self.snapshot['files']['style.css'], self.site_dir),
+                         b'h1 { color: red; }\n')
+
+    def test_unchanged_files_add_no_snapshot(self):
+        snapshot, created = site_snapshots.take_snapshot('again', self.site_dir)
+        self.assertFalse(created)
+        self.assertEqual(snapshot['id'], self.snapshot['id'])
+        self.assertEqual(len(site_snapshots.list_snapshots(self.site_dir)), 1)
+
+    def test_find_snapshot(self):
+        self.assertEqual(site_snapshots.find_snapshot('latest', self.site_dir)['id'], self.snapshot['id'])
+        self.assertEqual(site_snapshots.find_snapshot(self.snapshot['id'][:10], self.site_dir)['id'],
+                         self.snapshot['id'])
+        with self.assertRaises(ValueError):
+            site_snapshots.find_snapshot('nope', self.site_dir)
+
+    def test_changed_files(self):
+        self.write('style.css', 'h1 { color: blue; }\n')
+        self.write('about.html', '<h1>About</h1>\n')
+        (self.site_dir / 'index.html').unlink()
+        added, removed, modified = site_snapshots.changed_files(
+            self.snapshot['files'], site_snapshots.working_files(self.site_dir))
+        self.assertEqual((added, removed, modified), (['about.html'], ['index.html'], ['style.css']))
+
+    def test_rollback_restores_and_snapshots_the_current_state_first(self):
+        self.write('style.css', 'h1 { color: blue; }\n')
+        self.write('about.html', '<h1>About</h1>\n')
+
+        restored, untouched = site_snapshots.rollback(self.snapshot['id'], site_dir=self.site_dir)
+
+        self.assertEqual(restored, ['style.css'])
+        self.assertEqual(untouched, ['about.html'])
+        self.assertEqual(self.read('style.css'), 'h1 { color: red; }\n')
+        latest = site_snapshots.list_snapshots(self.site_dir)[-1]
+        self.assertEqual(latest['message'], f"before rollback to {self.snapshot['id']}")
+        self.assertEqual(site_snapshots.read_blob(latest['files']['style.css'], self.site_dir),
+                         b'h1 { color: blue; }\n')
+
+    def test_rollback_of_named_files_only(self):
+        self.write('style.css', 'h1 { color: blue; }\n')
+        self.write('index.html', '<h1>Changed</h1>\n')
+
+        restored, untouched = site_snapshots.rollback('latest', ['index.html'], self.site_dir)
+
+        self.assertEqual((restored, untouched), (['index.html'], []))
+        self.assertEqual(self.read('index.html'), '<h1>Home</h1>\n')
+        self.assertEqual(self.read('style.css'), 'h1 { color: blue; }\n')
+
+    def test_rollback_of_a_file_not_in_the_snapshot_fails(self):
+        self.write('about.html', '<h1>About</h1>\n')
+        with self.assertRaises(ValueError):
+            site_snapshots.rollback('latest', ['about.html'], self.site_dir)
+        self.assertEqual(len(site_snapshots.list_snapshots(self.site_dir)), 1)
+
+    def test_dry_run_rollback_writes_nothing(self):
+        self.write('style.css', 'h1 { color: blue; }\n')
+        set_dry_run(True)
+        self.addCleanup(set_dry_run, False)
+
+        restored, _ = site_snapshots.rollback('latest', site_dir=self.site_dir)
+
+        self.assertEqual(restored, ['style.css'])
+        self.assertEqual(self.read('style.css'), 'h1 { color: blue; }\n')
+        self.assertEqual(len(site_snapshots.list_snapshots(self.site_dir)), 1)
+
+    def test_import_backups(self):
+        self.write('index.original.html', '<h1>Original</h1>\n')
+
+        snapshot, names = site_snapshots.import_backups(self.site_dir)
+
+        self.assertEqual(names, ['index.original.html'])
+        self.assertFalse((self.site_dir / 'index.original.html').exists())
+        self.assertNotIn('index.original.html', snapshot['files'])
+        self.assertEqual(site_snapshots.read_blob(snapshot['files']['index.html'], self.site_dir),
+                         b'<h1>Original</h1>\n')
+        self.assertEqual(self.read('index.html'), '<h1>Home</h1>\n')
+        self.assertEqual(site_snapshots.import_backups(self.site_dir), (None, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""The maintenance stages edit the page sources in templates/pages/."""
+
+import shutil
+import unittest
+
+import site_pipeline
+from render_pages import render_page
+from support import SiteTestCase
+from templates import TEMPLATE_DIR, Environment
+
+STAGES = site_pipeline.load_stages()
+
+
+def run_stage(stage_name, sources):
+    """Run one stage over {page name: source}, returning the sources it changed."""
+    stage = STAGES[stage_name]
+    changed = {}
+    for name, content in sources.items():
+        if not site_pipeline.applies_to(stage, name):
+            continue
+        page = {'name': name, 'original': content, 'content': content, 'log': [], 'counters': {}, 'context': {}}
+        stage['func'](page)
+        if page['content'] != content:
+            changed[name] = page['content']
+    return changed
+
+
+class PageSourceStagesTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sources = {path.name: path.read_text(encoding='utf-8')
+                        for path in sorted(site_pipeline.PAGE_SOURCE_DIR.glob('*.html'))}
+
+    def rendered(self, name, content):
+        """Render a page from a copy of the templates with one source replaced."""
+        template_dir = self.site_dir / 'templates'
+        shutil.copytree(TEMPLATE_DIR, template_dir)
+        (template_dir / 'pages' / name).write_text(content, encoding='utf-8')
+        return render_page(Environment(template_dir, cache_dir=self.cache_dir / 'templates'), name)
+
+    def test_mobile_optimizations_change_the_sources(self):
+        changed = run_stage('mobile-optimizations', self.sources)
+
+        self.assertIn('about.html', changed)
+        html = self.rendered('about.html', changed['about.html'])
+        script = html.index('mobile-scroll-ultimate.js')
+        self.assertLess(html.index('mobile-scroll-ultimate.css'), html.index('</head>'))
+        self.assertLess(html.index('<body'), script)
+        self.assertLess(script, html.index('</body>'))
+        self.assertEqual(run_stage('mobile-optimizations', changed), {})
+
+    def test_disable_mobile_stars_changes_the_sources(self):
+        changed = run_stage('disable-mobile-stars', self.sources)
+
+        self.assertTrue(changed)
+        name, content = sorted(changed.items())[0]
+        html = self.rendered(name, content)
+        self.assertLess(html.index('DISABLE STARS ON MOBILE'), html.index('</style>\n</head>'))
+        self.assertEqual(run_stage('disable-mobile-stars', changed), {})
+
+    def test_fix_escaped_characters_cleans_a_source(self):
+        broken = self.sources['about.html'].replace('<title>', '\\1<title>', 1)
+
+        changed = run_stage('fix-escaped-characters', {'about.html': broken})
+
+        self.assertEqual(changed, {'about.html': self.sources['about.html']})
+        self.assertEqual(run_stage('fix-escaped-characters', self.sources), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""The sitemap writer shards, gzips and only rewrites what changed."""
+
+import gzip
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+from sitemap_writer import URLSET_CLOSE, URLSET_OPEN, XML_HEADER, SitemapWriter, render_url
+from support import SiteTestCase
+
+NS = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+
+
+class SitemapWriterTest(SiteTestCase):
+
+    def write_sitemaps(self, count, **options):
+        writer = SitemapWriter(self.site_dir, 'https://example.com/', **options)
+        for number in range(1, count + 1):
+            writer.add(f"https://example.com/page-{number}.html?a=1&b=2", f"2024-01-{number:02d}", 'monthly', '0.5')
+        return writer.close()
+
+    def files(self):
+        return sorted(path.name for path in self.site_dir.iterdir() if path.is_file())
+
+    def locs(self, name):
+        root = ET.parse(self.site_dir / name).getroot()
+        return [loc.text for loc in root.iter(f"{{{NS['sm']}}}loc")]
+
+    def test_one_shard_keeps_the_plain_name(self):
+        outputs = self.write_sitemaps(3)
+        self.assertEqual(list(outputs), ['sitemap.xml'])
+        self.assertEqual(self.files(), ['sitemap.xml'])
+        self.assertEqual(self.locs('sitemap.xml')[0], 'https://example.com/page-1.html?a=1&b=2')
+
+    def test_shards_at_the_url_limit_with_an_index(self):
+        outputs = self.write_sitemaps(5, max_urls=2)
+        self.assertEqual(sorted(outputs), ['sitemap-1.xml', 'sitemap-2.xml', 'sitemap-3.xml', 'sitemap_index.xml'])
+        self.assertEqual(self.files(), sorted(outputs))
+        self.assertEqual([len(self.locs(f"sitemap-{number}.xml")) for number in (1, 2, 3)], [2, 2, 1])
+        index = ET.parse(self.site_dir / 'sitemap_index.xml').getroot()
+        self.assertEqual([sitemap.find('sm:loc', NS).text for sitemap in index],
+                         [f"https://example.com/sitemap-{number}.xml" for number in (1, 2, 3)])
+        self.assertEqual([sitemap.find('sm:lastmod', NS).text for sitemap in index],
+                         ['2024-01-02', '2024-01-04', '2024-01-05'])
+
+    def test_shards_at_the_byte_limit(self):
+        entry = render_url('https://example.com/page-1.html?a=1&b=2', '2024-01-01', 'monthly', '0.5')
+        limit = len(XML_HEADER + URLSET_OPEN + URLSET_CLOSE) + 2 * len(entry)
+        self.write_sitemaps(4, max_bytes=limit)
+        for number in (1, 2):
+            path = self.site_dir / f"sitemap-{number}.xml"
+            self.assertEqual(path.stat().st_size, limit)
+            self.assertEqual(len(self.locs(path.name)), 2)
+
+    def test_gzip_copies_match_the_shards(self):
+        outputs = self.write_sitemaps(3, gzip=True, max_urls=2)
+        self.assertEqual(self.files(), ['sitemap-1.xml', 'sitemap-1.xml.gz', 'sitemap-2.xml', 'sitemap-2.xml.gz',
+                                        'sitemap_index.xml'])
+        for number in (1, 2):
+            name = f"sitemap-{number}.xml"
+            self.assertEqual(gzip.decompress((self.site_dir / f"{name}.gz").read_bytes()),
+                             (self.site_dir / name).read_bytes())
+        self.assertIn('https://example.com/sitemap-1.xml.gz', self.locs('sitemap_index.xml'))
+        # Reproducible: the same entries give the same compressed bytes
+        self.assertEqual(self.write_sitemaps(3, gzip=True, max_urls=2), outputs)
+
+    def test_unchanged_sitemaps_keep_their_modification_times(self):
+        self.write_sitemaps(5, max_urls=2, gzip=True)
+        for name in self.files():
+            os.utime(self.site_dir / name, (1_000_000_000, 1_000_000_000))
+        self.write_sitemaps(5, max_urls=2, gzip=True)
+        self.assertEqual({(self.site_dir / name).stat().st_mtime for name in self.files()}, {1_000_000_000})
+
+    def test_stale_shards_are_removed(self):
+        self.write_sitemaps(5, max_urls=2, gzip=True)
+        self.write_sitemaps(2, max_urls=2, gzip=True)
+        self.assertEqual(self.files(), ['sitemap.xml', 'sitemap.xml.gz'])
+
+    def test_empty_site_gets_an_empty_urlset(self):
+        self.write_sitemaps(0)
+        self.assertEqual(self.files(), ['sitemap.xml'])
+        self.assertEqual(self.locs('sitemap.xml'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
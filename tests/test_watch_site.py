@@ -0,0 +1,94 @@
+"""Watch mode finds what an edit affects through the dependency graph."""
+
+import os
+import unittest
+
+import watch_site
+from support import SiteTestCase
+from templates import Environment
+
+PAGE = '<!DOCTYPE html><html><head>{head}</head><body>{body}</body></html>'
+
+
+class DependencyGraphTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('a.html', PAGE.format(head='<link rel="stylesheet" href="style.css">', body=''))
+        self.write('b.html', PAGE.format(head='', body='<img src="images/photo.png" alt="">'))
+        self.write('style.css', '@import "base.css";\nbody { background: url(images/bg.png); }')
+        self.write('base.css', 'h1 { margin: 0; }')
+        self.write('images/bg.png', 'png')
+        self.write('images/photo.png', 'png')
+        self.write('templates/layouts/page.html', '<!DOCTYPE html>{% block body %}{% endblock %}')
+        self.write('templates/pages/c.html', '{% extends "layouts/page.html" %}{% block body %}C{% endblock %}')
+        self.write('c.html', '<!DOCTYPE html>C')
+        self.graph = self.dependency_graph()
+
+    def dependency_graph(self):
+        env = Environment(self.site_dir / 'templates', cache_dir=self.cache_dir / 'templates')
+        graph = watch_site.DependencyGraph(self.site_dir, env)
+        graph.build()
+        return graph
+
+    def test_image_in_a_stylesheet_affects_the_pages_loading_it(self):
+        self.assertEqual(self.graph.dependents({'images/bg.png'}), {'style.css', 'a.html'})
+        self.assertEqual(self.graph.dependents({'images/photo.png'}), {'b.html'})
+
+    def test_imported_stylesheet_affects_the_importers(self):
+        self.assertEqual(self.graph.dependents({'base.css'}), {'style.css', 'a.html'})
+
+    def test_layout_affects_the_pages_rendered_from_it(self):
+        self.assertEqual(self.graph.dependents({'templates/layouts/page.html'}), {'c.html'})
+
+    def test_update_follows_an_edit(self):
+        self.write('a.html', PAGE.format(head='', body=''))
+        self.write('b.html', PAGE.format(head='<link rel="stylesheet" href="style.css">', body=''))
+        for name in ('a.html', 'b.html'):
+            self.graph.update(name)
+
+        self.assertEqual(self.graph.dependents({'style.css'}), {'b.html'})
+        self.assertEqual(self.graph.dependents({'images/photo.png'}), set())
+
+    def test_deleted_file_is_dropped(self):
+        (self.site_dir / 'style.css').unlink()
+        self.graph.update('style.css')
+
+        self.assertNotIn('style.css', self.graph.depends_on)
+        self.assertNotIn('style.css', self.graph.dependents({'base.css', 'images/bg.png'}))
+
+
+class ChangeDetectionTest(SiteTestCase):
+
+    def test_is_watched(self):
+        self.assertTrue(watch_site.is_watched('about.html'))
+        self.assertTrue(watch_site.is_watched('templates/partials/nav.html'))
+        self.assertTrue(watch_site.is_watched('generate_sitemap.py'))
+        self.assertFalse(watch_site.is_watched('tests/test_watch_site.py'))
+        self.assertFalse(watch_site.is_watched('dist/about.html'))
+        self.assertFalse(watch_site.is_watched('.build-cache/render-pages.json'))
+        self.assertFalse(watch_site.is_watched('about.html~'))
+
+    def test_only_real_content_changes_count(self):
+        self.write('a.html', 'one')
+        self.write('b.html', 'two')
+        watcher = watch_site.SiteWatcher(self.site_dir, build=False)
+        watcher.digests = {name: watch_site.file_digest(self.site_dir / name) for name in ('a.html', 'b.html')}
+
+        os.utime(self.site_dir / 'a.html')
+        self.write('b.html', 'three')
+        self.assertEqual(watcher.real_changes({'a.html', 'b.html'}), {'b.html'})
+        self.assertEqual(watcher.real_changes({'b.html'}), set())
+
+    def test_polling_watcher_reports_changed_files(self):
+        self.write('a.html', 'one')
+        watcher = watch_site.PollingWatcher(self.site_dir, interval=0.01)
+
+        self.assertEqual(watcher.poll(0), set())
+        self.write('a.html', 'one more')
+        self.write('new.css', 'a {}')
+        self.assertEqual(watcher.poll(0), {'a.html', 'new.css'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Watch Mode
+Watches the site's pages, stylesheets, scripts, images, templates and Python
+configuration and, after each edit, re-runs only the work that edit affects:
+
+    templates/**            re-render the pages using them (render_pages.py)
+    pages                   issue checks, sitemaps, dist/ build
+    stylesheets / scripts   issue checks, dist/ build for the pages loading them
+    images                  dist/ build for the pages and stylesheets using them
+    generate_sitemap.py     sitemaps (PAGE_CONFIG and friends are reloaded)
+    issue_scanner.py        issue checks of every file (rules are reloaded)
+
+Usage:
+    python3 watch_site.py                 # inotify where available, else polling
+    python3 watch_site.py --poll          # always poll (network drives, containers)
+    python3 watch_site.py --no-build      # skip the dist/ build
+
+Changes are picked up with inotify (through ctypes, Linux only) or by
+polling file modification times, and debounced: a burst of saves such as an
+editor's "save all" or a git checkout is handled as one batch once nothing
+has changed for --debounce seconds. Files whose content did not really
+change (touches, or the outputs written by the previous batch) are ignored.
+
+The dependency graph maps every file to the files that depend on it -
+pages on their templates, stylesheets, scripts and images, stylesheets on
+the images and stylesheets they reference (see page_resources.py) - and is
+updated as pages and stylesheets change. Each step keeps its own caches, so
+a batch costs about as much as the files it touches.
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import importlib
+import io
+import os
+import select
+import struct
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import build_site
+import generate_sitemap
+import issue_scanner
+import render_pages
+from build_cache import file_digest
+from page_resources import css_references, page_resources, resolve_url
+from templates import Environment, TemplateError
+
+check_for_issues = importlib.import_module('check-for-issues')
+
+SITE_DIR = Path(__file__).parent
+TEMPLATE_PREFIX = 'templates/'
+
+WATCHED_SUFFIXES = {
+    '.html', '.css', '.js', '.py', '.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg', '.ico',
+    '.webmanifest', '.txt',
+}
+IGNORED_DIRS = {'dist', '.build-cache', '.git', '__pycache__', 'node_modules'}
+
+# Modules the sitemaps are built with, reloaded in this order when one changes
+SITEMAP_MODULES = ['sitemap_writer', 'site_history', 'link_graph', 'generate_sitemap']
+SITEMAP_TEMPLATES = ['templates/sitemap.html', 'templates/partials/sitemap-link.html']
+
+DEBOUNCE_SECONDS = 0.2
+POLL_INTERVAL = 0.5
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+# Returned by a watcher when it lost track of events and everything must be compared
+RESCAN = '*'
+
+
+def is_watched(relative):
+    """True for files whose changes matter (relative POSIX path)."""
+    parts = relative.split('/')
+    name = parts[-1]
+    if any(part in IGNORED_DIRS for part in parts[:-1]) or name.startswith('.') or name.endswith('~'):
+        return False
+    if name.endswith('.py'):
+        return len(parts) == 1
+    return Path(name).suffix.lower() in WATCHED_SUFFIXES
+
+
+def watched_dirs(site_dir):
+    """The site directory and its subdirectories that can hold watched files."""
+    for root, dirs, _ in os.walk(site_dir):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS and not d.startswith('.'))
+        yield Path(root)
+
+
+def watched_files(site_dir):
+    """Relative paths of every watched file."""
+    site_dir = Path(site_dir)
+    files = []
+    for directory in watched_dirs(site_dir):
+        for path in directory.iterdir():
+            relative = path.relative_to(site_dir).as_posix()
+            if path.is_file() and is_watched(relative):
+                files.append(relative)
+    return sorted(files)
+
+
+class InotifyWatcher:
+    """Change notifications from the Linux kernel, read through ctypes."""
+
+    name = 'inotify'
+
+    def __init__(self, site_dir):
+        self.site_dir = Path(site_dir)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # AttributeError on platforms without inotify
+        self.add_watch_call = libc.inotify_add_watch
+        self.add_watch_call.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directories = {}
+        for directory in watched_dirs(self.site_dir):
+            self.add_watch(directory)
+
+    def add_watch(self, directory):
+        wd = self.add_watch_call(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_add_watch {directory}: {os.strerror(error)}")
+        self.directories[wd] = directory
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds (None: forever) and return the changed paths."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                raw_name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(RESCAN)
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                path = directory / os.fsdecode(raw_name.rstrip(b'\0'))
+                relative = path.relative_to(self.site_dir).as_posix()
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and path.name not in IGNORED_DIRS:
+                        # A new directory may already hold files we missed
+                        for subdirectory in watched_dirs(path):
+                            self.add_watch(subdirectory)
+                        changed.add(RESCAN)
+                    continue
+                if is_watched(relative):
+                    changed.add(relative)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Change detection by comparing modification times and sizes."""
+
+    name = 'polling'
+
+    def __init__(self, site_dir, interval=POLL_INTERVAL):
+        self.site_dir = Path(site_dir)
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self):
+        state = {}
+        for relative in watched_files(self.site_dir):
+            try:
+                stat = (self.site_dir / relative).stat()
+            except OSError:
+                continue
+            state[relative] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds (None: forever) and return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.snapshot()
+            changed = {name for name in set(state) | set(self.state) if state.get(name) != self.state.get(name)}
+            self.state = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+def open_watcher(site_dir, poll=False, interval=POLL_INTERVAL):
+    """inotify where the platform has it, polling otherwise (or when asked)."""
+    if not poll:
+        try:
+            return InotifyWatcher(site_dir)
+        except (OSError, AttributeError) as e:
+            print(f"⚠ inotify unavailable ({e}) - falling back to polling")
+    return PollingWatcher(site_dir, interval)
+
+
+def wait_for_changes(watcher, debounce=DEBOUNCE_SECONDS):
+    """Block until files change, then gather changes until debounce seconds pass quietly."""
+    changed = watcher.poll(None)
+    while True:
+        more = watcher.poll(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+class DependencyGraph:
+    """Which files depend on which: pages on templates and resources, stylesheets on theirs."""
+
+    def __init__(self, site_dir, env):
+        self.site_dir = Path(site_dir)
+        self.env = env
+        self.depends_on = {}
+
+    def published_pages(self):
+        return [name for name in build_site.collect_source_files(self.site_dir) if name.endswith('.html')]
+
+    def page_inputs(self, page):
+        inputs = set()
+        for resource in page_resources(self.site_dir, page):
+            path = resource['path']
+            if path is not None and path.resolve().is_relative_to(self.site_dir.resolve()):
+                inputs.add(path.resolve().relative_to(self.site_dir.resolve()).as_posix())
+        if page in render_pages.page_names(self.env):
+            inputs |= {TEMPLATE_PREFIX + name
+                       for name in self.env.dependencies(render_pages.PAGES_PREFIX + page)}
+        inputs.discard(page)
+        return inputs
+
+    def stylesheet_inputs(self, stylesheet):
+        css = (self.site_dir / stylesheet).read_text(encoding='utf-8')
+        inputs = set()
+        for reference in css_references(css):
+            path = resolve_url(self.site_dir, stylesheet, reference['url'])
+            if path is not None and path.resolve().is_relative_to(self.site_dir.resolve()):
+                inputs.add(path.resolve().relative_to(self.site_dir.resolve()).as_posix())
+        return inputs
+
+    def update(self, name):
+        """Re-read the dependencies of one file (or drop it if it is gone)."""
+        path = self.site_dir / name
+        self.depends_on.pop(name, None)
+        if not path.is_file():
+            return
+        try:
+            if name.endswith('.html') and name in self.published_pages():
+                self.depends_on[name] = self.page_inputs(name)
+            elif name.endswith('.css'):
+                self.depends_on[name] = self.stylesheet_inputs(name)
+        except (OSError, UnicodeDecodeError, TemplateError):
+            pass
+
+    def build(self):
+        for name in self.published_pages():
+            self.update(name)
+        for path in sorted(self.site_dir.glob('*.css')):
+            self.update(path.name)
+
+    def dependents(self, names):
+        """Every file that depends on any of the names, directly or through others."""
+        found = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            for output, inputs in self.depends_on.items():
+                if name in inputs and output not in found:
+                    found.add(output)
+                    pending.append(output)
+        return found
+
+
+class SiteWatcher:
+    """Keeps the outputs of the site up to date as its sources change."""
+
+    def __init__(self, site_dir=SITE_DIR, build=True):
+        self.site_dir = Path(site_dir)
+        self.build_enabled = build
+        self.env = Environment()
+        self.graph = DependencyGraph(self.site_dir, self.env)
+        self.digests = {}
+        self.findings = {}
+
+    def start(self):
+        """Record the current state: file digests, dependency graph and issue findings."""
+        self.digests = {name: file_digest(self.site_dir / name) for name in watched_files(self.site_dir)}
+        self.graph.build()
+        for name in self.scannable():
+            self.findings[name] = issue_scanner.check_file(self.site_dir / name, name)
+
+    def scannable(self):
+        """Files the issue checks cover."""
+        html_files, js_files, css_files = check_for_issues.discover_files(self.site_dir)
+        return {Path(path).name for path in html_files + js_files + css_files}
+
+    def real_changes(self, paths):
+        """The paths whose content differs from what was last seen, recording the new digests."""
+        if RESCAN in paths:
+            paths = (set(paths) - {RESCAN}) | set(self.digests) | set(watched_files(self.site_dir))
+        changed = set()
+        for name in paths:
+            digest = file_digest(self.site_dir / name)
+            if digest != self.digests.get(name):
+                changed.add(name)
+                if digest is None:
+                    self.digests.pop(name, None)
+                else:
+                    self.digests[name] = digest
+        return changed
+
+    def remember(self, names):
+        """Record outputs this process wrote so their change events are not handled again."""
+        for name in names:
+            self.digests[name] = file_digest(self.site_dir / name)
+
+    def process(self, changed):
+        """Re-run what the changed files affect."""
+        started = time.perf_counter()
+        print(f"\n🔄 [{time.strftime('%H:%M:%S')}] {', '.join(sorted(changed))}")
+        changed = set(changed)
+
+        modules = {name[:-3] for name in changed if name.endswith('.py') and '/' not in name}
+        sitemap_modules = [name for name in SITEMAP_MODULES if name in modules]
+        for name in sitemap_modules:
+            importlib.reload(sys.modules[name])
+        if 'issue_scanner' in modules:
+            importlib.reload(issue_scanner)
+        stale = sorted(name for name in modules - set(sitemap_modules) - {'issue_scanner', 'watch_site'}
+                       if name in sys.modules)
+        for name in stale:
+            print(f"   ⚠ {name}.py changed - restart watch mode to load it")
+
+        if any(name.startswith(TEMPLATE_PREFIX) for name in changed):
+            changed |= self.render(changed)
+
+        for name in changed:
+            self.graph.update(name)
+        affected = self.graph.dependents(changed)
+        pages = sorted(name for name in (changed | affected) if name in self.graph.depends_on and name.endswith('.html'))
+
+        self.check(changed, recheck_all='issue_scanner' in modules)
+
+        root_pages = {name for name in changed if name.endswith('.html') and '/' not in name}
+        if sitemap_modules or root_pages - {'sitemap.html'} or set(SITEMAP_TEMPLATES) & changed:
+            written = self.update_sitemaps()
+            changed |= written
+
+        if self.build_enabled and (changed | affected) & set(build_site.collect_source_files(self.site_dir)):
+            self.build()
+
+        print(f"✅ Done in {time.perf_counter() - started:.2f}s"
+              + (f" - {len(pages)} page(s) affected: {', '.join(pages)}" if pages else ''))
+
+    def render(self, changed):
+        """Re-render the pages using changed templates; returns the pages written."""
+        templates = {name[len(TEMPLATE_PREFIX):] for name in changed if name.startswith(TEMPLATE_PREFIX)}
+        try:
+            names = [name for name in render_pages.page_names(self.env)
+                     if templates & self.env.dependencies(render_pages.PAGES_PREFIX + name)]
+            result = render_pages.render_pages(names, site_dir=self.site_dir, env=self.env) if names else None
+        except TemplateError as e:
+            print(f"   ❌ {e}")
+            return set()
+        if not result:
+            return set()
+        for name in result['edited']:
+            print(f"   ⚠ {name} was edited by hand - not re-rendered (see render_pages.py --force)")
+        if result['rendered']:
+            print(f"   🧱 Rendered {len(result['rendered'])} page(s): {', '.join(result['rendered'])}")
+        self.remember(result['rendered'])
+        return set(result['rendered'])
+
+    def check(self, changed, recheck_all=False):
+        """Re-run the issue checks of the changed files and report what is new."""
+        scannable = self.scannable()
+        names = scannable if recheck_all else scannable & changed
+        for name in sorted(set(self.findings) - scannable):
+            del self.findings[name]
+        for name in sorted(names):
+            before = Counter((issue['rule'], issue['match']) for issue in self.findings.get(name, []))
+            issues = issue_scanner.check_file(self.site_dir / name, name)
+            self.findings[name] = issues
+            after = Counter((issue['rule'], issue['match']) for issue in issues)
+            new = after - before
+            fixed = sum((before - after).values())
+            if not new and not fixed:
+                continue
+            print(f"   🔍 {name}: {len(issues)} issue(s), {sum(new.values())} new, {fixed} fixed")
+            for issue in issues:
+                if new[(issue['rule'], issue['match'])] > 0:
+                    new[(issue['rule'], issue['match'])] -= 1
+                    print(f"      {issue['severity']:<6} {name}:{issue['line']}:{issue['column']} {issue['description']}")
+        total = sum(len(issues) for issues in self.findings.values())
+        if names:
+            print(f"   📋 {total} issue(s) across {len(self.findings)} files")
+
+    def update_sitemaps(self):
+        """Regenerate the sitemaps if needed; returns the files written."""
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                outputs = generate_sitemap.update_sitemaps()
+        except Exception as e:
+            print(log.getvalue(), end='')
+            print(f"   ❌ Sitemap generation failed: {e}")
+            return set()
+        for line in log.getvalue().splitlines():
+            if line.startswith('⚠'):
+                print(f"   {line}")
+        if not outputs:
+            return set()
+        written = {name for name in outputs if self.digests.get(name) != outputs[name]}
+        self.remember(written)
+        if written:
+            print(f"   🗺️  Sitemaps updated: {', '.join(sorted(written))}")
+        return written
+
+    def build(self):
+        """Bring dist/ up to date through the build pipeline."""
+        started = time.perf_counter()
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                result = build_site.build_site()
+        except Exception as e:
+            print(log.getvalue(), end='')
+            print(f"   ❌ Build failed: {e}")
+            return
+        published = result['published']
+        print(f"   🏗️  {build_site.DIST_DIR.name}/ rebuilt: {len(published['changed'])} file(s) updated, "
+              f"{len(published['removed'])} removed in {time.perf_counter() - started:.2f}s")
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Rebuild what each edit affects as files change.')
+    parser.add_argument('--poll', action='store_true', help='poll for changes instead of using inotify')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f'polling interval in seconds (default: {POLL_INTERVAL})')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help=f'quiet period that ends a burst of changes (default: {DEBOUNCE_SECONDS})')
+    parser.add_argument('--no-build', action='store_true', help='do not rebuild dist/')
+    args = parser.parse_args(argv)
+
+    print("🏀 Kitchener-Waterloo Wizards Basketball Association")
+    print("👀 Watch Mode")
+    print("=" * 50)
+
+    site = SiteWatcher(SITE_DIR, build=not args.no_build)
+    watcher = open_watcher(SITE_DIR, args.poll, args.interval)
+    site.start()
+    total = sum(len(issues) for issues in site.findings.values())
+    print(f"👀 Watching {len(site.digests)} files with {watcher.name} "
+          f"({len(site.graph.depends_on)} pages and stylesheets in the dependency graph, {total} known issues)")
+    print("   Press Ctrl+C to stop")
+
+    try:
+        while True:
+            changed = site.real_changes(wait_for_changes(watcher, args.debounce))
+            if changed:
+                site.process(changed)
+    except KeyboardInterrupt:
+        print("\n👋 Watch mode stopped")
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())